@@ -3,6 +3,7 @@ from flask_jwt_extended import JWTManager
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from config import Config
+from db_pool import engine_options, PoolMetrics
 from auth.utils import reset_db, init_db
 from werkzeug.exceptions import BadRequest
 from authlib.integrations.flask_client import OAuth
@@ -31,9 +32,12 @@ def create_app(config_overrides=None):
         return jsonify(msg=message), 400
 
 
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
     with app.app_context():
         # Initialize extensions
         db.init_app(app)
+        app.extensions['db_pool_metrics'] = PoolMetrics(db.engine)
         jwt.init_app(app)
         oauth.init_app(app)
 
@@ -174,7 +174,7 @@ def register():
     try:
         db.session.add(new_user)
         db.session.commit()
-        db.session.refresh(new_user) 
+        user_data_dict = new_user.to_dict()
     except Exception as e:
         db.session.rollback()
         # Erro ao conectar ao db
@@ -189,7 +189,7 @@ def register():
     response_payload = {
         "access_token": access_token,
         "refresh_token": refresh_token,
-        "user": new_user.to_dict()
+        "user": user_data_dict
     }
     
     return jsonify(response_payload), 201, {'Location': '/api/auth/me'}
\ No newline at end of file
@@ -0,0 +1,139 @@
+"""
+Carregamento dos secrets usados pelo Config no startup.
+
+Arquivo compartilhado: a versão canônica fica em shared/ e as cópias dos serviços são geradas por
+python shared/sync.py (não edite as cópias).
+
+Todos os secrets do serviço são buscados de uma vez, em paralelo e com um único client do
+Secret Manager, e gravados em um arquivo em tmpfs (/dev/shm, compartilhado pelos workers do
+gunicorn e pelos containers do pod). Enquanto o arquivo tiver menos de SECRET_CACHE_TTL segundos,
+os outros workers leem dele em vez de repetir as chamadas. Um lock no arquivo garante que só um
+processo busque os secrets quando o cache está vazio ou vencido.
+"""
+import fcntl
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CACHE_TTL = 300
+MAX_CONCURRENT_FETCHES = 8
+
+
+class SecretManagerBackend:
+    """Secret Manager do projeto GCP_PROJECT_ID, com um único client (thread-safe) para todas as buscas."""
+
+    def __init__(self, project_id):
+        self.project_id = project_id
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            from google.cloud import secretmanager
+            self._client = secretmanager.SecretManagerServiceClient()
+        return self._client
+
+    def fetch(self, secret_name):
+        name = f"projects/{self.project_id}/secrets/{secret_name}/versions/latest"
+        response = self.client.access_secret_version(request={"name": name})
+        return response.payload.data.decode("UTF-8")
+
+
+class LocalSecretBackend:
+    """Secrets em memória ou em um arquivo JSON (SECRETS_FILE), para testes e desenvolvimento."""
+
+    def __init__(self, secrets):
+        self.secrets = dict(secrets)
+        self.fetched = []
+
+    @classmethod
+    def from_file(cls, path):
+        with open(path, encoding='utf-8') as f:
+            return cls(json.load(f))
+
+    def fetch(self, secret_name):
+        self.fetched.append(secret_name)
+        try:
+            return self.secrets[secret_name]
+        except KeyError:
+            raise KeyError(f"Secret '{secret_name}' not found") from None
+
+
+def default_backend():
+    if os.environ.get('SECRETS_FILE'):
+        return LocalSecretBackend.from_file(os.environ['SECRETS_FILE'])
+    return SecretManagerBackend(os.environ.get('GCP_PROJECT_ID')) # Será definida no Deployment YAML
+
+
+def _read_cache(cache_path, ttl):
+    try:
+        if time.time() - os.stat(cache_path).st_mtime >= ttl:
+            return {}
+        with open(cache_path, encoding='utf-8') as f:
+            cached = json.load(f)
+        return cached if isinstance(cached, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache_path, secrets):
+    # Arquivo temporário + rename: quem lê nunca vê um JSON pela metade
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path) or '.', prefix='.secrets-')
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(secrets, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def fetch_secrets(secret_names, backend):
+    """Busca os secrets em paralelo. Retorna {nome: valor}."""
+    secret_names = list(dict.fromkeys(secret_names))
+    if not secret_names:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(len(secret_names), MAX_CONCURRENT_FETCHES)) as executor:
+        return dict(zip(secret_names, executor.map(backend.fetch, secret_names)))
+
+
+def load_secrets(secret_names, backend=None, cache_path=None, ttl=None):
+    """
+    Retorna {nome: valor} para todos os secret_names, do cache em tmpfs quando ainda válido.
+    Sem cache_path (ou se o diretório não existir), busca direto no backend.
+    """
+    ttl = DEFAULT_CACHE_TTL if ttl is None else ttl
+    if not cache_path or not os.path.isdir(os.path.dirname(cache_path) or '.'):
+        return fetch_secrets(secret_names, backend or default_backend())
+
+    cached = _read_cache(cache_path, ttl)
+    if all(name in cached for name in secret_names):
+        return {name: cached[name] for name in secret_names}
+
+    with open(f"{cache_path}.lock", 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            # Outro worker pode ter preenchido o cache enquanto este esperava o lock
+            cached = _read_cache(cache_path, ttl)
+            missing = [name for name in secret_names if name not in cached]
+            if missing:
+                cached.update(fetch_secrets(missing, backend or default_backend()))
+                _write_cache(cache_path, cached)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return {name: cached[name] for name in secret_names}
+
+
+def load_config_secrets(secret_names, cache_name):
+    """
+    Secrets do Config: no Kubernetes vêm do Secret Manager (ou de SECRETS_FILE), com cache em
+    /dev/shm/<cache_name>.json; fora dele retorna {} e o Config usa as variáveis de ambiente.
+    """
+    if not os.environ.get('KUBERNETES_DEPLOYMENT'):
+        return {}
+    cache_path = os.environ.get('SECRET_CACHE_PATH', f"/dev/shm/{cache_name}.json")
+    return load_secrets(secret_names, cache_path=cache_path,
+                        ttl=int(os.environ.get('SECRET_CACHE_TTL', DEFAULT_CACHE_TTL)))
@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import Config
+from db_pool import engine_options, PoolMetrics
 from customer.database import reset_db, init_db
 
 db = SQLAlchemy()
@@ -17,9 +18,12 @@ def create_app(config_overrides=None):
     if config_overrides:
         app.config.update(config_overrides)
 
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
     with app.app_context():
         # Initialize extensions
         db.init_app(app)
+        app.extensions['db_pool_metrics'] = PoolMetrics(db.engine)
         jwt.init_app(app)
         
         # Config do CORS
@@ -46,16 +46,16 @@ def create_customer():
     try:
         db.session.add(new_customer)
         db.session.commit()
-        db.session.refresh(new_customer)
+        customer_data_dict = new_customer.to_dict()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Failed to save customer to database", "details_dev": str(e)}), 500
     finally:
         db.session.close()
 
-    location_uri = url_for('customer.get_customer_by_id', customer_id=new_customer.id, _external=True)
+    location_uri = url_for('customer.get_customer_by_id', customer_id=customer_data_dict['id'], _external=True)
     
-    return jsonify(new_customer.to_dict()), 201, {'Location': location_uri}
+    return jsonify(customer_data_dict), 201, {'Location': location_uri}
 
 
 @customer_bp.route('/<int:customer_id>', methods=["GET"])
@@ -51,16 +51,16 @@ def create_employee():
     try:
         db.session.add(new_employee)
         db.session.commit()
-        db.session.refresh(new_employee)
+        employee_data_dict = new_employee.to_dict()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Failed to save employee to database", "details_dev": str(e)}), 500
     finally:
         db.session.close()
 
-    location_uri = url_for('hr.get_employee_by_id', employee_id=new_employee.id, _external=True)
+    location_uri = url_for('hr.get_employee_by_id', employee_id=employee_data_dict['id'], _external=True)
 
-    return jsonify(new_employee.to_dict()), 201, {'Location': location_uri}
+    return jsonify(employee_data_dict), 201, {'Location': location_uri}
 
 
 @hr_bp.route('/<int:employee_id>', methods=["GET"])
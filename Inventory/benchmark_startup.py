@@ -0,0 +1,56 @@
+"""
+Benchmark do startup de um worker: tempo de import + create_app() e memória residente (RSS).
+
+    python benchmark_startup.py [repetições]
+
+Cada medição roda em um processo novo. "lazy" é o comportamento atual (nenhum client do GCP é
+criado no startup); "eager" constrói todos os clients de inventory/clients.py logo após o
+create_app(), como acontecia quando eles eram criados no import dos módulos. Os clients do modo
+eager usam credenciais anônimas, então o benchmark não precisa de acesso ao GCP.
+"""
+import json
+import statistics
+import subprocess
+import sys
+
+CHILD = r"""
+import json, resource, sys, time
+started = time.perf_counter()
+from inventory import create_app
+app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+if sys.argv[1] == 'eager':
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import pubsub_v1, storage
+    from inventory.clients import clients
+    clients.register('storage', lambda config: storage.Client(project='benchmark', credentials=AnonymousCredentials()))
+    clients.register('publisher', lambda config: pubsub_v1.PublisherClient(credentials=AnonymousCredentials()))
+    clients.register('subscriber', lambda config: pubsub_v1.SubscriberClient(credentials=AnonymousCredentials()))
+    with app.app_context():
+        clients.warm_up()
+elapsed = time.perf_counter() - started
+print(json.dumps({
+    "seconds": elapsed,
+    "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "google_modules": sum(1 for name in sys.modules if name.startswith('google')),
+}))
+"""
+
+
+def measure(mode):
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, mode], capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(repeats=5):
+    for mode in ('lazy', 'eager'):
+        runs = [measure(mode) for _ in range(repeats)]
+        seconds = statistics.median(run['seconds'] for run in runs)
+        rss = statistics.median(run['max_rss_mib'] for run in runs)
+        print(f"{mode:>5}: startup {seconds:.3f}s, RSS máx. {rss:.1f} MiB, "
+              f"{runs[0]['google_modules']} módulos google.* (mediana de {repeats})")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,121 @@
+"""
+Opções do engine do SQLAlchemy e métricas do pool de conexões, iguais em todos os serviços.
+
+Arquivo compartilhado: a versão canônica fica em shared/ e as cópias dos serviços são geradas por
+python shared/sync.py (não edite as cópias).
+
+Cada processo (worker do gunicorn, relay, job) tem o próprio pool. O tamanho acompanha o modelo
+de workers: uma conexão por thread do worker (GUNICORN_THREADS, exportado pelo gunicorn.conf.py)
+mais uma folga, então o total aberto no Cloud SQL fica em
+pods x processos x (DB_POOL_SIZE + DB_MAX_OVERFLOW).
+
+Pelo cloud-sql-proxy, uma conexão ociosa pode ser derrubada sem aviso (restart do proxy,
+manutenção da instância): pool_pre_ping descarta a conexão morta no checkout e pool_recycle
+renova as antigas antes disso. O statement_timeout fica abaixo do timeout do gunicorn, para uma
+query presa virar erro na requisição em vez de o worker ser morto segurando a conexão. Os passos
+do init_db (DDL, índices, cargas iniciais) rodam sem ele, em ddl_connection.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from sqlalchemy import event
+
+QUERY_CANCELED = '57014' # SQLSTATE do PostgreSQL quando o statement_timeout estoura
+
+
+def engine_options(config):
+    """SQLALCHEMY_ENGINE_OPTIONS a partir das configurações DB_* do Config."""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite'):
+        return {} # SQLite dos testes: o Flask-SQLAlchemy escolhe o pool
+    options = {
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_pre_ping': True,
+    }
+    if uri.startswith('postgresql') and config['DB_STATEMENT_TIMEOUT_MS']:
+        options['connect_args'] = {'options': f"-c statement_timeout={config['DB_STATEMENT_TIMEOUT_MS']}"}
+    return options
+
+
+@contextmanager
+def ddl_connection(engine):
+    """
+    Transação para os passos do init_db, com o statement_timeout desligado só nela (SET LOCAL):
+    criar um índice ou popular uma tabela grande passa do limite pensado para requisições, e a
+    espera pelo lock do init_db de outro processo também conta como comando.
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name == 'postgresql':
+            conn.exec_driver_sql("SET LOCAL statement_timeout = 0")
+        yield conn
+
+
+class PoolMetrics:
+    """
+    Contadores do pool de um engine (por processo): checkouts, tempo em que cada conexão ficou
+    emprestada, conexões abertas e invalidadas, e comandos cancelados pelo statement_timeout.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.reset()
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+        event.listen(engine, 'handle_error', self._on_error)
+
+    def reset(self):
+        """Zera os contadores (os workers do gunicorn não herdam os do master)."""
+        with self._lock:
+            self.connects = self.checkouts = self.invalidations = self.statement_timeouts = 0
+            self._held_count = 0
+            self._held_total = 0.0
+            self.max_held_seconds = 0.0
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info['checked_out_at'] = time.perf_counter()
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        started = connection_record.info.pop('checked_out_at', None)
+        if started is None:
+            return
+        held = time.perf_counter() - started
+        with self._lock:
+            self._held_count += 1
+            self._held_total += held
+            self.max_held_seconds = max(self.max_held_seconds, held)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def _on_error(self, context):
+        if getattr(context.original_exception, 'pgcode', None) == QUERY_CANCELED:
+            with self._lock:
+                self.statement_timeouts += 1
+
+    def stats(self):
+        pool = self.engine.pool
+        with self._lock:
+            stats = {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "statement_timeouts": self.statement_timeouts,
+                "avg_held_ms": round(self._held_total / self._held_count * 1000, 2) if self._held_count else 0.0,
+                "max_held_ms": round(self.max_held_seconds * 1000, 2),
+            }
+        if hasattr(pool, 'checkedout'): # QueuePool; os pools do SQLite não têm esses contadores
+            stats.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+        return stats
@@ -0,0 +1,8 @@
+from inventory import create_app
+from inventory.images import run_image_worker
+
+app = create_app()
+
+if __name__ == "__main__":
+    # Upload das imagens, geração das miniaturas e remoção de blobs antigos, fora das requisições
+    run_image_worker(app, app.extensions['image_store'])
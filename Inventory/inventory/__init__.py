@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import Config
+from db_pool import engine_options, PoolMetrics
 from inventory.database import reset_db, init_db
 
 db = SQLAlchemy()
@@ -17,9 +18,15 @@ def create_app(config_overrides=None):
     if config_overrides:
         app.config.update(config_overrides)
 
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
     with app.app_context():
         # Initialize extensions
         db.init_app(app)
+        app.extensions['db_pool_metrics'] = PoolMetrics(db.engine)
+        # Model usado pelo módulo compartilhado da outbox (inventory/outbox.py)
+        from inventory.models import OutboxMessage
+        app.extensions['outbox_model'] = OutboxMessage
         jwt.init_app(app)
         
         # Config do CORS
@@ -49,6 +56,35 @@ def create_app(config_overrides=None):
             except Exception as e:
                 print(f"ERROR: Failed to create database tables: {e}")
 
+    # LRU de mensagens Pub/Sub já processadas, por processo
+    from inventory.idempotency import ProcessedMessageCache
+    app.extensions['processed_messages'] = ProcessedMessageCache(app.config['PROCESSED_MESSAGES_CACHE_SIZE'])
+
+    # Cache do catálogo (produto por ID e categorias), por processo
+    from inventory.cache import CatalogCache
+    app.extensions['catalog_cache'] = CatalogCache(
+        maxsize=app.config['CATALOG_CACHE_MAXSIZE'],
+        ttl=app.config['CATALOG_CACHE_TTL'],
+        change_check_interval=app.config['CATALOG_CHANGE_CHECK_INTERVAL'],
+        change_lookback=app.config['CATALOG_CHANGE_LOOKBACK'],
+    )
+
+    # Armazenamento das imagens de produto (GCS ou diretório local)
+    from inventory.images import create_image_store
+    app.extensions['image_store'] = create_image_store(app.config)
+
+    # URLs assinadas das imagens, reaproveitadas até perto de expirar
+    from inventory.signed_urls import SignedUrlCache
+    app.extensions['signed_url_cache'] = SignedUrlCache(
+        maxsize=app.config['IMAGE_SIGNED_URL_CACHE_SIZE'],
+        expiration=app.config['IMAGE_SIGNED_URL_EXPIRATION'],
+        refresh_margin=app.config['IMAGE_SIGNED_URL_REFRESH_MARGIN'],
+    )
+
+    # Clients do Google Cloud do processo, descartados pelo gunicorn após o fork (gunicorn.conf.py)
+    from inventory.clients import clients
+    app.extensions['clients'] = clients
+
     # Importar e registrar Blueprints
     from inventory.routes.product_routes import product_bp
     from inventory.routes.category_routes import category_bp
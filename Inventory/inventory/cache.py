@@ -0,0 +1,184 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import event
+from inventory import db
+from inventory.models import CatalogChange
+
+CATEGORIES_KEY = ('categories',)
+# Chaves de um único elemento também invalidam o grupo: PRODUCTS_KEY remove todos os produtos
+PRODUCTS_KEY = ('product',)
+LOW_STOCK_KEY = ('low_stock',)
+
+
+def product_key(product_id):
+    return ('product', product_id)
+
+
+def low_stock_page_key(after_id, limit, category_id):
+    return ('low_stock', after_id, limit, category_id)
+
+
+def _encode_key(key):
+    return json.dumps(list(key))
+
+
+def _decode_key(value):
+    return tuple(json.loads(value))
+
+
+class CatalogCache:
+    """
+    Cache em memória (LRU + TTL) das leituras do catálogo: produto por ID, lista de categorias
+    e páginas do relatório de estoque baixo.
+
+    Cada worker do gunicorn tem o seu. As escritas gravam uma linha em catalog_change por chave
+    afetada, na mesma transação (só INSERTs: escritas concorrentes não disputam nenhuma linha).
+    Os outros workers leem as mudanças recentes no máximo a cada change_check_interval segundos
+    e descartam apenas as chaves alteradas. A leitura cobre os últimos change_lookback segundos,
+    para não perder mudanças de transações que gravaram antes e fizeram commit depois da
+    última leitura. O próprio worker que escreveu invalida as chaves logo após o commit.
+    """
+
+    def __init__(self, maxsize=5000, ttl=60, change_check_interval=1.0, change_lookback=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.change_check_interval = change_check_interval
+        self.change_lookback = change_lookback
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self._seen_changes = None
+        self._last_change_id = None
+        self._changes_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _sync_changes(self):
+        now = time.monotonic()
+        if self._seen_changes is not None and now - self._changes_checked_at < self.change_check_interval:
+            return
+        since = datetime.now() - timedelta(seconds=self.change_lookback)
+        changes = db.session.execute(
+            db.select(CatalogChange.id, CatalogChange.key).where(CatalogChange.changed_at >= since)
+        ).all()
+        with self._lock:
+            seen = self._seen_changes or set()
+            changed_keys = {_decode_key(key) for change_id, key in changes if change_id not in seen}
+            # Mudanças que saíram da janela não voltam a aparecer: basta lembrar as que estão nela
+            self._seen_changes = {change_id for change_id, _ in changes}
+            if changes:
+                self._last_change_id = max(self._last_change_id or 0, *self._seen_changes)
+            self._changes_checked_at = now
+        if changed_keys:
+            self.invalidate(*changed_keys)
+
+    def get_or_load(self, key, loader):
+        """Retorna o valor em cache ou chama loader(). Resultados None (não encontrado) não são guardados."""
+        self._sync_changes()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key] # Expirado
+            self.misses += 1
+            marker = self._loading[key] = object()
+
+        value = loader()
+
+        with self._lock:
+            # Não guarda se a chave foi invalidada enquanto o loader rodava
+            if self._loading.get(key) is marker:
+                del self._loading[key]
+                if value is not None:
+                    self._entries[key] = (time.monotonic() + self.ttl, value)
+                    self._entries.move_to_end(key)
+                    while len(self._entries) > self.maxsize:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+        return value
+
+    def invalidate(self, *keys):
+        """Remove as chaves; uma chave de um único elemento (ex.: PRODUCTS_KEY) remove o grupo inteiro."""
+        groups = {key[0] for key in keys if len(key) == 1}
+        with self._lock:
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+                self._loading.pop(key, None)
+            if groups:
+                for key in [key for key in self._entries if key[0] in groups]:
+                    del self._entries[key]
+                    self.invalidations += 1
+                for key in [key for key in self._loading if key[0] in groups]:
+                    del self._loading[key]
+
+    def clear(self):
+        """Esvazia o cache e zera as métricas."""
+        with self._lock:
+            self._entries.clear()
+            self._loading.clear()
+            self._seen_changes = None
+            self._last_change_id = None
+            self._changes_checked_at = 0.0
+            self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "last_change_id": self._last_change_id,
+            }
+
+
+def invalidate_catalog(*keys):
+    """
+    Marca as chaves para invalidação. Grava as mudanças em catalog_change na transação atual
+    e só remove as chaves do cache local depois do commit (um rollback não invalida nada).
+    """
+    keys = set(keys)
+    if not keys:
+        return
+    db.session.execute(db.insert(CatalogChange), [{'key': _encode_key(key)} for key in keys])
+    db.session.info.setdefault('catalog_invalidations', set()).update(keys)
+
+
+def purge_catalog_changes(retention_hours):
+    """Remove as mudanças mais antigas que retention_hours. Retorna quantas foram removidas."""
+    cutoff = datetime.now() - timedelta(hours=retention_hours)
+    result = db.session.execute(db.delete(CatalogChange).where(CatalogChange.changed_at < cutoff))
+    db.session.commit()
+    return result.rowcount
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    keys = session.info.pop('catalog_invalidations', None)
+    if keys:
+        cache = current_app.extensions.get('catalog_cache')
+        if cache is not None:
+            cache.invalidate(*keys)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_invalidations(session):
+    session.info.pop('catalog_invalidations', None)
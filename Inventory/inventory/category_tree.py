@@ -0,0 +1,109 @@
+from sqlalchemy import event, inspect
+from inventory import db
+from inventory.models import Category, CategoryClosure
+from inventory.database import lock_init_db, ddl_connection
+
+# Limite de segurança da CTE de reconstrução, caso a tabela category tenha um ciclo
+MAX_CATEGORY_DEPTH = 64
+
+closure = CategoryClosure.__table__
+category = Category.__table__
+
+
+def _link_subtree(connection, node_id, parent_id):
+    """Liga a subárvore de node_id a todos os ancestrais de parent_id (inclusive)."""
+    ancestors = closure.alias('ancestors')
+    subtree = closure.alias('subtree')
+    connection.execute(
+        closure.insert().from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            db.select(ancestors.c.ancestor_id, subtree.c.descendant_id, ancestors.c.depth + subtree.c.depth + 1)
+            .select_from(ancestors.join(subtree, db.true())) # Produto cartesiano intencional
+            .where(ancestors.c.descendant_id == parent_id, subtree.c.ancestor_id == node_id)
+        )
+    )
+
+
+def _unlink_subtree(connection, node_id):
+    """Remove os caminhos que entram na subárvore de node_id vindos de fora dela."""
+    subtree_ids = db.select(closure.c.descendant_id).where(closure.c.ancestor_id == node_id)
+    outer_ancestor_ids = db.select(closure.c.ancestor_id).where(closure.c.descendant_id == node_id, closure.c.ancestor_id != node_id)
+    connection.execute(
+        closure.delete()
+        .where(closure.c.descendant_id.in_(subtree_ids))
+        .where(closure.c.ancestor_id.in_(outer_ancestor_ids))
+    )
+
+
+@event.listens_for(Category, 'after_insert')
+def _category_inserted(mapper, connection, target):
+    connection.execute(closure.insert().values(ancestor_id=target.id, descendant_id=target.id, depth=0))
+    if target.parent_category_id is not None:
+        _link_subtree(connection, target.id, target.parent_category_id)
+
+
+@event.listens_for(Category, 'after_update')
+def _category_updated(mapper, connection, target):
+    history = inspect(target).attrs.parent_category_id.history
+    if not history.has_changes():
+        return
+    _unlink_subtree(connection, target.id)
+    if target.parent_category_id is not None:
+        _link_subtree(connection, target.id, target.parent_category_id)
+
+
+@event.listens_for(Category, 'before_delete')
+def _category_deleted(mapper, connection, target):
+    # Os filhos viram raízes (mesmo efeito do ON DELETE SET NULL em parent_category_id)
+    subtree_ids = db.select(closure.c.descendant_id).where(closure.c.ancestor_id == target.id)
+    path_ids = db.select(closure.c.ancestor_id).where(closure.c.descendant_id == target.id)
+    connection.execute(
+        closure.delete()
+        .where(closure.c.descendant_id.in_(subtree_ids))
+        .where(closure.c.ancestor_id.in_(path_ids))
+    )
+    connection.execute(
+        category.update().where(category.c.parent_category_id == target.id).values(parent_category_id=None)
+    )
+
+
+def rebuild_category_closure(db):
+    """Popula category_closure a partir de parent_category_id, se ela ainda estiver vazia (chamado no init_db)."""
+    with ddl_connection(db.engine) as conn:
+        lock_init_db(db, conn)
+        if conn.execute(db.select(closure.c.ancestor_id).limit(1)).first():
+            return
+        tree = (
+            db.select(category.c.id.label('ancestor_id'), category.c.id.label('descendant_id'), db.literal(0).label('depth'))
+            .cte('tree', recursive=True)
+        )
+        child = category.alias('child')
+        tree = tree.union_all(
+            db.select(tree.c.ancestor_id, child.c.id, tree.c.depth + 1)
+            .where(child.c.parent_category_id == tree.c.descendant_id, tree.c.depth < MAX_CATEGORY_DEPTH)
+        )
+        conn.execute(
+            closure.insert().from_select(['ancestor_id', 'descendant_id', 'depth'], db.select(tree.c.ancestor_id, tree.c.descendant_id, tree.c.depth))
+        )
+
+
+def subtree_ids_query(category_id):
+    """SELECT dos IDs da subárvore de category_id (inclusive), para usar em IN (...)."""
+    return db.select(CategoryClosure.descendant_id).where(CategoryClosure.ancestor_id == category_id)
+
+
+def is_in_subtree(category_id, root_id):
+    return db.session.scalar(
+        db.select(db.literal(True))
+        .where(CategoryClosure.ancestor_id == root_id, CategoryClosure.descendant_id == category_id)
+    ) is not None
+
+
+def get_subtree(category_id):
+    """Categoria e todos os descendentes em uma única consulta, ordenados por profundidade. Lista vazia se não existir."""
+    return db.session.execute(
+        db.select(Category, CategoryClosure.depth)
+        .join(CategoryClosure, CategoryClosure.descendant_id == Category.id)
+        .where(CategoryClosure.ancestor_id == category_id)
+        .order_by(CategoryClosure.depth, Category.id)
+    ).all()
@@ -0,0 +1,24 @@
+from client_registry import ClientRegistry
+
+
+def _storage_client(config):
+    from google.cloud import storage
+    return storage.Client()
+
+
+def _publisher_client(config):
+    from google.cloud import pubsub_v1
+    # Agrupa as publicações de cada lote da outbox em poucas requisições ao Pub/Sub
+    batch_settings = pubsub_v1.types.BatchSettings(max_messages=config['OUTBOX_BATCH_SIZE'], max_latency=0.05)
+    return pubsub_v1.PublisherClient(batch_settings=batch_settings)
+
+
+def _subscriber_client(config):
+    from google.cloud import pubsub_v1
+    return pubsub_v1.SubscriberClient()
+
+
+clients = ClientRegistry()
+clients.register('storage', _storage_client)
+clients.register('publisher', _publisher_client)
+clients.register('subscriber', _subscriber_client)
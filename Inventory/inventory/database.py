@@ -1,12 +1,92 @@
+from db_pool import ddl_connection
+
+def create_extensions(db):
+    # pg_trgm é usado pelos índices GIN da busca de produtos
+    if db.engine.dialect.name == 'postgresql':
+        with ddl_connection(db.engine) as conn:
+            conn.execute(db.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+# Chave do pg_advisory_xact_lock que serializa os passos do init_db entre processos
+INIT_DB_LOCK_KEY = 4711001
+
+def lock_init_db(db, conn):
+    # Réplicas da API, relay e image_worker rodam o init_db ao mesmo tempo no primeiro deploy:
+    # os passos do tipo "tabela vazia? então popula" precisam rodar um processo por vez.
+    # O lock é liberado no fim da transação de conn. No SQLite (testes) não há concorrência.
+    if conn.dialect.name == 'postgresql':
+        conn.execute(db.text("SELECT pg_advisory_xact_lock(:key)"), {"key": INIT_DB_LOCK_KEY})
+
+def create_missing_indexes(db):
+    # create_all não cria índices novos em tabelas que já existem
+    with ddl_connection(db.engine) as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
+def merge_duplicate_stock(db):
+    # uq_stock_product_location é único; antes dele, POST /stock/ aceitava registros repetidos
+    # do mesmo produto e local. Cada grupo vira um único registro (o de menor id) com a soma
+    # das quantidades. O saldo do par não muda, então o ledger não precisa de movimentação.
+    from inventory.models import Stock
+    stock = Stock.__table__
+    with ddl_connection(db.engine) as conn:
+        lock_init_db(db, conn)
+        inspector = db.inspect(conn)
+        if not inspector.has_table(stock.name):
+            return
+        if 'uq_stock_product_location' in {index['name'] for index in inspector.get_indexes(stock.name)}:
+            return
+        duplicates = conn.execute(
+            db.select(stock.c.product_id, stock.c.inventory_location_id, db.func.min(stock.c.id), db.func.sum(stock.c.quantity))
+            .group_by(stock.c.product_id, stock.c.inventory_location_id)
+            .having(db.func.count() > 1)
+        ).all()
+        for product_id, inventory_location_id, keep_id, quantity in duplicates:
+            conn.execute(db.update(stock).where(stock.c.id == keep_id).values(quantity=quantity))
+            conn.execute(db.delete(stock).where(
+                stock.c.product_id == product_id,
+                stock.c.inventory_location_id == inventory_location_id,
+                stock.c.id != keep_id
+            ))
+        if duplicates:
+            print(f"Merged duplicate stock records for {len(duplicates)} product/location pairs.")
+
+def create_missing_columns(db):
+    # create_all também não adiciona colunas novas; só as anuláveis podem ser criadas sem migração
+    with ddl_connection(db.engine) as conn:
+        inspector = db.inspect(conn)
+        preparer = conn.dialect.identifier_preparer
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing and column.nullable:
+                    conn.execute(db.text(
+                        f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN "
+                        f"{preparer.format_column(column)} {column.type.compile(dialect=conn.dialect)}"
+                    ))
+
 def reset_db(db):
-    from inventory.models import Category, Inventory, Product, Stock
-    
+    from inventory.models import Category, Inventory, Product, Stock, ProcessedMessage, CatalogChange, CategoryClosure, StockMovement, StockSnapshot, OutboxMessage, ProductImageJob
+
     print("Resetando o banco de dados...")
     db.drop_all()
+    create_extensions(db)
     db.create_all()
     print("Banco de dados resetado com sucesso.")
 
 def init_db(db):
+    from inventory.models import Category, Inventory, Product, Stock, ProcessedMessage, CatalogChange, CategoryClosure, StockMovement, StockSnapshot, OutboxMessage, ProductImageJob
     print("Criando tabelas no banco de dados...")
-    db.create_all()
-    print("Tabelas criadas com sucesso.")
\ No newline at end of file
+    create_extensions(db)
+    with ddl_connection(db.engine) as conn:
+        db.metadata.create_all(bind=conn)
+    create_missing_columns(db)
+    merge_duplicate_stock(db)
+    create_missing_indexes(db)
+    from inventory.category_tree import rebuild_category_closure
+    rebuild_category_closure(db)
+    from inventory.ledger import seed_opening_balances
+    seed_opening_balances(db)
+    print("Tabelas criadas com sucesso.")
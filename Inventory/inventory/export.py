@@ -0,0 +1,95 @@
+"""
+Exportação em streaming (NDJSON ou CSV, com gzip opcional) usada pelos endpoints /export.
+
+Arquivo compartilhado: a versão canônica fica em shared/ e as cópias dos serviços são geradas por
+python shared/sync.py (não edite as cópias). Por isso não importa o db do pacote: usa a extensão
+registrada na app atual.
+
+Uma exportação grande ocupa a thread por mais tempo que o timeout do gunicorn. Os serviços com
+endpoints de streaming rodam com GUNICORN_WORKER_CLASS=gthread (ver gunicorn.conf.py): um worker
+sync não avisa o master enquanto envia a resposta e seria morto no meio do envio.
+"""
+import csv
+import io
+import json
+import zlib
+from flask import request, current_app, Response, stream_with_context
+
+# ?format= aceitos pelos endpoints /export
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+# Tamanho aproximado de cada bloco enviado ao cliente
+EXPORT_BUFFER_BYTES = 64 * 1024
+
+
+def _db():
+    return current_app.extensions['sqlalchemy']
+
+
+def export_format():
+    """Formato pedido em ?format= (padrão ndjson), ou None se não for suportado."""
+    fmt = request.args.get('format', 'ndjson')
+    return fmt if fmt in EXPORT_FORMATS else None
+
+
+def stream_query(query):
+    """Executa a consulta com cursor do lado do servidor, trazendo EXPORT_YIELD_PER linhas por vez."""
+    return _db().session.execute(query.execution_options(yield_per=current_app.config['EXPORT_YIELD_PER']))
+
+
+def _encode(records, fmt, columns):
+    buffer = io.StringIO()
+    writer = None
+    if fmt == 'csv':
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction='ignore')
+        writer.writeheader()
+    for record in records:
+        if writer:
+            writer.writerow(record)
+        else:
+            buffer.write(json.dumps(record))
+            buffer.write('\n')
+        if buffer.tell() >= EXPORT_BUFFER_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def _gzip(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) # 16+: cabeçalho gzip
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def export_response(records, fmt, columns, filename):
+    """
+    Resposta em streaming (chunked, sem Content-Length) a partir de um gerador de dicts, que só é
+    consumido enquanto o corpo é enviado: a memória fica constante independentemente do número de linhas.
+    Comprime com gzip quando o cliente aceita.
+    """
+    body = _encode(records, fmt, columns)
+    headers = {
+        'Content-Disposition': f'attachment; filename={filename}.{fmt}',
+        'Vary': 'Accept-Encoding',
+    }
+    if request.accept_encodings['gzip']:
+        body = _gzip(body)
+        headers['Content-Encoding'] = 'gzip'
+
+    session = _db().session
+
+    def generate():
+        try:
+            yield from body
+        finally:
+            session.close()
+
+    return Response(stream_with_context(generate()), mimetype=EXPORT_FORMATS[fmt], headers=headers)
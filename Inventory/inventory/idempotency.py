@@ -0,0 +1,72 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from inventory import db
+from inventory.models import ProcessedMessage
+
+
+class ProcessedMessageCache:
+    """
+    LRU limitado com os IDs de mensagens Pub/Sub já processadas por este processo.
+    Fica na frente da tabela processed_messages: uma redelivery recente é descartada
+    sem ir ao banco. A tabela continua sendo a fonte da verdade entre workers.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._ids = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, message_id):
+        with self._lock:
+            if message_id in self._ids:
+                self._ids.move_to_end(message_id)
+                return True
+            return False
+
+    def __len__(self):
+        return len(self._ids)
+
+    def add(self, message_id):
+        with self._lock:
+            self._ids[message_id] = None
+            self._ids.move_to_end(message_id)
+            while len(self._ids) > self.maxsize:
+                self._ids.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+
+def record_processed_message(message_id):
+    """
+    Registra a mensagem no ledger dentro da transação atual.
+    Levanta IntegrityError no flush se ela já tiver sido processada.
+    """
+    record_processed_messages([message_id])
+
+
+def record_processed_messages(message_ids):
+    """Versão em lote de record_processed_message: um único INSERT multi-linha."""
+    db.session.add_all(ProcessedMessage(message_id=message_id) for message_id in message_ids)
+    db.session.flush()
+
+
+def purge_expired_messages(ttl_hours):
+    """Remove do ledger as mensagens mais antigas que o TTL. Retorna quantas foram removidas."""
+    cutoff = datetime.now() - timedelta(hours=ttl_hours)
+    result = db.session.execute(
+        db.delete(ProcessedMessage).where(ProcessedMessage.processed_at < cutoff)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def filter_processed_messages(message_ids):
+    """Retorna, dentre os IDs informados, os que já estão no ledger (uma única consulta IN)."""
+    if not message_ids:
+        return set()
+    return set(db.session.scalars(
+        db.select(ProcessedMessage.message_id).where(ProcessedMessage.message_id.in_(message_ids))
+    ))
@@ -0,0 +1,440 @@
+import io
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+from urllib.parse import quote, unquote
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+from werkzeug.utils import secure_filename
+from inventory import db
+from inventory.models import Product, ProductImageJob
+from inventory.cache import invalidate_catalog, product_key
+from inventory.clients import clients
+
+IMAGE_STATUS_PENDING = 'pending'
+IMAGE_STATUS_READY = 'ready'
+IMAGE_STATUS_FAILED = 'failed'
+
+MAX_IMAGE_ATTEMPTS = 5
+# Prazo da reserva de um job: depois dele, outro worker pode retomar um job cujo worker morreu
+CLAIM_SECONDS = 300
+# Uploads esperam o worker do pod que gravou o staging; depois disso o pod foi dado como substituído
+STAGING_ORPHAN_SECONDS = 3600
+# Os containers de um pod compartilham o hostname (nome do pod)
+STAGING_HOST = socket.gethostname()
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 300
+
+THUMBNAIL_FORMAT = 'WEBP'
+THUMBNAIL_CONTENT_TYPE = 'image/webp'
+
+
+# --- Armazenamento: GCS em produção, diretório local em desenvolvimento e testes ---
+
+class GCSImageStore:
+    """Bucket do GCS. Sem client explícito, usa o client de storage do processo (inventory/clients.py)."""
+
+    PUBLIC_HOST = 'https://storage.googleapis.com'
+
+    def __init__(self, bucket_name, client=None, sign_workers=16, sign_timeout=3.0):
+        self.bucket_name = bucket_name
+        self._client = client
+        self.sign_workers = sign_workers
+        self.sign_timeout = sign_timeout
+
+    @property
+    def bucket(self):
+        # Não guarda o bucket: depois de um fork o client do processo é outro
+        return (self._client or clients.get('storage')).bucket(self.bucket_name)
+
+    def upload(self, name, data, content_type):
+        self.bucket.blob(name).upload_from_string(data, content_type=content_type)
+
+    def delete(self, name):
+        from google.api_core.exceptions import NotFound
+        try:
+            self.bucket.blob(name).delete() # Sem exists(): um blob que já não existe não é erro
+        except NotFound:
+            pass
+
+    def public_url(self, name):
+        return f"{self.PUBLIC_HOST}/{self.bucket_name}/{quote(name)}"
+
+    def sign_urls(self, names, expiration):
+        """
+        URLs assinadas (V4, GET) para vários blobs, sem exists() nem outra chamada por blob ao GCS.
+        Com a chave da service account a assinatura é local. Com Workload Identity (sem chave privada)
+        cada blob custa uma chamada ao IAM signBlob: elas rodam em paralelo, em até sign_workers threads,
+        com prazo total de sign_timeout segundos. Blobs que falham ou estouram o prazo ficam de fora
+        do resultado e o chamador usa o fallback (inventory/signed_urls.py).
+        """
+        from google.oauth2 import service_account
+        bucket = self.bucket # Resolvido aqui: as threads não têm o contexto da app
+        credentials = bucket.client._credentials
+        expiration = timedelta(seconds=expiration)
+        if isinstance(credentials, service_account.Credentials):
+            return {
+                name: bucket.blob(name).generate_signed_url(version='v4', expiration=expiration, method='GET')
+                for name in names
+            }
+
+        if not credentials.valid:
+            from google.auth.transport.requests import Request
+            credentials.refresh(Request())
+        options = {'service_account_email': credentials.service_account_email, 'access_token': credentials.token}
+
+        def sign(name):
+            return bucket.blob(name).generate_signed_url(version='v4', expiration=expiration, method='GET', **options)
+
+        names = list(names)
+        if not names:
+            return {}
+        executor = ThreadPoolExecutor(max_workers=min(self.sign_workers, len(names)))
+        futures = {executor.submit(sign, name): name for name in names}
+        done, _ = wait(futures, timeout=self.sign_timeout)
+        # Não espera as que estouraram o prazo: terminam em segundo plano e o resultado é descartado
+        executor.shutdown(wait=False, cancel_futures=True)
+        urls, errors = {}, []
+        for future in done:
+            if future.exception() is None:
+                urls[futures[future]] = future.result()
+            else:
+                errors.append(future.exception())
+        if len(urls) < len(names):
+            detail = f": {errors[0]}" if errors else ""
+            print(f"Warning: {len(names) - len(urls)} de {len(names)} URLs assinadas falharam ou estouraram o prazo{detail}")
+        return urls
+
+    def blob_name(self, url):
+        prefix = f"{self.PUBLIC_HOST}/{self.bucket_name}/"
+        return unquote(url[len(prefix):]) if url.startswith(prefix) else os.path.basename(url)
+
+
+class LocalImageStore:
+    """Substituto do GCS em disco, servido por GET /api/inventory/products/images/<name>."""
+
+    def __init__(self, root, base_url):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+
+    def _path(self, name):
+        return os.path.join(self.root, *name.split('/'))
+
+    def upload(self, name, data, content_type):
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+
+    def delete(self, name):
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def public_url(self, name):
+        return f"{self.base_url}/{quote(name)}"
+
+    def sign_urls(self, names, expiration):
+        # Servido pela própria API: não há o que assinar
+        return {name: self.public_url(name) for name in names}
+
+    def blob_name(self, url):
+        prefix = f"{self.base_url}/"
+        return unquote(url[len(prefix):]) if url.startswith(prefix) else os.path.basename(url)
+
+
+def create_image_store(config):
+    if config['IMAGE_STORAGE'] == 'gcs':
+        return GCSImageStore(config['GCS_BUCKET_NAME'], sign_workers=config['IMAGE_SIGNED_URL_WORKERS'],
+                             sign_timeout=config['IMAGE_SIGNED_URL_TIMEOUT'])
+    return LocalImageStore(config['IMAGE_LOCAL_DIR'], config['IMAGE_LOCAL_BASE_URL'])
+
+
+# --- Lado da requisição: valida, grava a original no disco do pod e enfileira ---
+
+def read_image_upload(image_file, max_bytes):
+    """
+    Lê o arquivo enviado e confere se é uma imagem (só o cabeçalho é decodificado).
+    Levanta ValueError com a mensagem para o cliente.
+    """
+    data = image_file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ValueError(f"Image larger than {max_bytes} bytes")
+    try:
+        with Image.open(io.BytesIO(data)):
+            pass
+    except UnidentifiedImageError:
+        raise ValueError("File is not a supported image")
+    return data
+
+
+def stage_image_upload(staging_dir, data, filename):
+    """
+    Grava a original em staging_dir (volume do pod compartilhado com o image_worker) e retorna o nome
+    do arquivo, que também será o nome do blob. A requisição só escreve em disco local: todo o I/O
+    com o bucket fica com o worker.
+    """
+    name = f"{uuid.uuid4()}_{secure_filename(filename) or 'image'}"
+    os.makedirs(staging_dir, exist_ok=True)
+    with open(os.path.join(staging_dir, name), 'wb') as f:
+        f.write(data)
+    return name
+
+
+def discard_staged_image(staging_dir, name):
+    """Remove o arquivo de staging (job concluído, descartado ou que não chegou ao commit)."""
+    try:
+        os.remove(os.path.join(staging_dir, name))
+    except FileNotFoundError:
+        pass
+
+
+def enqueue_image_upload(product, staged_file):
+    """Marca a imagem do produto como pendente e enfileira o processamento na transação atual (product precisa ter id)."""
+    product.image_status = IMAGE_STATUS_PENDING
+    db.session.add(ProductImageJob(product_id=product.id, staged_file=staged_file, staged_on=STAGING_HOST))
+
+
+def product_image_blobs(store, product_image, image_thumbnails):
+    urls = [product_image] + list((image_thumbnails or {}).values())
+    return [store.blob_name(url) for url in urls if url]
+
+
+def enqueue_blob_removal(blob_names, product_id=None):
+    """Enfileira a remoção de blobs que deixaram de ser usados (o commit é do chamador)."""
+    if blob_names:
+        db.session.add(ProductImageJob(product_id=product_id, obsolete_blobs=list(blob_names)))
+
+
+def clear_product_image(store, product):
+    """Remove a imagem do produto agora e os blobs depois, pelo pipeline."""
+    enqueue_blob_removal(product_image_blobs(store, product.product_image, product.image_thumbnails), product.id)
+    product.product_image = None
+    product.image_thumbnails = None
+    product.image_status = None
+
+
+# --- Pipeline (image_worker.py) ---
+
+def make_thumbnails(data, sizes):
+    """Gera [(lado máximo, bytes)] em WEBP, preservando a proporção e a orientação EXIF."""
+    thumbnails = []
+    with Image.open(io.BytesIO(data)) as image:
+        image.draft('RGB', (max(sizes), max(sizes))) # JPEG: decodifica já reduzido
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'A' in image.mode or 'transparency' in image.info else 'RGB')
+        for size in sorted(sizes, reverse=True):
+            image.thumbnail((size, size)) # Cada tamanho parte do anterior, já reduzido
+            buffer = io.BytesIO()
+            image.save(buffer, THUMBNAIL_FORMAT, quality=80)
+            thumbnails.append((size, buffer.getvalue()))
+    return thumbnails[::-1]
+
+
+def _has_newer_job(job):
+    """Outro upload ou remoção pedido depois deste para o mesmo produto."""
+    return db.session.scalar(
+        db.select(ProductImageJob.id)
+        .where(ProductImageJob.product_id == job.product_id, ProductImageJob.id > job.id)
+        .limit(1)
+    ) is not None
+
+
+def _staging_dir():
+    return current_app.config['IMAGE_STAGING_DIR']
+
+
+def _upload(store, name, data, sizes):
+    """
+    Sobe a original e as miniaturas. Retorna (url da original, {tamanho: url}, blobs gravados).
+    Os nomes derivam do arquivo de staging: um job retomado depois do prazo regrava os mesmos blobs.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        content_type = Image.MIME.get(image.format, 'application/octet-stream')
+    thumbnails = make_thumbnails(data, sizes)
+    store.upload(name, data, content_type)
+    uploaded, thumbnail_urls = [name], {}
+    stem = os.path.splitext(name)[0]
+    for size, thumbnail in thumbnails:
+        thumbnail_name = f"thumbnails/{size}/{stem}.webp"
+        store.upload(thumbnail_name, thumbnail, THUMBNAIL_CONTENT_TYPE)
+        uploaded.append(thumbnail_name)
+        thumbnail_urls[str(size)] = store.public_url(thumbnail_name)
+    return store.public_url(name), thumbnail_urls, uploaded
+
+
+def _claim(job):
+    """Reserva o job por CLAIM_SECONDS e faz o commit: o lock da linha não fica preso durante o I/O."""
+    job.attempts += 1
+    job.next_attempt_at = datetime.now() + timedelta(seconds=CLAIM_SECONDS)
+    db.session.commit()
+
+
+def _discard_upload(job):
+    """Descarta um upload superado (ou cujo produto foi removido) junto com o arquivo de staging."""
+    staged_file = job.staged_file
+    db.session.delete(job)
+    db.session.commit()
+    discard_staged_image(_staging_dir(), staged_file)
+
+
+def process_image_job(store, job, sizes):
+    """
+    Processa um job já bloqueado pelo chamador.
+    O job é reservado e o commit sai antes de qualquer chamada ao bucket; o resultado é gravado depois,
+    numa transação curta que bloqueia de novo o job e o produto.
+    Uploads superados por um job mais novo do mesmo produto (ou de produto removido) são descartados;
+    os blobs da imagem substituída viram um job de remoção no mesmo commit da troca.
+    """
+    job_id = job.id
+    if job.obsolete_blobs is not None:
+        obsolete = list(job.obsolete_blobs)
+        _claim(job)
+        for name in obsolete:
+            store.delete(name)
+        job = db.session.get(ProductImageJob, job_id, with_for_update=True, populate_existing=True)
+        if job is not None:
+            db.session.delete(job)
+        db.session.commit()
+        return
+
+    if db.session.get(Product, job.product_id) is None or _has_newer_job(job):
+        _discard_upload(job)
+        return
+
+    product_id, name = job.product_id, job.staged_file
+    _claim(job)
+
+    try:
+        with open(os.path.join(_staging_dir(), name), 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        # O pod que recebeu a imagem foi substituído antes do processamento: não há o que tentar de novo
+        job = db.session.get(ProductImageJob, job_id, with_for_update=True, populate_existing=True)
+        if job is not None:
+            print(f"Warning: Arquivo de staging do job de imagem {job_id} não encontrado em {STAGING_HOST}")
+            _give_up(job)
+        db.session.commit()
+        return
+
+    image_url, thumbnail_urls, uploaded = _upload(store, name, data, sizes)
+
+    job = db.session.get(ProductImageJob, job_id, with_for_update=True, populate_existing=True)
+    if job is None:
+        # O prazo venceu e outro worker concluiu o job, com os mesmos blobs
+        db.session.commit()
+        return
+    product = db.session.get(Product, product_id, with_for_update=True, populate_existing=True)
+    # Limpezas geradas aqui não levam product_id, para não contarem como pedido mais novo
+    if product is None or _has_newer_job(job):
+        enqueue_blob_removal(uploaded)
+    else:
+        enqueue_blob_removal(product_image_blobs(store, product.product_image, product.image_thumbnails))
+        product.product_image = image_url
+        product.image_thumbnails = thumbnail_urls
+        product.image_status = IMAGE_STATUS_READY
+        invalidate_catalog(product_key(product.id))
+    db.session.delete(job)
+    db.session.commit()
+    discard_staged_image(_staging_dir(), name)
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)), BACKOFF_MAX_SECONDS))
+
+
+def _give_up(job):
+    """Descarta o job após MAX_IMAGE_ATTEMPTS; a imagem do produto fica como failed (o commit é do chamador)."""
+    if job.obsolete_blobs is None:
+        product = db.session.get(Product, job.product_id)
+        if product is not None and not _has_newer_job(job):
+            product.image_status = IMAGE_STATUS_FAILED
+            invalidate_catalog(product_key(product.id))
+        if job.staged_on == STAGING_HOST:
+            discard_staged_image(_staging_dir(), job.staged_file)
+    db.session.delete(job)
+
+
+def _record_failure(job_id, error):
+    job = db.session.get(ProductImageJob, job_id)
+    if job is None:
+        return
+    job.last_error = str(error)
+    print(f"Warning: Falha no job de imagem {job.id} (tentativa {job.attempts}): {error}")
+    if job.attempts < MAX_IMAGE_ATTEMPTS:
+        job.next_attempt_at = datetime.now() + _backoff(job.attempts)
+    else:
+        _give_up(job)
+    db.session.commit()
+
+
+def process_image_jobs(store, sizes, batch_size=10):
+    """
+    Processa até batch_size jobs pendentes, um por vez, em ordem de chegada. Jobs de um mesmo
+    produto nunca rodam em paralelo: um job só é elegível quando não há job mais antigo do produto na fila.
+    Uploads só são processados no pod que gravou o arquivo de staging; depois de STAGING_ORPHAN_SECONDS
+    (pod substituído) qualquer worker os pega e, sem o arquivo, marca a imagem como failed.
+    Jobs com erro são tentados de novo com backoff exponencial; após MAX_IMAGE_ATTEMPTS (contando
+    reservas de workers que morreram no meio) o job é descartado e a imagem do produto fica como failed.
+    Retorna quantos jobs foram concluídos.
+    """
+    older = db.aliased(ProductImageJob)
+    done = 0
+    for _ in range(batch_size):
+        now = datetime.now()
+        job = db.session.execute(
+            db.select(ProductImageJob)
+            .where(ProductImageJob.next_attempt_at <= now, ~db.exists().where(
+                older.product_id == ProductImageJob.product_id, older.id < ProductImageJob.id
+            ), db.or_(
+                ProductImageJob.staged_on.is_(None),
+                ProductImageJob.staged_on == STAGING_HOST,
+                ProductImageJob.created_at < now - timedelta(seconds=STAGING_ORPHAN_SECONDS),
+            ))
+            .order_by(ProductImageJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True) # Permite mais de um worker em paralelo
+        ).scalar_one_or_none()
+        if job is None:
+            db.session.commit()
+            break
+        if job.attempts >= MAX_IMAGE_ATTEMPTS:
+            # Reservado até o limite sem registrar falha: o worker morreu no meio de cada tentativa
+            print(f"Warning: Job de imagem {job.id} descartado após {job.attempts} tentativas interrompidas")
+            _give_up(job)
+            db.session.commit()
+            continue
+        job_id = job.id
+        try:
+            process_image_job(store, job, sizes)
+            done += 1
+        except Exception as e:
+            db.session.rollback()
+            _record_failure(job_id, e)
+    return done
+
+
+def run_image_worker(app, store, batch_size=None, poll_interval=None):
+    """Loop do worker: drena a fila de imagens e dorme quando não há jobs pendentes."""
+    batch_size = batch_size or app.config.get('IMAGE_WORKER_BATCH_SIZE', 10)
+    poll_interval = poll_interval or app.config.get('IMAGE_WORKER_POLL_INTERVAL', 1.0)
+
+    with app.app_context():
+        sizes = app.config['IMAGE_THUMBNAIL_SIZES']
+        while True:
+            try:
+                done = process_image_jobs(store, sizes, batch_size)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error processing image jobs: {e}")
+                done = 0
+            finally:
+                db.session.close()
+
+            if done < batch_size:
+                time.sleep(poll_interval)
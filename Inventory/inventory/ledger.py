@@ -0,0 +1,179 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect
+from inventory import db
+from inventory.models import Product, Stock, StockMovement, StockSnapshot
+from inventory.database import lock_init_db, ddl_connection
+
+# Motivos registrados no ledger
+REASON_OPENING = 'opening'
+REASON_SALE = 'sale'
+REASON_ADJUSTMENT = 'adjustment'
+REASON_TRANSFER_IN = 'transfer_in'
+REASON_TRANSFER_OUT = 'transfer_out'
+REASON_REMOVAL = 'removal'
+
+movement = StockMovement.__table__
+
+
+def record_movements(movements):
+    """Insere as movimentações [{product_id, inventory_location_id, delta, reason, reference}] na transação atual."""
+    movements = [m for m in movements if m['delta']]
+    if movements:
+        db.session.execute(db.insert(StockMovement), [
+            {'inventory_location_id': None, 'reference': None, **m} for m in movements
+        ])
+
+
+# --- Escritas pelo ORM (rotas de produto e de estoque) viram movimentações automaticamente ---
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+# active_history: o valor anterior é carregado mesmo com o atributo expirado, para o after_update calcular o delta
+for _attribute in (Product.quantity, Stock.quantity, Stock.product_id, Stock.inventory_location_id):
+    event.listen(_attribute, 'set', _keep_old_value, active_history=True, retval=True)
+
+
+def _old_and_new(target, attribute):
+    history = inspect(target).attrs[attribute].history
+    new = getattr(target, attribute)
+    if history.deleted:
+        return history.deleted[0], new
+    return new, new
+
+
+def _insert_movement(connection, product_id, location_id, delta, reason):
+    if delta:
+        connection.execute(movement.insert().values(
+            product_id=product_id, inventory_location_id=location_id, delta=delta,
+            reason=reason, created_at=datetime.now()
+        ))
+
+
+@event.listens_for(Product, 'after_insert')
+def _product_inserted(mapper, connection, target):
+    _insert_movement(connection, target.id, None, target.quantity or 0, REASON_OPENING)
+
+
+@event.listens_for(Product, 'after_update')
+def _product_updated(mapper, connection, target):
+    old, new = _old_and_new(target, 'quantity')
+    _insert_movement(connection, target.id, None, (new or 0) - (old or 0), REASON_ADJUSTMENT)
+
+
+@event.listens_for(Product, 'before_delete')
+def _product_deleted(mapper, connection, target):
+    _insert_movement(connection, target.id, None, -(target.quantity or 0), REASON_REMOVAL)
+
+
+@event.listens_for(Stock, 'after_insert')
+def _stock_inserted(mapper, connection, target):
+    _insert_movement(connection, target.product_id, target.inventory_location_id, target.quantity, REASON_ADJUSTMENT)
+
+
+@event.listens_for(Stock, 'after_update')
+def _stock_updated(mapper, connection, target):
+    old_product, new_product = _old_and_new(target, 'product_id')
+    old_location, new_location = _old_and_new(target, 'inventory_location_id')
+    old_quantity, new_quantity = _old_and_new(target, 'quantity')
+    if (old_product, old_location) == (new_product, new_location):
+        _insert_movement(connection, new_product, new_location, new_quantity - old_quantity, REASON_ADJUSTMENT)
+    else:
+        # Registro movido para outro produto/local: sai tudo de um e entra no outro
+        _insert_movement(connection, old_product, old_location, -old_quantity, REASON_ADJUSTMENT)
+        _insert_movement(connection, new_product, new_location, new_quantity, REASON_ADJUSTMENT)
+
+
+@event.listens_for(Stock, 'before_delete')
+def _stock_deleted(mapper, connection, target):
+    _insert_movement(connection, target.product_id, target.inventory_location_id, -target.quantity, REASON_REMOVAL)
+
+
+# --- Saldos derivados: snapshot mais recente + cauda do ledger ---
+
+def latest_snapshot_time(as_of):
+    return db.session.scalar(db.select(db.func.max(StockSnapshot.taken_at)).where(StockSnapshot.taken_at <= as_of))
+
+
+def stock_levels_query(as_of, snapshot_time=None, product_ids=None, inventory_location_id=None, product_level=False):
+    """
+    SELECT product_id, inventory_location_id, quantity com o saldo em as_of, a partir do
+    snapshot tirado em snapshot_time (ou do ledger inteiro, se não houver snapshot).
+    product_level restringe ao saldo geral dos produtos (inventory_location_id nulo).
+    Só retorna saldos diferentes de zero.
+    """
+    tail = db.select(
+        StockMovement.product_id, StockMovement.inventory_location_id, StockMovement.delta.label('quantity')
+    ).where(StockMovement.created_at <= as_of)
+    if snapshot_time is not None:
+        tail = tail.where(StockMovement.created_at > snapshot_time)
+    parts = [tail]
+    if snapshot_time is not None:
+        parts.append(
+            db.select(StockSnapshot.product_id, StockSnapshot.inventory_location_id, StockSnapshot.quantity)
+            .where(StockSnapshot.taken_at == snapshot_time)
+        )
+
+    if product_ids is not None:
+        parts = [part.where(part.selected_columns.product_id.in_(product_ids)) for part in parts]
+    if inventory_location_id is not None:
+        parts = [part.where(part.selected_columns.inventory_location_id == inventory_location_id) for part in parts]
+    elif product_level:
+        parts = [part.where(part.selected_columns.inventory_location_id.is_(None)) for part in parts]
+
+    combined = db.union_all(*parts).subquery() if len(parts) > 1 else parts[0].subquery()
+    total = db.func.sum(combined.c.quantity)
+    return (
+        db.select(combined.c.product_id, combined.c.inventory_location_id, total.label('quantity'))
+        .group_by(combined.c.product_id, combined.c.inventory_location_id)
+        .having(total != 0)
+        .order_by(combined.c.product_id, combined.c.inventory_location_id)
+    )
+
+
+def get_stock_levels(as_of, **filters):
+    query = stock_levels_query(as_of, latest_snapshot_time(as_of), **filters)
+    return db.session.execute(query).all()
+
+
+def current_product_balances(product_ids):
+    """Saldo geral (sem local) de cada produto segundo o ledger."""
+    rows = get_stock_levels(datetime.now(), product_ids=list(product_ids), product_level=True)
+    return {product_id: quantity for product_id, _, quantity in rows}
+
+
+def take_stock_snapshot(lag_seconds=0):
+    """
+    Grava o saldo de todos os (produto, local) em now - lag_seconds, a partir do snapshot anterior
+    e do ledger, em um único INSERT ... SELECT. Retorna (taken_at, linhas gravadas).
+    """
+    taken_at = datetime.now() - timedelta(seconds=lag_seconds)
+    previous = latest_snapshot_time(taken_at)
+    if previous is not None and previous >= taken_at:
+        return previous, 0
+    levels = stock_levels_query(taken_at, previous).subquery()
+    result = db.session.execute(
+        db.insert(StockSnapshot).from_select(
+            ['product_id', 'inventory_location_id', 'quantity', 'taken_at'],
+            db.select(levels.c.product_id, levels.c.inventory_location_id, levels.c.quantity, db.literal(taken_at))
+        )
+    )
+    db.session.commit()
+    return taken_at, result.rowcount
+
+
+def seed_opening_balances(db):
+    """Primeira carga do ledger (chamado no init_db): uma movimentação 'opening' por saldo já existente."""
+    with ddl_connection(db.engine) as conn:
+        lock_init_db(db, conn) # Sem o lock, dois processos veem o ledger vazio e dobram os saldos
+        if conn.execute(db.select(movement.c.id).limit(1)).first():
+            return
+        now = datetime.now()
+        columns = ['product_id', 'inventory_location_id', 'delta', 'reason', 'created_at']
+        conn.execute(movement.insert().from_select(columns, db.select(
+            Product.id, db.null(), Product.quantity, db.literal(REASON_OPENING), db.literal(now)
+        ).where(Product.quantity != 0)))
+        conn.execute(movement.insert().from_select(columns, db.select(
+            Stock.product_id, Stock.inventory_location_id, Stock.quantity, db.literal(REASON_OPENING), db.literal(now)
+        ).where(Stock.quantity != 0)))
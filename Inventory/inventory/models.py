@@ -1,3 +1,4 @@
+from datetime import datetime
 from inventory import db
 from flask import url_for
 
@@ -20,6 +21,29 @@ class Category(db.Model):
             'details_model': self.details_model,
             'parent_category': self.parent_category_id
         }
+
+
+class CategoryClosure(db.Model):
+    """Tabela de fechamento da hierarquia de categorias: uma linha por par (ancestral, descendente)."""
+    __tablename__ = 'category_closure'
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey("category.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey("category.id", ondelete="CASCADE"), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_category_closure_descendant_ancestor', 'descendant_id', 'ancestor_id'),
+    )
+
+    def __repr__(self):
+        return f'<Category Closure {self.ancestor_id} -> {self.descendant_id}>'
+
+    def to_dict(self):
+        return {
+            'ancestor_id': self.ancestor_id,
+            'descendant_id': self.descendant_id,
+            'depth': self.depth
+        }
     
 
 class Inventory(db.Model):
@@ -55,6 +79,40 @@ class Product(db.Model):
     category = db.Column(db.String, nullable = True)
     quantity = db.Column(db.Integer, nullable = True)
     minimum_stock = db.Column(db.Integer, nullable = True)
+    # Imagem processada em segundo plano (inventory/images.py): pending -> ready | failed
+    image_status = db.Column(db.String(20), nullable=True)
+    image_thumbnails = db.Column(db.JSON, nullable=True) # {"200": url, "600": url}
+
+    # Índices trigram (pg_trgm) para a busca por nome/descrição; só existem no PostgreSQL
+    __table_args__ = (
+        db.Index('ix_products_name_trgm', 'name', postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        db.Index('ix_products_desc_trgm', 'desc', postgresql_using='gin', postgresql_ops={'desc': 'gin_trgm_ops'}).ddl_if(dialect='postgresql'),
+        # Filtros da listagem paginada (category_id e estoque baixo), ambos em ordem de id
+        db.Index('ix_products_category_id_id', 'category_id', 'id'),
+        db.Index('ix_products_low_stock', 'id',
+                 postgresql_where=db.text('quantity <= minimum_stock'),
+                 sqlite_where=db.text('quantity <= minimum_stock')),
+    )
+
+    # Colunas necessárias para cada chave de to_dict(), usadas pelo ?fields= da listagem
+    FIELD_COLUMNS = {
+        'id': ('id',),
+        'name': ('name',),
+        'desc': ('desc',),
+        'buy_price': ('buy_price',),
+        'sell_price': ('sell_price',),
+        'category_id': ('category_id',),
+        'category_details': ('category_details',),
+        'product_image': ('product_image',),
+        'profit': ('sell_price', 'buy_price'),
+        'category': ('category',),
+        'quantity': ('quantity',),
+        'code': ('id',),
+        'price': ('sell_price',),
+        'minimum_stock': ('minimum_stock',),
+        'image_status': ('image_status',),
+        'image_thumbnails': ('image_thumbnails',)
+    }
 
     def __repr__(self):
         return f'<Name {self.name}>'
@@ -76,8 +134,20 @@ class Product(db.Model):
             'quantity': self.quantity,
             'code': self.id,
             'price': self.sell_price,
-            'minimum_stock': self.minimum_stock
+            'minimum_stock': self.minimum_stock,
+            'image_status': self.image_status,
+            'image_thumbnails': self.image_thumbnails
+        }
+
+    @staticmethod
+    def partial_dict(row, fields):
+        """Como to_dict(), mas só com `fields`, a partir de uma linha que contém apenas FIELD_COLUMNS desses campos."""
+        derived = {
+            'profit': lambda: row.sell_price - row.buy_price if row.sell_price is not None else None,
+            'code': lambda: row.id,
+            'price': lambda: row.sell_price
         }
+        return {field: derived[field]() if field in derived else getattr(row, field) for field in fields}
     
 
 class Stock(db.Model):
@@ -88,6 +158,13 @@ class Stock(db.Model):
     inventory_location_id = db.Column(db.Integer, db.ForeignKey("inventory.id", ondelete="SET NULL"), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
 
+    # Cobrem os agrupamentos do /stock/summary; no PostgreSQL quantity vai no INCLUDE (index-only scan).
+    # O único também é o alvo do ON CONFLICT do /stock/bulk: um registro por produto e local.
+    __table_args__ = (
+        db.Index('uq_stock_product_location', 'product_id', 'inventory_location_id', unique=True, postgresql_include=['quantity']),
+        db.Index('ix_stock_location_product', 'inventory_location_id', 'product_id', postgresql_include=['quantity']),
+    )
+
     def __repr__(self):
         return f'<Units: {self.quantity}> <Product: {self.product_id}> <Inventory: {self.inventory_id}>'
     
@@ -97,4 +174,171 @@ class Stock(db.Model):
             'product_id': self.product_id,
             'inventory_location_id': self.inventory_location_id,
             'quantity': self.quantity
-        }
\ No newline at end of file
+        }
+
+class ProcessedMessage(db.Model):
+    __tablename__ = 'processed_messages'
+
+    message_id = db.Column(db.String(100), primary_key=True)
+    processed_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+    def __repr__(self):
+        return f'<Processed Message {self.message_id}>'
+
+    def to_dict(self):
+        return {
+            'message_id': self.message_id,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None
+        }
+
+
+class CatalogChange(db.Model):
+    """Log append-only das chaves do cache do catálogo alteradas; cada worker lê as mudanças recentes e invalida só essas chaves."""
+    __tablename__ = 'catalog_change'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    key = db.Column(db.String(200), nullable=False)
+    changed_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+    def __repr__(self):
+        return f'<Catalog Change {self.key}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'key': self.key,
+            'changed_at': self.changed_at.isoformat() if self.changed_at else None
+        }
+
+
+class StockMovement(db.Model):
+    """
+    Ledger append-only de movimentações de estoque. inventory_location_id nulo indica o
+    saldo geral do produto (Product.quantity), que é o baixado pelas vendas.
+    Sem FKs: o histórico sobrevive à remoção do produto ou do local.
+    """
+    __tablename__ = 'stock_movement'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    inventory_location_id = db.Column(db.Integer, nullable=True)
+    delta = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(20), nullable=False)
+    reference = db.Column(db.String(100), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now, index=True)
+
+    __table_args__ = (
+        db.Index('ix_stock_movement_product_location_created', 'product_id', 'inventory_location_id', 'created_at'),
+    )
+
+    def __repr__(self):
+        return f'<Stock Movement {self.product_id}@{self.inventory_location_id}: {self.delta}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'inventory_location_id': self.inventory_location_id,
+            'delta': self.delta,
+            'reason': self.reason,
+            'reference': self.reference,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class StockSnapshot(db.Model):
+    """Saldo por (produto, local) em taken_at; o saldo em outro instante é o snapshot anterior mais o ledger."""
+    __tablename__ = 'stock_snapshot'
+
+    id = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True)
+    product_id = db.Column(db.Integer, nullable=False)
+    inventory_location_id = db.Column(db.Integer, nullable=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    taken_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_stock_snapshot_taken_product_location', 'taken_at', 'product_id', 'inventory_location_id'),
+    )
+
+    def __repr__(self):
+        return f'<Stock Snapshot {self.product_id}@{self.inventory_location_id}: {self.quantity}>'
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'inventory_location_id': self.inventory_location_id,
+            'quantity': self.quantity,
+            'taken_at': self.taken_at.isoformat() if self.taken_at else None
+        }
+
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox'
+
+    id = db.Column(db.Integer, primary_key=True, index=True)
+    topic = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    published_at = db.Column(db.DateTime, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    last_error = db.Column(db.Text, nullable=True)
+
+    # O relay só lê mensagens pendentes, em ordem de chegada
+    __table_args__ = (
+        db.Index('ix_outbox_pending', 'published_at', 'next_attempt_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<Outbox Message {self.id} ({self.topic})>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'topic': self.topic,
+            'payload': self.payload,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'published_at': self.published_at.isoformat() if self.published_at else None,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error
+        }
+
+
+class ProductImageJob(db.Model):
+    """
+    Fila do pipeline de imagens: upload de uma nova imagem (staged_file, a original gravada pela
+    requisição no disco do pod staged_on) ou remoção de blobs que deixaram de ser usados (obsolete_blobs).
+    """
+    __tablename__ = 'product_image_job'
+
+    id = db.Column(db.Integer, primary_key=True, index=True)
+    product_id = db.Column(db.Integer, nullable=True) # Sem FK: o produto pode ser removido antes do processamento
+    staged_file = db.Column(db.String, nullable=True)
+    staged_on = db.Column(db.String(255), nullable=True)
+    obsolete_blobs = db.Column(db.JSON, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    last_error = db.Column(db.Text, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_product_image_job_pending', 'next_attempt_at', 'id'),
+        db.Index('ix_product_image_job_product', 'product_id', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<Product Image Job {self.id} (product {self.product_id})>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'product_id': self.product_id,
+            'staged_file': self.staged_file,
+            'staged_on': self.staged_on,
+            'obsolete_blobs': self.obsolete_blobs,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error
+        }
@@ -0,0 +1,128 @@
+import csv
+import io
+import json
+from inventory import db
+from inventory.models import Product, Category
+from inventory.ledger import record_movements, REASON_OPENING
+
+# Content-Types aceitos pelo POST /products/import
+IMPORT_FORMATS = {
+    'text/csv': 'csv',
+    'application/x-ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+}
+
+DEFAULT_MINIMUM_STOCK = 10
+
+
+class RowError(ValueError):
+    pass
+
+
+def iter_rows(stream, fmt):
+    """
+    Lê o corpo da requisição linha a linha, sem carregá-lo inteiro em memória.
+    Gera (número da linha, dict) ou (número da linha, RowError) para linhas que não puderam ser lidas.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            yield row_number, {key: value for key, value in row.items() if key and value not in (None, '')}
+        return
+
+    for row_number, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield row_number, RowError(f"Invalid JSON: {e}")
+            continue
+        if not isinstance(row, dict):
+            yield row_number, RowError("Each line must be a JSON object")
+            continue
+        yield row_number, row
+
+
+def load_category_map():
+    """IDs e nomes (em minúsculas) de todas as categorias, carregados uma vez por importação."""
+    by_id, by_name = {}, {}
+    for category_id, name in db.session.execute(db.select(Category.id, Category.name)):
+        by_id[category_id] = name
+        by_name.setdefault(name.lower(), category_id)
+    return by_id, by_name
+
+
+def _number(row, field, cast, required=False, default=None):
+    value = row.get(field)
+    if value is None:
+        if required:
+            raise RowError(f"'{field}' is required")
+        return default
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        raise RowError(f"'{field}' must be a number")
+
+
+def _integer(row, field, default=None):
+    """Como _number(..., int), mas rejeita valores fracionários em vez de truncá-los (1.5 não vira 1)."""
+    value = row.get(field)
+    if value is None:
+        return default
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise RowError(f"'{field}' must be an integer")
+    try:
+        return int(value) # "1.5" também falha aqui
+    except (TypeError, ValueError):
+        raise RowError(f"'{field}' must be an integer")
+
+
+def product_params(row, categories):
+    """Valida uma linha e devolve os parâmetros do INSERT em products (levanta RowError)."""
+    name = row.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise RowError("'name' is required")
+
+    by_id, by_name = categories
+    category_id = _integer(row, 'category_id')
+    category = row.get('category')
+    if category_id is not None:
+        if category_id not in by_id:
+            raise RowError(f"Category {category_id} not found")
+        category = category or by_id[category_id]
+    elif category:
+        # Sem category_id: associa pela categoria de mesmo nome, se existir
+        category_id = by_name.get(str(category).lower())
+
+    quantity = _integer(row, 'quantity', default=0)
+    minimum_stock = _integer(row, 'minimum_stock', default=DEFAULT_MINIMUM_STOCK)
+    if quantity < 0 or minimum_stock < 0:
+        raise RowError("'quantity' and 'minimum_stock' must not be negative")
+
+    return {
+        'name': name.strip(),
+        'buy_price': _number(row, 'buy_price', float, required=True),
+        'sell_price': _number(row, 'sell_price', float, default=0.0), # Como em create_product
+        'desc': row.get('desc'),
+        'category_id': category_id,
+        'category': category,
+        'category_details': row.get('category_details'),
+        'quantity': quantity,
+        'minimum_stock': minimum_stock,
+    }
+
+
+def insert_chunk(chunk):
+    """
+    Insere um lote de produtos em um único executemany (insertmanyvalues) e registra o saldo
+    inicial no ledger, que as escritas em massa não disparam pelos eventos do ORM. Retorna os IDs.
+    """
+    product_ids = db.session.scalars(
+        db.insert(Product).returning(Product.id, sort_by_parameter_order=True), chunk
+    ).all()
+    record_movements([
+        {'product_id': product_id, 'delta': params['quantity'], 'reason': REASON_OPENING}
+        for product_id, params in zip(product_ids, chunk)
+    ])
+    return product_ids
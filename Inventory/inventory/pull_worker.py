@@ -0,0 +1,134 @@
+import json
+import queue
+import time
+from inventory import db
+from inventory.idempotency import filter_processed_messages, record_processed_messages
+from inventory.routes.pubsub_handles import parse_inventory_update, apply_inventory_update
+
+
+class InventoryPullWorker:
+    """
+    Consome inventory-updates por streaming pull, em micro-lotes.
+
+    O callback do SubscriberClient só enfileira as mensagens; o loop principal junta
+    até batch_size mensagens (ou o que chegar em batch_latency_ms após a primeira),
+    aplica o lote inteiro em uma transação e só então dá ack. Se o commit falhar,
+    todas as mensagens do lote recebem nack e são reentregues pelo Pub/Sub.
+    """
+
+    def __init__(self, app, subscriber, subscription_path, batch_size=100, batch_latency_ms=200, flow_control=None):
+        self.app = app
+        self.subscriber = subscriber
+        self.subscription_path = subscription_path
+        self.batch_size = batch_size
+        self.batch_latency = batch_latency_ms / 1000
+        self.flow_control = flow_control
+        self._messages = queue.Queue()
+        self._streaming_pull_future = None
+        self._running = False
+
+    def _on_message(self, message):
+        self._messages.put(message)
+
+    def start(self):
+        kwargs = {"callback": self._on_message}
+        if self.flow_control is not None:
+            kwargs["flow_control"] = self.flow_control
+        self._streaming_pull_future = self.subscriber.subscribe(self.subscription_path, **kwargs)
+        self._running = True
+        return self._streaming_pull_future
+
+    def stop(self):
+        self._running = False
+        if self._streaming_pull_future is not None:
+            self._streaming_pull_future.cancel()
+
+    def next_batch(self, wait=1.0):
+        """Bloqueia até `wait` segundos pela primeira mensagem e completa o lote por tamanho ou latência."""
+        try:
+            batch = [self._messages.get(timeout=wait)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.batch_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._messages.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def process_batch(self, messages):
+        """Aplica um lote de mensagens em uma única transação. Retorna quantas mensagens alteraram o estoque."""
+        processed_messages = self.app.extensions['processed_messages']
+        to_apply = []
+        seen_ids = set()
+        for message in messages:
+            if message.message_id in processed_messages or message.message_id in seen_ids:
+                message.ack() # Redelivery: já aplicada
+                continue
+            try:
+                quantities = parse_inventory_update(json.loads(message.data.decode('utf-8')))
+            except (ValueError, UnicodeDecodeError) as e:
+                # Mensagem inválida nunca vai ser processada: ack para não ficar em loop de reentrega
+                print(f"Error: Invalid inventory update message {message.message_id}: {e}")
+                message.ack()
+                continue
+            seen_ids.add(message.message_id)
+            to_apply.append((message, quantities))
+
+        if not to_apply:
+            return 0
+
+        with self.app.app_context():
+            try:
+                already_processed = filter_processed_messages([message.message_id for message, _ in to_apply])
+                pending = [(message, quantities) for message, quantities in to_apply if message.message_id not in already_processed]
+
+                totals = {}
+                for _, quantities in pending:
+                    for product_id, quantity_sold in quantities.items():
+                        totals[product_id] = totals.get(product_id, 0) + quantity_sold
+
+                if pending:
+                    record_processed_messages([message.message_id for message, _ in pending])
+                    new_quantities = apply_inventory_update(
+                        totals, messages=[(message.message_id, quantities) for message, quantities in pending]
+                    )
+                    missing_product_ids = [product_id for product_id in totals if product_id not in new_quantities]
+                    if missing_product_ids:
+                        print(f"Warning: Products {missing_product_ids} not found for update. Skipping them.")
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error applying batch of {len(to_apply)} inventory updates: {e}")
+                for message, _ in to_apply:
+                    message.nack()
+                return 0
+            finally:
+                db.session.close()
+
+        # Ack somente depois do commit
+        for message, _ in to_apply:
+            message.ack()
+            processed_messages.add(message.message_id)
+        self.app.logger.info(f"Applied batch of {len(pending)} inventory updates ({len(to_apply) - len(pending)} duplicates).")
+        return len(pending)
+
+    def run(self):
+        self.start()
+        print(f"Listening for messages on {self.subscription_path}...")
+        try:
+            while self._running:
+                batch = self.next_batch()
+                if batch:
+                    self.process_batch(batch)
+                elif self._streaming_pull_future.done():
+                    # Stream encerrado (erro ou cancelamento): propaga a exceção, se houver
+                    self._streaming_pull_future.result()
+                    break
+        finally:
+            self.stop()
@@ -1,6 +1,8 @@
-from flask import Blueprint, request, jsonify, Response, url_for
+from flask import Blueprint, request, jsonify, Response, url_for, current_app
 from inventory.models import Category
 from inventory import db
+from inventory.cache import invalidate_catalog, CATEGORIES_KEY, PRODUCTS_KEY, LOW_STOCK_KEY
+from inventory.category_tree import get_subtree, is_in_subtree
 from flask_jwt_extended import jwt_required
 
 category_bp = Blueprint('category', __name__)
@@ -40,25 +42,27 @@ def create_category():
 
     try:
         db.session.add(new_category)
+        invalidate_catalog(CATEGORIES_KEY)
         db.session.commit()
-        db.session.refresh(new_category)
+        category_data_dict = new_category.to_dict()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Failed to save category to database", "details_dev": str(e)}), 500
     finally:
         db.session.close()
 
-    location_uri = url_for('category.get_category_by_id', category_id=new_category.id, _external=True)
+    location_uri = url_for('category.get_category_by_id', category_id=category_data_dict['id'], _external=True)
 
-    return jsonify(new_category.to_dict()), 201, {'Location': location_uri}
+    return jsonify(category_data_dict), 201, {'Location': location_uri}
 
 
 @category_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_all_categories():
     try:
-        categories = Category.query.all()
-        categories_dict = [category.to_dict() for category in categories]
+        categories_dict = current_app.extensions['catalog_cache'].get_or_load(
+            CATEGORIES_KEY, lambda: [category.to_dict() for category in Category.query.all()]
+        )
         return jsonify(categories_dict), 200
     except Exception as e:
         return jsonify({"error": "An internal server error occurred", "details_dev": str(e)}), 500
@@ -77,6 +81,19 @@ def get_category_by_id(category_id: int):
         return jsonify({"msg": "Category not found"}), 404
 
 
+@category_bp.route('/<int:category_id>/subtree', methods=['GET'])
+@jwt_required()
+def get_category_subtree(category_id: int):
+    try:
+        rows = get_subtree(category_id)
+    except Exception as e:
+        return jsonify({"error": "An internal server error occurred while fetching category subtree", "details_dev": str(e)}), 500
+
+    if not rows:
+        return jsonify({"msg": "Category not found"}), 404
+    return jsonify([{**category.to_dict(), 'depth': depth} for category, depth in rows]), 200
+
+
 @category_bp.route('/<int:category_id>', methods=['PUT'])
 @jwt_required()
 def update_category_by_id(category_id: int):
@@ -109,6 +126,8 @@ def update_category_by_id(category_id: int):
         if not parent_category:
             # Swagger 404: ErrorResponse (Categoria pai não encontrada)
             return jsonify({"msg": "Parent category not found"}), 404
+        if is_in_subtree(parent_category_id, category_id):
+            return jsonify({"msg": "Invalid data for update.", "details": {"parent_category_id": "A category cannot be moved under itself or its own subcategories."}}), 422
 
     category.name = data.get('name', category.name)
     category.details_model = data.get('details_model', category.details_model)
@@ -116,6 +135,7 @@ def update_category_by_id(category_id: int):
         category.parent_category_id = parent_category_id
     
     try:
+        invalidate_catalog(CATEGORIES_KEY)
         db.session.commit()
         category_data_dict = category.to_dict()
     except Exception as e:
@@ -140,6 +160,8 @@ def delete_category_by_id(category_id: int):
     
     try:
         db.session.delete(category)
+        # ON DELETE SET NULL também altera o category_id dos produtos
+        invalidate_catalog(CATEGORIES_KEY, PRODUCTS_KEY, LOW_STOCK_KEY)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -1,4 +1,5 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, current_app
+from inventory.clients import clients
 
 health_bp = Blueprint('health', __name__)
 
@@ -6,6 +7,26 @@ health_bp = Blueprint('health', __name__)
 def health_check():
     return jsonify({"status": "ok"}), 200
 
+@health_bp.route('/readyz', methods=['GET'])
+def readiness_check():
+    """Readiness probe: constrói os clients de WARM_UP_CLIENTS para a primeira requisição não pagar por isso."""
+    try:
+        clients.warm_up(current_app.config['WARM_UP_CLIENTS'])
+    except Exception as e:
+        return jsonify({"status": "unavailable", "error": str(e)}), 503
+    return jsonify({"status": "ready", "clients": clients.created()}), 200
+
+@health_bp.route('/metrics/cache', methods=['GET'])
+def cache_metrics():
+    return jsonify({
+        "catalog": current_app.extensions['catalog_cache'].stats(),
+        "signed_urls": current_app.extensions['signed_url_cache'].stats(),
+    }), 200
+
+@health_bp.route('/metrics/db', methods=['GET'])
+def db_pool_metrics():
+    return jsonify(current_app.extensions['db_pool_metrics'].stats()), 200
+
 @health_bp.route('/', methods=['GET'])
 def root_check():
     return jsonify({"message": "Inventory Service Root"}), 200
\ No newline at end of file
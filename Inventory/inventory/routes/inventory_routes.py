@@ -35,16 +35,16 @@ def create_inventory_location():
     try:
         db.session.add(new_location)
         db.session.commit()
-        db.session.refresh(new_location)
+        location_data_dict = new_location.to_dict()
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Failed to save inventory location to database", "details_dev": str(e)}), 500
     finally:
         db.session.close()
 
-    location_uri = url_for('inventory.get_inventory_location_by_id', location_id=new_location.id, _external=True)
+    location_uri = url_for('inventory.get_inventory_location_by_id', location_id=location_data_dict['id'], _external=True)
 
-    return jsonify(new_location.to_dict()), 201, {'Location': location_uri}
+    return jsonify(location_data_dict), 201, {'Location': location_uri}
 
 
 @inventory_bp.route('/', methods=['GET'])
@@ -1,17 +1,30 @@
+import base64
 import json
-import os
-from werkzeug.utils import secure_filename
-from flask import Blueprint, request, jsonify, Response, url_for, current_app, send_from_directory
+from flask import Blueprint, request, jsonify, Response, url_for, current_app, send_from_directory, stream_with_context
 from inventory.models import Product, Category
 from inventory import db
+from inventory.search import search_products
+from inventory.cache import invalidate_catalog, product_key, low_stock_page_key, LOW_STOCK_KEY
+from inventory.category_tree import subtree_ids_query
+from inventory.export import export_format, stream_query, export_response
+from inventory.images import (LocalImageStore, read_image_upload, stage_image_upload, discard_staged_image,
+                              enqueue_image_upload, clear_product_image, enqueue_blob_removal, product_image_blobs)
+from inventory.signed_urls import attach_image_urls
+from inventory.product_import import IMPORT_FORMATS, RowError, iter_rows, load_category_map, product_params, insert_chunk
 from flask_jwt_extended import jwt_required
-from google.cloud import storage
 
 product_bp = Blueprint('products', __name__)
 
-storage_client = None
-if os.environ.get('KUBERNETES_DEPLOYMENT'):
-    storage_client = storage.Client()
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+
+MAX_BULK_MINIMUM_STOCK = 10000
+
+MAX_IMPORT_CHUNK_SIZE = 10000
+MAX_IMPORT_ERROR_LINES = 1000
 
 
 @product_bp.route('/', methods=['POST'])
@@ -49,27 +62,15 @@ def create_product():
     if not category:
         return jsonify({"msg": "Categoria não encontrada"}), 404
 
-    product_image_url = None
-    if 'image' in request.files:
+    # Aqui a imagem só é validada e gravada no disco do pod; bucket, miniaturas e troca ficam com o image_worker
+    image_upload = None
+    if 'image' in request.files and request.files['image'].filename != '':
         image_file = request.files['image']
-        if image_file.filename != '':
-            # Generate a unique filename for GCS
-            import uuid
-            unique_filename = f"{uuid.uuid4()}_{secure_filename(image_file.filename)}"
-            
-            try:
-                bucket_name = current_app.config['GCS_BUCKET_NAME']
-                bucket = storage_client.bucket(bucket_name)
-                blob = bucket.blob(unique_filename)
-                
-                # Upload the file
-                blob.upload_from_file(image_file, content_type=image_file.content_type)
-
-                product_image_url = blob.public_url
-
-            except Exception as e:
-                return jsonify({"error": f"Falha ao fazer upload da imagem para GCS: {str(e)}"}), 500
-
+        try:
+            image_data = read_image_upload(image_file, current_app.config['IMAGE_MAX_BYTES'])
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 422
+        image_upload = (image_data, image_file.filename)
 
     new_product = Product(
         name=name,
@@ -78,47 +79,329 @@ def create_product():
         sell_price=sell_price,
         category_id=category_id,
         category_details=data.get('category_details'),
-        product_image=product_image_url, # Store the GCS Public URL
         category=category,
         quantity=quantity,
-        minimum_stock=10 # Default minimum stock, can be adjusted later
+        minimum_stock=data.get('minimum_stock', 10) # Padrão: 10 unidades
     )
 
+    staging_dir = current_app.config['IMAGE_STAGING_DIR']
+    staged_file = None
+    if image_upload:
+        try:
+            staged_file = stage_image_upload(staging_dir, *image_upload)
+        except OSError as e:
+            return jsonify({"error": "Failed to store product image", "details_dev": str(e)}), 500
+
     try:
         db.session.add(new_product)
+        db.session.flush()
+        if staged_file:
+            enqueue_image_upload(new_product, staged_file)
+        invalidate_catalog(LOW_STOCK_KEY) # O produto novo não pode estar no cache
         db.session.commit()
-        db.session.refresh(new_product)
+        product_data_dict = new_product.to_dict()
     except Exception as e:
         db.session.rollback()
+        if staged_file:
+            discard_staged_image(staging_dir, staged_file)
         return jsonify({"error": "Falha ao salvar o produto no banco de dados", "details_dev": str(e)}), 500
     finally:
         db.session.close()
 
-    location_uri = url_for('products.get_product_by_id', product_id=new_product.id, _external=True)
+    location_uri = url_for('products.get_product_by_id', product_id=product_data_dict['id'], _external=True)
 
-    return jsonify(new_product.to_dict()), 201, {'Location': location_uri}
+    return jsonify(product_data_dict), 201, {'Location': location_uri}
+
+
+def _encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps([last_id]).encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    (last_id,) = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    return int(last_id)
 
 
 @product_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_all_products():
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        return jsonify({"msg": "Limit must be a positive integer"}), 400
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    after_id = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after_id = _decode_cursor(cursor)
+        except Exception:
+            return jsonify({"msg": "Invalid cursor"}), 400
+
+    fields = list(Product.FIELD_COLUMNS)
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        invalid_fields = [field for field in fields if field not in Product.FIELD_COLUMNS]
+        if invalid_fields:
+            return jsonify({"msg": "Invalid fields requested", "details": {"fields": invalid_fields}}), 400
+
+    category_id = request.args.get('category_id', type=int)
+    category_subtree = request.args.get('category_subtree', type=int)
+    low_stock = request.args.get('low_stock', '').lower() in ('1', 'true', 'yes')
+
+    # SELECT apenas das colunas necessárias para os campos pedidos (id sempre, para o cursor)
+    column_names = ['id'] + sorted({column for field in fields for column in Product.FIELD_COLUMNS[field]} - {'id'})
+    query = (
+        db.select(*[getattr(Product, column) for column in column_names])
+        .order_by(Product.id)
+        .limit(limit + 1)
+    )
+    if after_id is not None:
+        query = query.where(Product.id > after_id)
+    if category_id is not None:
+        query = query.where(Product.category_id == category_id) # ix_products_category_id_id
+    if category_subtree is not None:
+        query = query.where(Product.category_id.in_(subtree_ids_query(category_subtree))) # category_closure
+    if low_stock:
+        query = query.where(Product.quantity <= Product.minimum_stock) # ix_products_low_stock
+
     try:
-        products = Product.query.all()
-        products_dict = [product.to_dict() for product in products]
-        return jsonify(products_dict), 200
+        rows = db.session.execute(query).all()
+        page = rows[:limit]
+        products_dict = attach_image_urls([Product.partial_dict(row, fields) for row in page])
+
+        headers = {}
+        if len(rows) > limit:
+            headers['X-Next-Cursor'] = _encode_cursor(page[-1].id)
+        return jsonify(products_dict), 200, headers
     except Exception as e:
         return jsonify({"error": "An internal server error occurred", "details_dev": str(e)}), 500
 
+
+@product_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_products():
+    """
+    Exporta todos os produtos (mesmos campos de to_dict(), ou os de ?fields=) em NDJSON ou CSV (?format=),
+    em ordem de id e em streaming. Aceita os filtros category_id e category_subtree da listagem.
+    """
+    fmt = export_format()
+    if fmt is None:
+        return jsonify({"msg": "Invalid format"}), 400
+
+    fields = list(Product.FIELD_COLUMNS)
+    if request.args.get('fields'):
+        fields = [field.strip() for field in request.args['fields'].split(',') if field.strip()]
+        invalid_fields = [field for field in fields if field not in Product.FIELD_COLUMNS]
+        if invalid_fields:
+            return jsonify({"msg": "Invalid fields requested", "details": {"fields": invalid_fields}}), 400
+
+    column_names = sorted({column for field in fields for column in Product.FIELD_COLUMNS[field]})
+    query = db.select(*[getattr(Product, column) for column in column_names]).order_by(Product.id)
+    category_id = request.args.get('category_id', type=int)
+    if category_id is not None:
+        query = query.where(Product.category_id == category_id)
+    category_subtree = request.args.get('category_subtree', type=int)
+    if category_subtree is not None:
+        query = query.where(Product.category_id.in_(subtree_ids_query(category_subtree)))
+
+    records = (Product.partial_dict(row, fields) for row in stream_query(query))
+    return export_response(records, fmt, fields, 'products')
+
+
+@product_bp.route('/low-stock', methods=['GET'])
+@jwt_required()
+def get_low_stock_products():
+    """
+    Produtos com quantity <= minimum_stock, em ordem de id, paginados por cursor.
+    A consulta percorre só o índice parcial ix_products_low_stock e cada página fica no
+    cache do catálogo até uma escrita que possa mudá-la (cadastro, edição ou baixa de um
+    produto que está no estoque mínimo), então pode ser consultada com frequência.
+    """
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        return jsonify({"msg": "Limit must be a positive integer"}), 400
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    after_id = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after_id = _decode_cursor(cursor)
+        except Exception:
+            return jsonify({"msg": "Invalid cursor"}), 400
+    category_id = request.args.get('category_id', type=int)
+
+    def load_page():
+        query = (
+            db.select(Product.id, Product.name, Product.quantity, Product.minimum_stock, Product.category_id)
+            .where(Product.quantity <= Product.minimum_stock) # ix_products_low_stock
+            .order_by(Product.id)
+            .limit(limit + 1)
+        )
+        if after_id is not None:
+            query = query.where(Product.id > after_id)
+        if category_id is not None:
+            query = query.where(Product.category_id == category_id)
+        rows = db.session.execute(query).all()
+        page = [{**row._asdict(), 'shortfall': row.minimum_stock - row.quantity} for row in rows[:limit]]
+        next_cursor = _encode_cursor(page[-1]['id']) if len(rows) > limit else None
+        return page, next_cursor
+
+    try:
+        page, next_cursor = current_app.extensions['catalog_cache'].get_or_load(
+            low_stock_page_key(after_id, limit, category_id), load_page
+        )
+    except Exception as e:
+        return jsonify({"error": "An internal server error occurred while fetching low stock products", "details_dev": str(e)}), 500
+
+    headers = {'X-Next-Cursor': next_cursor} if next_cursor else {}
+    return jsonify(page), 200, headers
+
+
+@product_bp.route('/minimum-stock', methods=['PUT'])
+@jwt_required()
+def bulk_update_minimum_stock():
+    """
+    Atualiza o minimum_stock de vários produtos de uma vez (usado pelo job de ponto de pedido do Sales).
+    Body: {"items": [{"product_id": 1, "minimum_stock": 12}, ...]}. Produtos inexistentes são ignorados
+    e devolvidos em missing_product_ids; os demais são gravados em um único UPDATE por chave primária (executemany).
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({"msg": "items must be a non-empty list"}), 400
+    if len(items) > MAX_BULK_MINIMUM_STOCK:
+        return jsonify({"msg": f"At most {MAX_BULK_MINIMUM_STOCK} items per request"}), 400
+
+    minimums = {}
+    for item in items:
+        product_id = item.get('product_id') if isinstance(item, dict) else None
+        minimum_stock = item.get('minimum_stock') if isinstance(item, dict) else None
+        if not isinstance(product_id, int) or not isinstance(minimum_stock, int) or minimum_stock < 0:
+            return jsonify({"msg": "Each item needs an integer product_id and a non-negative integer minimum_stock"}), 400
+        minimums[product_id] = minimum_stock
+
+    try:
+        existing = set(db.session.scalars(db.select(Product.id).where(Product.id.in_(list(minimums)))))
+        if existing:
+            db.session.execute(db.update(Product), [
+                {'id': product_id, 'minimum_stock': minimums[product_id]} for product_id in existing
+            ])
+            invalidate_catalog(*(product_key(product_id) for product_id in existing), LOW_STOCK_KEY)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to update minimum stock", "details_dev": str(e)}), 500
+    finally:
+        db.session.close()
+
+    return jsonify({
+        "updated": len(existing),
+        "missing_product_ids": sorted(set(minimums) - existing),
+    }), 200
+
+
+
+@product_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_products():
+    """
+    Importação em massa de produtos a partir de um corpo CSV (text/csv, com cabeçalho) ou NDJSON
+    (application/x-ndjson), com os campos name, buy_price, sell_price, desc, category_id ou category,
+    category_details, quantity e minimum_stock.
+    O corpo é lido em streaming e os produtos válidos são inseridos em lotes de chunk_size (um commit por lote).
+    A resposta é NDJSON em streaming: uma linha "progress" por lote gravado, depois uma linha "error" por
+    linha rejeitada (no máximo MAX_IMPORT_ERROR_LINES) e uma linha "done" com o total no final.
+
+    Os erros só são escritos depois que o corpo inteiro foi lido: a maioria dos clientes (requests, curl,
+    proxies) só lê a resposta depois de terminar o upload, e um arquivo com muitas linhas inválidas
+    encheria os buffers do socket e travaria os dois lados. Durante o upload sai no máximo uma linha
+    curta por lote gravado.
+    """
+    fmt = IMPORT_FORMATS.get(request.mimetype)
+    if fmt is None:
+        return jsonify({"msg": f"Content-Type must be one of: {', '.join(IMPORT_FORMATS)}"}), 415
+    chunk_size = request.args.get('chunk_size', current_app.config['PRODUCT_IMPORT_CHUNK_SIZE'], type=int)
+    if chunk_size is None or chunk_size < 1:
+        return jsonify({"msg": "chunk_size must be a positive integer"}), 400
+    chunk_size = min(chunk_size, MAX_IMPORT_CHUNK_SIZE)
+
+    def line(**fields):
+        return json.dumps(fields) + '\n'
+
+    def run_import():
+        processed = inserted = failed = 0
+        chunk = []
+        errors = []
+
+        def error_lines():
+            for row_number, error in errors:
+                yield line(event="error", row=row_number, error=error)
+            if failed > len(errors):
+                yield line(event="errors_truncated", reported=len(errors), failed=failed)
+
+        def flush():
+            nonlocal inserted
+            product_ids = insert_chunk(chunk)
+            # IDs novos nunca estão no cache (buscas sem resultado não são guardadas): só o relatório muda
+            invalidate_catalog(LOW_STOCK_KEY)
+            db.session.commit()
+            inserted += len(product_ids)
+            chunk.clear()
+            return line(event="progress", processed=processed, inserted=inserted, failed=failed)
+
+        aborted = None
+        try:
+            categories = load_category_map()
+            for row_number, row in iter_rows(request.stream, fmt):
+                processed += 1
+                try:
+                    if isinstance(row, RowError):
+                        raise row
+                    chunk.append(product_params(row, categories))
+                except RowError as e:
+                    failed += 1
+                    if len(errors) < MAX_IMPORT_ERROR_LINES:
+                        errors.append((row_number, str(e)))
+                    continue
+                if len(chunk) >= chunk_size:
+                    yield flush()
+            if chunk:
+                yield flush()
+        except Exception as e:
+            db.session.rollback()
+            aborted = e
+        finally:
+            db.session.close()
+
+        yield from error_lines()
+        if aborted is not None:
+            yield line(event="aborted", processed=processed, inserted=inserted, failed=failed,
+                       error="Import aborted; previous chunks were kept", details_dev=str(aborted))
+        else:
+            yield line(event="done", processed=processed, inserted=inserted, failed=failed)
+
+    return Response(stream_with_context(run_import()), mimetype='application/x-ndjson')
+
+
 @product_bp.route('/<int:product_id>', methods=['GET'])
 @jwt_required()
 def get_product_by_id(product_id: int):
-    try:
+    def load_product():
         product = db.session.get(Product, product_id)
+        return product.to_dict() if product else None
+
+    try:
+        product_dict = current_app.extensions['catalog_cache'].get_or_load(product_key(product_id), load_product)
+        if product_dict:
+            # Cópia: as URLs assinadas não entram no cache do catálogo
+            product_dict = attach_image_urls([dict(product_dict)])[0]
     except Exception as e:
         return jsonify({"error": "An internal server error occurred while fetching product", "details_dev": str(e)}), 500
 
-    if product:
-        return jsonify(product.to_dict()), 200
+    if product_dict:
+        return jsonify(product_dict), 200
     else:
         return jsonify({"msg": "Product not found"}), 404
 
@@ -144,48 +427,14 @@ def update_product_by_id(product_id: int):
     if not product:
         return jsonify({"msg": "Product not found"}), 404
 
-    # Handle image update for GCS similar to creation, if 'image' is in request.files
-    product_image_url = product.product_image # Keep existing if not updated
-    if 'image' in request.files:
+    image_upload = None
+    if 'image' in request.files and request.files['image'].filename != '':
         image_file = request.files['image']
-        if image_file.filename != '':
-            # Se uma nova imagem é enviada, delete a antiga primeiro
-            if product.product_image and storage_client:
-                try:
-                    bucket_name = current_app.config['GCS_BUCKET_NAME']
-                    bucket = storage_client.bucket(bucket_name)
-                    # Extrai o nome do blob da URL pública para deletar
-                    old_blob_name = os.path.basename(product.product_image)
-                    old_blob = bucket.blob(old_blob_name)
-                    if old_blob.exists():
-                        old_blob.delete()
-                except Exception as e:
-                    print(f"Warning: Falha ao deletar imagem antiga do GCS durante atualização: {e}")
-
-            import uuid
-            unique_filename = f"{uuid.uuid4()}_{secure_filename(image_file.filename)}"
-            try:
-                bucket_name = current_app.config['GCS_BUCKET_NAME']
-                bucket = storage_client.bucket(bucket_name)
-                blob = bucket.blob(unique_filename)
-                blob.upload_from_file(image_file, content_type=image_file.content_type)
-                product_image_url = blob.public_url # Armazena a nova URL pública
-            except Exception as e:
-                return jsonify({"error": f"Falha ao fazer upload da imagem atualizada para GCS: {str(e)}"}), 500
-    elif 'product_image' in data and data.get('product_image') is None:
-        # Se 'product_image' for explicitamente definido como null no JSON, deleta a imagem antiga do GCS
-        if product.product_image and storage_client:
-            try:
-                bucket_name = current_app.config['GCS_BUCKET_NAME']
-                bucket = storage_client.bucket(bucket_name)
-                old_blob_name = os.path.basename(product.product_image) # Extrai o nome do blob
-                blob = bucket.blob(old_blob_name)
-                if blob.exists():
-                    blob.delete()
-                product_image_url = None # Define a URL como None após a deleção
-            except Exception as e:
-                print(f"Warning: Falha ao deletar imagem antiga do GCS: {e}")
-                product_image_url = None
+        try:
+            image_data = read_image_upload(image_file, current_app.config['IMAGE_MAX_BYTES'])
+        except ValueError as e:
+            return jsonify({"msg": str(e)}), 422
+        image_upload = (image_data, image_file.filename)
 
     name = data.get("name")
     buy_price = data.get("price")
@@ -211,17 +460,31 @@ def update_product_by_id(product_id: int):
     product.sell_price = data.get('sell_price', product.sell_price)
     product.category = data.get('category', product.category)
     product.quantity = data.get('quantity', product.quantity)
+    product.minimum_stock = data.get('minimum_stock', product.minimum_stock)
     if "category_id" in data:
         product.category_id = category_id
     product.category_details = data.get('category_details', product.category_details)
-    product.product_image = product_image_url
-
+    staging_dir = current_app.config['IMAGE_STAGING_DIR']
+    staged_file = None
+    if image_upload:
+        try:
+            staged_file = stage_image_upload(staging_dir, *image_upload)
+        except OSError as e:
+            db.session.rollback()
+            return jsonify({"error": "Failed to store product image", "details_dev": str(e)}), 500
+        # A imagem atual continua valendo até o worker concluir a troca
+        enqueue_image_upload(product, staged_file)
+    elif 'product_image' in data and data.get('product_image') is None:
+        clear_product_image(current_app.extensions['image_store'], product)
 
     try:
+        invalidate_catalog(product_key(product_id), LOW_STOCK_KEY)
         db.session.commit()
         product_data_dict = product.to_dict()
     except Exception as e:
         db.session.rollback()
+        if staged_file:
+            discard_staged_image(staging_dir, staged_file)
         return jsonify({"error": "Failed to update product in database", "details_dev": str(e)}), 500
     finally:
         db.session.close()
@@ -240,20 +503,11 @@ def delete_product_by_id(product_id: int):
     if not product:
         return jsonify({"msg": "Product not found"}), 404
     
-    # Delete image from GCS when product is deleted
-    if product.product_image:
-        try:
-            bucket_name = current_app.config['GCS_BUCKET_NAME']
-            bucket = storage_client.bucket(bucket_name)
-            # Extract blob name from URL (simple example, may need robust parsing)
-            blob_name = os.path.basename(product.product_image)
-            blob = bucket.blob(blob_name)
-            blob.delete()
-        except Exception as e:
-            print(f"Warning: Failed to delete image from GCS during product deletion: {e}") # Log, but don't stop product deletion
-
     try:
+        # Os blobs da imagem são removidos depois, pelo image_worker
+        enqueue_blob_removal(product_image_blobs(current_app.extensions['image_store'], product.product_image, product.image_thumbnails), product_id)
         db.session.delete(product)
+        invalidate_catalog(product_key(product_id), LOW_STOCK_KEY)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -264,6 +518,15 @@ def delete_product_by_id(product_id: int):
     return Response(status=204)
 
 
+
+@product_bp.route('/images/<path:name>', methods=['GET'])
+def get_local_product_image(name):
+    """Serve as imagens gravadas pelo LocalImageStore (IMAGE_STORAGE=local); em produção elas vêm do GCS."""
+    store = current_app.extensions['image_store']
+    if not isinstance(store, LocalImageStore):
+        return jsonify({"msg": "Image not found"}), 404
+    return send_from_directory(store.root, name)
+
 @product_bp.route('/search', methods=['GET'])
 @jwt_required()
 def search_products_by_name(): 
@@ -271,32 +534,14 @@ def search_products_by_name():
 
     if not search_term:
         return jsonify({"msg": "Search term 'name' is required"}), 400
+
+    limit = request.args.get('limit', DEFAULT_SEARCH_LIMIT, type=int)
+    if limit is None or limit < 1:
+        return jsonify({"msg": "Limit must be a positive integer"}), 400
+    limit = min(limit, MAX_SEARCH_LIMIT)
     
     try:
-        products = Product.query.filter(Product.name.ilike(f'%{search_term}%')).all()
-        return jsonify([product.to_dict() for product in products]), 200
+        products = search_products(search_term, limit)
+        return jsonify(attach_image_urls([product.to_dict() for product in products])), 200
     except Exception as e:
         return jsonify({"error": "An internal server error occurred during product search", "details_dev": str(e)}), 500
-    
-
-def _generate_signed_url_for_blob(blob_name):
-    """Generates a signed URL for a given GCS blob name."""
-    if not storage_client: # Ensure storage_client is initialized
-        print("Storage client not initialized. Cannot generate signed URL.")
-        return "Storage client not initialized. Cannot generate signed URL."
-    try:
-        bucket_name = current_app.config['GCS_BUCKET_NAME']
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(blob_name)
-
-        # Ensure the blob actually exists before trying to sign a URL for it
-        if not blob.exists():
-            print(f"Blob '{blob_name}' not found in bucket '{bucket_name}'.")
-            return f"Blob '{blob_name}' not found in bucket '{bucket_name}'."
-
-        # Generate a signed URL valid for 1 hour (3600 seconds)
-        signed_url = blob.generate_signed_url(expiration=3600)
-        return signed_url
-    except Exception as e:
-        print(f"Error generating signed URL for blob '{blob_name}': {e}")
-        return f"Error generating signed URL for blob '{blob_name}': {e}"
\ No newline at end of file
@@ -2,11 +2,146 @@
 from flask import Blueprint, request, jsonify, current_app
 from inventory.models import Product
 from inventory import db
+from inventory.idempotency import record_processed_message
+from inventory.cache import invalidate_catalog, product_key, LOW_STOCK_KEY
+from inventory.ledger import record_movements, current_product_balances, REASON_SALE
+from inventory.outbox import enqueue_message
+from inventory.topics import LOW_STOCK_TOPIC_NAME
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy import Integer
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql.functions import GenericFunction
 import base64
 import json
 
 pubsub_bp = Blueprint('pubsub', __name__)
 
+INVENTORY_UPDATE_SCHEMA_VERSION = 2
+
+
+def parse_inventory_update(message_data):
+    """
+    Converte uma mensagem de inventory-updates em {product_id: quantity_sold}.
+
+    Aceita o formato versionado (version 2), com todos os itens de uma venda em
+    "items", e o formato antigo de um único item, ainda publicado durante o rollout.
+    Itens repetidos do mesmo produto são somados.
+    """
+    if not isinstance(message_data, dict):
+        raise ValueError("Message must be a JSON object")
+
+    version = message_data.get('version', 1)
+    if version == 1:
+        items = [message_data]
+    elif version == INVENTORY_UPDATE_SCHEMA_VERSION:
+        items = message_data.get('items')
+        if not isinstance(items, list) or not items:
+            raise ValueError("Items must be a non-empty list")
+    else:
+        raise ValueError(f"Unsupported message version: {version}")
+
+    quantities = {}
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError("Invalid item format in items list")
+        product_id = item.get('product_id')
+        quantity_sold = item.get('quantity_sold')
+        if product_id is None or quantity_sold is None:
+            raise ValueError("Missing product_id or quantity_sold in message")
+        if isinstance(quantity_sold, bool) or not isinstance(quantity_sold, int) or quantity_sold <= 0:
+            raise ValueError(f"quantity_sold must be a positive integer (product {product_id})")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity_sold
+    return quantities
+
+
+class greatest(GenericFunction):
+    """GREATEST(a, b); no SQLite (testes) é compilado como MAX(a, b)."""
+    type = Integer()
+    inherit_cache = True
+
+
+@compiles(greatest, 'sqlite')
+def _compile_greatest_sqlite(element, compiler, **kw):
+    return f"max({compiler.process(element.clauses, **kw)})"
+
+
+def apply_inventory_update(quantities, reference=None, messages=None):
+    """
+    Baixa o estoque de todos os produtos da mensagem em um único statement:
+    UPDATE products SET quantity = GREATEST(quantity - :n, 0) WHERE id IN (...) RETURNING id, quantity
+
+    A subtração acontece no banco, então entregas concorrentes não perdem decrementos.
+    Cada baixa também vira uma movimentação 'sale' no ledger, e os produtos que cruzaram
+    o estoque mínimo geram um evento low-stock na outbox.
+    Quando quantities soma várias mensagens (pull worker), messages traz a lista
+    [(message_id, {product_id: quantity_sold})] e o ledger ganha uma movimentação por mensagem.
+    Não faz commit; retorna {product_id: new_quantity} dos produtos encontrados.
+    """
+    messages = messages or [(reference, quantities)]
+    sold = db.case(quantities, value=Product.id, else_=0)
+    rows = db.session.execute(
+        db.update(Product)
+        .where(Product.id.in_(quantities.keys()))
+        .values(quantity=greatest(db.func.coalesce(Product.quantity, 0) - sold, 0)) # Prevent negative stock
+        .returning(Product.id, Product.quantity, Product.minimum_stock)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if rows:
+        # Só os produtos baixados; as páginas de estoque baixo só mudam se algum deles está no mínimo
+        keys = [product_key(product_id) for product_id, _, _ in rows]
+        if any(quantity is not None and minimum_stock is not None and quantity <= minimum_stock
+               for _, quantity, minimum_stock in rows):
+            keys.append(LOW_STOCK_KEY)
+        invalidate_catalog(*keys)
+        taken = record_sale_movements(quantities, rows, messages)
+        # Cada evento referencia a última mensagem que baixou o produto
+        references = {product_id: message_id for message_id, items in messages for product_id in items}
+        enqueue_low_stock_events(rows, taken, references)
+    return {product_id: quantity for product_id, quantity, _ in rows}
+
+
+def record_sale_movements(quantities, rows, messages):
+    """
+    Registra no ledger o que foi efetivamente baixado e retorna {product_id: unidades baixadas}.
+    Se o saldo chegou a zero a baixa pode ter sido limitada pelo GREATEST; nesse caso o saldo
+    anterior vem do próprio ledger (a linha do produto já está travada pelo UPDATE, então
+    ninguém mais movimentou esse produto). As unidades baixadas são distribuídas entre as
+    mensagens na ordem em que chegaram, uma movimentação por mensagem e produto.
+    """
+    emptied = [product_id for product_id, quantity, _ in rows if not quantity]
+    previous = current_product_balances(emptied) if emptied else {}
+    taken = {
+        product_id: quantities[product_id] if quantity else min(max(previous.get(product_id, 0), 0), quantities[product_id])
+        for product_id, quantity, _ in rows
+    }
+    remaining = dict(taken)
+    movements = []
+    for message_id, items in messages:
+        for product_id, quantity_sold in items.items():
+            if product_id not in remaining:
+                continue # Produto não encontrado
+            units = min(quantity_sold, remaining[product_id])
+            remaining[product_id] -= units
+            movements.append({'product_id': product_id, 'delta': -units, 'reason': REASON_SALE, 'reference': message_id})
+    record_movements(movements)
+    return taken
+
+
+def enqueue_low_stock_events(rows, taken, references):
+    """Enfileira um evento low-stock para cada produto que estava acima do mínimo e ficou no mínimo ou abaixo."""
+    for product_id, quantity, minimum_stock in rows:
+        if minimum_stock is None or quantity is None:
+            continue
+        if quantity <= minimum_stock < quantity + taken[product_id]:
+            enqueue_message(LOW_STOCK_TOPIC_NAME, {
+                "product_id": product_id,
+                "quantity": quantity,
+                "minimum_stock": minimum_stock,
+                "shortfall": minimum_stock - quantity,
+                "reference": references.get(product_id),
+            })
+
+
 @pubsub_bp.route('/inventory-update', methods=['POST'])
 def receive_inventory_update_message():
     """
@@ -26,46 +161,71 @@ def receive_inventory_update_message():
         data_decoded = base64.b64decode(message['data']).decode('utf-8')
         message_data = json.loads(data_decoded)
 
-        product_id = message_data.get('product_id')
-        quantity_sold = message_data.get('quantity_sold')
+        try:
+            quantities = parse_inventory_update(message_data)
+        except ValueError as e:
+            print(f"Error: Invalid inventory update message {message_data}: {e}")
+            return jsonify({"msg": str(e)}), 400
 
-        if product_id is None or quantity_sold is None:
-            print(f"Error: Missing product_id or quantity_sold in message: {message_data}")
-            return jsonify({"msg": "Missing product_id or quantity_sold in message"}), 400
+        # Pub/Sub entrega pelo menos uma vez: redeliveries são reconhecidas sem baixar o estoque de novo
+        message_id = message.get('messageId') or message.get('message_id')
+        processed_messages = current_app.extensions['processed_messages']
+        if message_id and message_id in processed_messages:
+            current_app.logger.info(f"Skipping duplicate message {message_id}.")
+            return jsonify({"status": "duplicate", "message_id": message_id}), 200
 
-        current_app.logger.info(f"Received inventory update for product {product_id}, sold {quantity_sold} units.")
+        current_app.logger.info(f"Received inventory update for {len(quantities)} products: {quantities}.")
 
         with current_app.app_context(): # Ensure DB operations are in app context
             try:
-                # Fetch the product from the database
-                product = db.session.get(Product, product_id)
+                if message_id:
+                    try:
+                        record_processed_message(message_id)
+                    except IntegrityError:
+                        # Outra entrega da mesma mensagem já foi registrada no ledger
+                        db.session.rollback()
+                        processed_messages.add(message_id)
+                        current_app.logger.info(f"Skipping duplicate message {message_id}.")
+                        return jsonify({"status": "duplicate", "message_id": message_id}), 200
+                else:
+                    print("Warning: Pub/Sub message without messageId; processing without duplicate check.")
 
-                if not product:
-                    print(f"Error: Product with ID {product_id} not found for update.")
-                    return jsonify({"msg": f"Product with ID {product_id} not found"}), 404 # Acknowledge for Pub/Sub, but log error
+                new_quantities = apply_inventory_update(quantities, reference=message_id)
 
-                # Calculate new quantity
-                current_quantity = product.quantity if product.quantity is not None else 0
-                new_quantity = current_quantity - quantity_sold
-                if new_quantity < 0:
-                    new_quantity = 0 # Prevent negative stock
-                    print(f"Warning: Quantity for product {product_id} would go negative. Setting to 0.")
+                missing_product_ids = [product_id for product_id in quantities if product_id not in new_quantities]
+                if not new_quantities:
+                    db.session.rollback()
+                    print(f"Error: Products {missing_product_ids} not found for update.")
+                    return jsonify({"msg": f"Product with ID {', '.join(map(str, missing_product_ids))} not found"}), 404
+                if missing_product_ids:
+                    print(f"Warning: Products {missing_product_ids} not found for update. Skipping them.")
 
-                product.quantity = new_quantity
                 db.session.commit()
-                current_app.logger.info(f"Successfully updated product {product_id} to quantity {new_quantity}.")
-                return jsonify({"status": "success", "product_id": product_id, "new_quantity": new_quantity}), 200
+                if message_id:
+                    processed_messages.add(message_id)
+                current_app.logger.info(f"Successfully updated quantities: {new_quantities}.")
+
+                response = {
+                    "status": "success",
+                    "updated": [{"product_id": product_id, "new_quantity": quantity} for product_id, quantity in new_quantities.items()],
+                    "missing_product_ids": missing_product_ids
+                }
+                if message_data.get('version', 1) == 1:
+                    # Campos do formato antigo, mantidos durante o rollout
+                    product_id = next(iter(new_quantities))
+                    response["product_id"] = product_id
+                    response["new_quantity"] = new_quantities[product_id]
+                return jsonify(response), 200
 
             except Exception as e:
                 db.session.rollback()
-                print(f"Error processing inventory update for product {product_id}: {e}")
-                # Returning a non-2xx status code would tell Pub/Sub to retry,
-                # but for robustness against transient errors, a 200 OK is often used
-                # and internal error handling/logging takes over.
-                return jsonify({"status": "error", "message": str(e)}), 500 
+                print(f"Error processing inventory update for products {list(quantities)}: {e}")
+                # Qualquer outra falha (inclusive outras violações de constraint) responde 500
+                # para o Pub/Sub reentregar; a mensagem não ficou registrada no ledger.
+                return jsonify({"status": "error", "message": str(e)}), 500
             finally:
                 db.session.close() # Close session after operation
-                
+
     except Exception as e:
         print(f"General error in Pub/Sub handler: {e}")
-        return jsonify({"status": "error", "message": "Invalid request or internal error"}), 400
\ No newline at end of file
+        return jsonify({"status": "error", "message": "Invalid request or internal error"}), 400
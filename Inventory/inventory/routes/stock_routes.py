@@ -1,10 +1,33 @@
+import base64
+import json
+from datetime import datetime
 from flask import Blueprint, request, jsonify, Response, url_for
-from inventory.models import Stock, Product, Inventory
+from inventory.models import Stock, Product, Inventory, StockMovement
 from inventory import db
+from inventory.ledger import (record_movements, get_stock_levels,
+                              REASON_ADJUSTMENT, REASON_TRANSFER_IN, REASON_TRANSFER_OUT)
+from inventory.export import export_format, stream_query, export_response
 from flask_jwt_extended import jwt_required
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
 
 stock_bp = Blueprint('stock', __name__)
 
+DEFAULT_SUMMARY_PAGE_SIZE = 100
+MAX_SUMMARY_PAGE_SIZE = 1000
+
+# group_by -> colunas do GROUP BY (na ordem do índice usado)
+SUMMARY_GROUPINGS = {
+    'product': ('product_id',),
+    'location': ('inventory_location_id',),
+    'product_location': ('product_id', 'inventory_location_id'),
+}
+
+MAX_BULK_OPERATIONS = 1000
+
+DEFAULT_MOVEMENTS_PAGE_SIZE = 100
+MAX_MOVEMENTS_PAGE_SIZE = 1000
+
 
 @stock_bp.route('/', methods=['POST'])
 @jwt_required()
@@ -39,7 +62,13 @@ def create_stock_item():
     inventory_location = db.session.get(Inventory, inventory_location_id)
     if not inventory_location:
         return jsonify({"msg": "Inventory location not found"}), 404
-    
+
+    existing = db.session.scalar(
+        db.select(Stock.id).where(Stock.product_id == product_id, Stock.inventory_location_id == inventory_location_id)
+    )
+    if existing is not None:
+        return jsonify({"msg": "Stock item already exists for this product and location", "id": existing}), 409
+
     new_stock_item = Stock(
         product_id=product_id,
         inventory_location_id=inventory_location_id,
@@ -49,16 +78,20 @@ def create_stock_item():
     try:
         db.session.add(new_stock_item)
         db.session.commit()
-        db.session.refresh(new_stock_item)
+        stock_data_dict = new_stock_item.to_dict()
+    except IntegrityError:
+        # Criado por outra requisição entre a verificação acima e o INSERT
+        db.session.rollback()
+        return jsonify({"msg": "Stock item already exists for this product and location"}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Failed to save stock item to database", "details_dev": str(e)}), 500
     finally:
         db.session.close()
 
-    location_uri = url_for('stock.get_stock_item_by_id', stock_item_id=new_stock_item.id, _external=True)
+    location_uri = url_for('stock.get_stock_item_by_id', stock_item_id=stock_data_dict['id'], _external=True)
 
-    return jsonify(new_stock_item.to_dict()), 201, {'Location': location_uri}
+    return jsonify(stock_data_dict), 201, {'Location': location_uri}
 
 
 @stock_bp.route('/', methods=['GET'])
@@ -71,6 +104,338 @@ def get_all_stock_items():
     except Exception as e:
         return jsonify({"error": "An internal server error occurred", "details_dev": str(e)}), 500
 
+def _encode_cursor(key):
+    return base64.urlsafe_b64encode(json.dumps(list(key)).encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor, size):
+    key = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    if not isinstance(key, list) or len(key) != size:
+        raise ValueError("Invalid cursor")
+    return tuple(int(value) for value in key)
+
+
+@stock_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_stock():
+    """Exporta os registros de estoque em NDJSON ou CSV (?format=), em streaming, com filtros opcionais por produto e local."""
+    fmt = export_format()
+    if fmt is None:
+        return jsonify({"msg": "Invalid format"}), 400
+
+    columns = ['id', 'product_id', 'inventory_location_id', 'quantity']
+    query = db.select(*[getattr(Stock, column) for column in columns]).order_by(Stock.id)
+    product_id = request.args.get('product_id', type=int)
+    if product_id is not None:
+        query = query.where(Stock.product_id == product_id)
+    inventory_location_id = request.args.get('inventory_location_id', type=int)
+    if inventory_location_id is not None:
+        query = query.where(Stock.inventory_location_id == inventory_location_id)
+
+    records = (row._asdict() for row in stream_query(query))
+    return export_response(records, fmt, columns, 'stock')
+
+
+@stock_bp.route('/summary', methods=['GET'])
+@jwt_required()
+def get_stock_summary():
+    """
+    Totais de estoque agrupados no banco: por produto (padrão), por local ou por produto e local.
+    Paginado por cursor na chave do agrupamento, então cada página lê só um trecho do índice.
+    """
+    group_by = request.args.get('group_by', 'product')
+    if group_by not in SUMMARY_GROUPINGS:
+        return jsonify({"msg": "Invalid group_by", "details": {"group_by": f"Must be one of: {', '.join(SUMMARY_GROUPINGS)}."}}), 400
+
+    limit = request.args.get('limit', DEFAULT_SUMMARY_PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        return jsonify({"msg": "Limit must be a positive integer"}), 400
+    limit = min(limit, MAX_SUMMARY_PAGE_SIZE)
+
+    key_columns = [getattr(Stock, name) for name in SUMMARY_GROUPINGS[group_by]]
+    after = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after = _decode_cursor(cursor, len(key_columns))
+        except Exception:
+            return jsonify({"msg": "Invalid cursor"}), 400
+
+    aggregates = [db.func.sum(Stock.quantity).label('total_quantity')]
+    if group_by == 'product':
+        aggregates.append(db.func.count(db.distinct(Stock.inventory_location_id)).label('locations'))
+    elif group_by == 'location':
+        aggregates.append(db.func.count(db.distinct(Stock.product_id)).label('products'))
+
+    query = (
+        db.select(*key_columns, *aggregates)
+        .group_by(*key_columns)
+        .order_by(*key_columns)
+        .limit(limit + 1)
+    )
+    product_id = request.args.get('product_id', type=int)
+    if product_id is not None:
+        query = query.where(Stock.product_id == product_id)
+    inventory_location_id = request.args.get('inventory_location_id', type=int)
+    if inventory_location_id is not None:
+        query = query.where(Stock.inventory_location_id == inventory_location_id)
+    if after is not None:
+        # Keyset antes do GROUP BY: o banco pula direto para o próximo grupo no índice
+        query = query.where(db.tuple_(*key_columns) > after if len(key_columns) > 1 else key_columns[0] > after[0])
+
+    try:
+        rows = db.session.execute(query).all()
+        page = rows[:limit]
+        summary = [{**row._asdict(), 'total_quantity': int(row.total_quantity or 0)} for row in page]
+
+        headers = {}
+        if len(rows) > limit:
+            headers['X-Next-Cursor'] = _encode_cursor(page[-1][:len(key_columns)])
+        return jsonify(summary), 200, headers
+    except Exception as e:
+        return jsonify({"error": "An internal server error occurred while summarizing stock", "details_dev": str(e)}), 500
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def validate_bulk_operations(operations):
+    """
+    Valida o formato de cada operação e a existência de produtos e locais (um IN por tabela).
+    Retorna {índice: {campo: erro}} só com as operações inválidas.
+    """
+    errors = {}
+    product_ids, location_ids = set(), set()
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict):
+            errors[index] = {"operation": "Must be an object."}
+            continue
+        op_errors = {}
+        op_type = operation.get('type')
+        if op_type == 'adjust':
+            location_fields = ('inventory_location_id',)
+            if not _is_int(operation.get('delta')) or operation['delta'] == 0:
+                op_errors['delta'] = "Delta must be a non-zero integer."
+        elif op_type == 'transfer':
+            location_fields = ('from_location_id', 'to_location_id')
+            if not _is_int(operation.get('quantity')) or operation['quantity'] <= 0:
+                op_errors['quantity'] = "Quantity must be a positive integer."
+            if operation.get('from_location_id') == operation.get('to_location_id'):
+                op_errors['to_location_id'] = "Origin and destination must be different."
+        else:
+            errors[index] = {"type": "Type must be 'adjust' or 'transfer'."}
+            continue
+
+        if _is_int(operation.get('product_id')):
+            product_ids.add(operation['product_id'])
+        else:
+            op_errors['product_id'] = "Product id is required."
+        for field in location_fields:
+            if _is_int(operation.get(field)):
+                location_ids.add(operation[field])
+            else:
+                op_errors[field] = f"{field.replace('_', ' ').capitalize()} is required."
+        if op_errors:
+            errors[index] = op_errors
+
+    found_products = set(db.session.scalars(db.select(Product.id).where(Product.id.in_(product_ids)))) if product_ids else set()
+    found_locations = set(db.session.scalars(db.select(Inventory.id).where(Inventory.id.in_(location_ids)))) if location_ids else set()
+    for index, operation in enumerate(operations):
+        if index in errors:
+            continue
+        if operation['product_id'] not in found_products:
+            errors.setdefault(index, {})['product_id'] = "Product not found."
+        for field in ('inventory_location_id', 'from_location_id', 'to_location_id'):
+            if field in operation and operation[field] not in found_locations:
+                errors.setdefault(index, {})[field] = "Inventory location not found."
+    return errors
+
+
+def operation_deltas(operation):
+    """Variações de quantidade [((product_id, location_id), delta)] de uma operação já validada."""
+    if operation['type'] == 'adjust':
+        return [((operation['product_id'], operation['inventory_location_id']), operation['delta'])]
+    return [
+        ((operation['product_id'], operation['from_location_id']), -operation['quantity']),
+        ((operation['product_id'], operation['to_location_id']), operation['quantity']),
+    ]
+
+
+def operation_movements(operation):
+    """Linhas do ledger de uma operação já validada."""
+    reasons = [REASON_ADJUSTMENT] if operation['type'] == 'adjust' else [REASON_TRANSFER_OUT, REASON_TRANSFER_IN]
+    reference = operation.get('reference')
+    return [
+        {'product_id': product_id, 'inventory_location_id': location_id, 'delta': delta,
+         'reason': reason, 'reference': str(reference) if reference is not None else None}
+        for ((product_id, location_id), delta), reason in zip(operation_deltas(operation), reasons)
+    ]
+
+
+def apply_stock_deltas(net_deltas):
+    """
+    Aplica as variações líquidas por (produto, local) em um único statement:
+    INSERT INTO stock ... VALUES (...), (...) ON CONFLICT (product_id, inventory_location_id)
+    DO UPDATE SET quantity = stock.quantity + excluded.quantity RETURNING ...
+    Não faz commit; retorna {(product_id, location_id): nova quantidade}.
+    """
+    insert = postgresql.insert if db.engine.dialect.name == 'postgresql' else sqlite.insert
+    statement = insert(Stock).values([
+        {'product_id': product_id, 'inventory_location_id': location_id, 'quantity': delta}
+        for (product_id, location_id), delta in net_deltas.items()
+    ])
+    statement = statement.on_conflict_do_update(
+        index_elements=[Stock.product_id, Stock.inventory_location_id],
+        set_={'quantity': Stock.quantity + statement.excluded.quantity},
+    ).returning(Stock.product_id, Stock.inventory_location_id, Stock.quantity)
+    rows = db.session.execute(statement).all()
+    return {(product_id, location_id): quantity for product_id, location_id, quantity in rows}
+
+
+@stock_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_stock_operations():
+    """
+    Ajustes e transferências de estoque em lote, aplicados atomicamente.
+    Corpo: {"operations": [{"type": "adjust", "product_id", "inventory_location_id", "delta"},
+                           {"type": "transfer", "product_id", "from_location_id", "to_location_id", "quantity"}]}
+    Se qualquer operação for inválida nada é aplicado e a resposta (422) traz o erro de cada linha.
+    """
+    data = request.get_json(silent=True)
+    operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(operations, list) or not operations:
+        return jsonify({"msg": "Field 'operations' must be a non-empty list"}), 400
+    if len(operations) > MAX_BULK_OPERATIONS:
+        return jsonify({"msg": f"At most {MAX_BULK_OPERATIONS} operations per request"}), 413
+
+    try:
+        errors = validate_bulk_operations(operations)
+        valid = [(index, operation) for index, operation in enumerate(operations) if index not in errors]
+        net_deltas = {}
+        for _, operation in valid:
+            for key, delta in operation_deltas(operation):
+                net_deltas[key] = net_deltas.get(key, 0) + delta
+
+        # Trava as linhas existentes e confere se nenhum saldo final fica negativo
+        product_ids = {product_id for product_id, _ in net_deltas}
+        current = {
+            (product_id, location_id): quantity
+            for product_id, location_id, quantity in db.session.execute(
+                db.select(Stock.product_id, Stock.inventory_location_id, Stock.quantity)
+                .where(Stock.product_id.in_(product_ids))
+                .with_for_update()
+            )
+        } if product_ids else {}
+        negative = {key for key, delta in net_deltas.items() if current.get(key, 0) + delta < 0}
+        for index, operation in valid:
+            for key, delta in operation_deltas(operation):
+                if key in negative and delta < 0:
+                    errors.setdefault(index, {})['quantity'] = f"Insufficient stock for product {key[0]} at location {key[1]}."
+
+        if errors:
+            db.session.rollback()
+            results = [
+                {"index": index, "status": "error", "errors": errors[index]} if index in errors
+                else {"index": index, "status": "not_applied"}
+                for index in range(len(operations))
+            ]
+            return jsonify({"msg": "No operations were applied", "results": results}), 422
+
+        new_quantities = apply_stock_deltas(net_deltas)
+        record_movements([movement for operation in operations for movement in operation_movements(operation)])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": "Failed to apply bulk stock operations", "details_dev": str(e)}), 500
+    finally:
+        db.session.close()
+
+    results = []
+    for index, operation in enumerate(operations):
+        result = {"index": index, "status": "applied", "type": operation['type'], "product_id": operation['product_id']}
+        if operation['type'] == 'adjust':
+            result['quantity'] = new_quantities[(operation['product_id'], operation['inventory_location_id'])]
+        else:
+            result['from_quantity'] = new_quantities[(operation['product_id'], operation['from_location_id'])]
+            result['to_quantity'] = new_quantities[(operation['product_id'], operation['to_location_id'])]
+        results.append(result)
+    return jsonify({"applied": len(operations), "results": results}), 200
+
+
+def _parse_as_of(value):
+    as_of = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if as_of.tzinfo is not None:
+        as_of = as_of.astimezone().replace(tzinfo=None) # O ledger grava horário local sem fuso
+    return as_of
+
+
+@stock_bp.route('/levels', methods=['GET'])
+@jwt_required()
+def get_stock_levels_as_of():
+    """
+    Saldos por (produto, local) em um instante (?as_of=ISO 8601, padrão agora), derivados do
+    snapshot mais recente anterior a as_of mais as movimentações do ledger depois dele.
+    inventory_location_id nulo é o saldo geral do produto (Product.quantity).
+    """
+    try:
+        as_of = _parse_as_of(request.args['as_of']) if request.args.get('as_of') else datetime.now()
+    except ValueError:
+        return jsonify({"msg": "Invalid as_of", "details": {"as_of": "Must be an ISO 8601 date/time."}}), 400
+
+    filters = {}
+    product_id = request.args.get('product_id', type=int)
+    if product_id is not None:
+        filters['product_ids'] = [product_id]
+    inventory_location_id = request.args.get('inventory_location_id', type=int)
+    if inventory_location_id is not None:
+        filters['inventory_location_id'] = inventory_location_id
+
+    try:
+        rows = get_stock_levels(as_of, **filters)
+        return jsonify([
+            {"product_id": product_id, "inventory_location_id": location_id, "quantity": int(quantity)}
+            for product_id, location_id, quantity in rows
+        ]), 200, {'X-As-Of': as_of.isoformat()}
+    except Exception as e:
+        return jsonify({"error": "An internal server error occurred while computing stock levels", "details_dev": str(e)}), 500
+
+
+@stock_bp.route('/movements', methods=['GET'])
+@jwt_required()
+def get_stock_movements():
+    """Movimentações do ledger em ordem cronológica, paginadas por cursor no id."""
+    limit = request.args.get('limit', DEFAULT_MOVEMENTS_PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        return jsonify({"msg": "Limit must be a positive integer"}), 400
+    limit = min(limit, MAX_MOVEMENTS_PAGE_SIZE)
+
+    query = db.select(StockMovement).order_by(StockMovement.id).limit(limit + 1)
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            (after_id,) = _decode_cursor(cursor, 1)
+        except Exception:
+            return jsonify({"msg": "Invalid cursor"}), 400
+        query = query.where(StockMovement.id > after_id)
+    product_id = request.args.get('product_id', type=int)
+    if product_id is not None:
+        query = query.where(StockMovement.product_id == product_id)
+    inventory_location_id = request.args.get('inventory_location_id', type=int)
+    if inventory_location_id is not None:
+        query = query.where(StockMovement.inventory_location_id == inventory_location_id)
+
+    try:
+        movements = db.session.scalars(query).all()
+        page = movements[:limit]
+        headers = {}
+        if len(movements) > limit:
+            headers['X-Next-Cursor'] = _encode_cursor([page[-1].id])
+        return jsonify([movement.to_dict() for movement in page]), 200, headers
+    except Exception as e:
+        return jsonify({"error": "An internal server error occurred while fetching stock movements", "details_dev": str(e)}), 500
+
+
 @stock_bp.route('/<int:stock_item_id>', methods=['GET'])
 @jwt_required()
 def get_stock_item_by_id(stock_item_id: int):
@@ -128,6 +493,10 @@ def update_stock_item_by_id(stock_item_id: int):
     try:
         db.session.commit()
         stock_data_dict = stock_item.to_dict()
+    except IntegrityError:
+        # uq_stock_product_location: já existe outro registro para o produto e local de destino
+        db.session.rollback()
+        return jsonify({"msg": "Stock item already exists for this product and location"}), 409
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Failed to update stock item in database", "details_dev": str(e)}), 500
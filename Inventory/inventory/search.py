@@ -0,0 +1,123 @@
+import re
+import threading
+from collections import defaultdict
+from sqlalchemy import event
+from inventory import db
+from inventory.models import Product
+
+# Mesmo limiar padrão do operador % do pg_trgm
+SIMILARITY_THRESHOLD = 0.3
+
+
+def _escape_like(term):
+    return term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def trigrams(text):
+    """Trigramas no mesmo formato do pg_trgm: palavras em minúsculas, com dois espaços antes e um depois."""
+    result = set()
+    for word in re.findall(r'\w+', (text or '').lower()):
+        padded = f"  {word} "
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(a, b):
+    union = a | b
+    return len(a & b) / len(union) if union else 0.0
+
+
+class NgramIndex:
+    """
+    Índice trigram em memória para a busca de produtos quando o banco não é PostgreSQL (testes em SQLite).
+    É reconstruído quando produtos são alterados pelo ORM ou quando a contagem/maior ID da tabela muda.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = defaultdict(set)
+        self._documents = {}
+        self._signature = None
+        self._dirty = True
+
+    def invalidate(self, *args):
+        self._dirty = True
+
+    def _ensure_fresh(self):
+        signature = tuple(db.session.execute(db.select(db.func.count(Product.id), db.func.max(Product.id))).one())
+        if not self._dirty and signature == self._signature:
+            return
+        postings = defaultdict(set)
+        documents = {}
+        for product_id, name, desc in db.session.execute(db.select(Product.id, Product.name, Product.desc)):
+            name_trigrams, desc_trigrams = trigrams(name), trigrams(desc)
+            documents[product_id] = ((name or '').lower(), (desc or '').lower(), name_trigrams, desc_trigrams)
+            for trigram in name_trigrams | desc_trigrams:
+                postings[trigram].add(product_id)
+        self._postings, self._documents = postings, documents
+        self._signature, self._dirty = signature, False
+
+    def search(self, term, limit):
+        """Retorna até `limit` IDs de produtos, na mesma ordem de relevância da busca no PostgreSQL."""
+        with self._lock:
+            self._ensure_fresh()
+            term_lower = term.lower()
+            term_trigrams = trigrams(term)
+            candidates = set()
+            for trigram in term_trigrams:
+                candidates |= self._postings.get(trigram, set())
+            # Busca por substring também precisa achar termos sem trigramas em comum (ex.: pontuação)
+            if not candidates:
+                candidates = self._documents.keys()
+
+            ranked = []
+            for product_id in candidates:
+                name, desc, name_trigrams, desc_trigrams = self._documents[product_id]
+                name_similarity = similarity(name_trigrams, term_trigrams)
+                desc_similarity = similarity(desc_trigrams, term_trigrams)
+                name_match = term_lower in name
+                if not (name_match or term_lower in desc or name_similarity >= SIMILARITY_THRESHOLD or desc_similarity >= SIMILARITY_THRESHOLD):
+                    continue
+                ranked.append(((not name_match, -name_similarity, -desc_similarity, product_id), product_id))
+            ranked.sort()
+            return [product_id for _, product_id in ranked[:limit]]
+
+
+ngram_index = NgramIndex()
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(Product, _event, ngram_index.invalidate)
+
+
+def _search_postgresql(term, limit):
+    # ILIKE e o operador % usam os índices GIN gin_trgm_ops de name e desc
+    pattern = f"%{_escape_like(term)}%"
+    name_match = Product.name.ilike(pattern, escape='\\')
+    query = (
+        db.select(Product)
+        .where(db.or_(
+            name_match,
+            Product.desc.ilike(pattern, escape='\\'),
+            Product.name.op('%')(term),
+            Product.desc.op('%')(term),
+        ))
+        .order_by(
+            name_match.desc(),
+            db.func.similarity(Product.name, term).desc(),
+            db.func.similarity(db.func.coalesce(Product.desc, ''), term).desc(),
+            Product.id,
+        )
+        .limit(limit)
+    )
+    return db.session.scalars(query).all()
+
+
+def search_products(term, limit):
+    """Busca produtos por nome e descrição, ordenados por relevância."""
+    if db.engine.dialect.name == 'postgresql':
+        return _search_postgresql(term, limit)
+
+    product_ids = ngram_index.search(term, limit)
+    if not product_ids:
+        return []
+    products = {product.id: product for product in db.session.scalars(db.select(Product).where(Product.id.in_(product_ids)))}
+    return [products[product_id] for product_id in product_ids if product_id in products]
@@ -0,0 +1,108 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+
+
+class SignedUrlCache:
+    """
+    Cache em memória (LRU) das URLs assinadas das imagens, por nome do blob.
+
+    Uma URL é reaproveitada até refresh_margin segundos antes de expirar, então quem a recebe
+    sempre tem pelo menos essa margem para usá-la. Os nomes que faltam são assinados de uma vez,
+    fora do lock, pela função sign(names, expiration) do armazenamento. Nomes que sign deixa de fora
+    (falha na assinatura) não entram no cache e são tentados de novo na próxima requisição.
+    """
+
+    def __init__(self, maxsize=10000, expiration=3600, refresh_margin=300):
+        self.maxsize = maxsize
+        self.expiration = expiration
+        self.refresh_margin = refresh_margin
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_many(self, blob_names, sign):
+        """Retorna {nome do blob: URL assinada} para os nomes pedidos que puderam ser assinados."""
+        now = time.time()
+        urls, missing = {}, []
+        with self._lock:
+            for name in set(blob_names):
+                entry = self._entries.get(name)
+                if entry is not None and entry[1] - self.refresh_margin > now:
+                    self._entries.move_to_end(name)
+                    urls[name] = entry[0]
+                    self.hits += 1
+                else:
+                    missing.append(name)
+                    self.misses += 1
+
+        if missing:
+            signed = sign(missing, self.expiration)
+            expires_at = now + self.expiration
+            with self._lock:
+                for name, url in signed.items():
+                    self._entries[name] = (url, expires_at)
+                    self._entries.move_to_end(name)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+            urls.update(signed)
+        return urls
+
+    def clear(self):
+        """Esvazia o cache e zera as métricas."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+            }
+
+
+def attach_image_urls(products):
+    """
+    Acrescenta image_url e thumbnail_urls (URLs assinadas) aos dicts de produto com os campos
+    product_image e image_thumbnails, assinando os blobs de todos eles em um único lote.
+    Não levanta erro: o blob que não pôde ser assinado fica com a URL pública gravada no produto,
+    como antes das URLs assinadas.
+    """
+    store = current_app.extensions['image_store']
+    blob_names = {}
+    for product in products:
+        urls = [product.get('product_image')] + list((product.get('image_thumbnails') or {}).values())
+        blob_names.update((url, store.blob_name(url)) for url in urls if url)
+
+    signed = {}
+    if blob_names:
+        try:
+            signed = current_app.extensions['signed_url_cache'].get_many(blob_names.values(), store.sign_urls)
+        except Exception as e:
+            print(f"Warning: Falha ao assinar as URLs das imagens: {e}")
+
+    def image_url(url):
+        return signed.get(blob_names[url], url)
+
+    for product in products:
+        if 'product_image' in product:
+            image = product['product_image']
+            product['image_url'] = image_url(image) if image else None
+        if 'image_thumbnails' in product:
+            product['thumbnail_urls'] = {
+                size: image_url(url) for size, url in (product['image_thumbnails'] or {}).items()
+            }
+    return products
@@ -0,0 +1,2 @@
+# Tópicos do Pub/Sub em que o Inventory publica (pela outbox, ver inventory/outbox.py)
+LOW_STOCK_TOPIC_NAME = 'low-stock'
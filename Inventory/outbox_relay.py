@@ -0,0 +1,10 @@
+from inventory import create_app
+from inventory.clients import clients
+from inventory.outbox import run_relay
+
+app = create_app()
+
+if __name__ == "__main__":
+    with app.app_context():
+        publisher = clients.get('publisher')
+    run_relay(app, publisher)
@@ -0,0 +1,26 @@
+import os
+from google.cloud import pubsub_v1
+from inventory import create_app
+from inventory.clients import clients
+from inventory.pull_worker import InventoryPullWorker
+
+app = create_app()
+
+if __name__ == "__main__":
+    with app.app_context():
+        subscriber = clients.get('subscriber')
+    subscription_path = subscriber.subscription_path(os.environ.get('GCP_PROJECT_ID'), app.config['PULL_SUBSCRIPTION_NAME'])
+    flow_control = pubsub_v1.types.FlowControl(
+        max_messages=app.config['PULL_MAX_OUTSTANDING_MESSAGES'],
+        max_bytes=app.config['PULL_MAX_OUTSTANDING_BYTES'],
+    )
+    worker = InventoryPullWorker(
+        app,
+        subscriber,
+        subscription_path,
+        batch_size=app.config['PULL_BATCH_SIZE'],
+        batch_latency_ms=app.config['PULL_BATCH_LATENCY_MS'],
+        flow_control=flow_control,
+    )
+    with subscriber:
+        worker.run()
@@ -0,0 +1,15 @@
+from inventory import create_app, db
+from inventory.idempotency import purge_expired_messages
+from inventory.cache import purge_catalog_changes
+
+app = create_app()
+
+if __name__ == "__main__":
+    with app.app_context():
+        ttl_hours = app.config['PROCESSED_MESSAGES_TTL_HOURS']
+        removed = purge_expired_messages(ttl_hours)
+        print(f"Removed {removed} processed messages older than {ttl_hours} hours.")
+        retention_hours = app.config['CATALOG_CHANGE_RETENTION_HOURS']
+        removed = purge_catalog_changes(retention_hours)
+        print(f"Removed {removed} catalog changes older than {retention_hours} hours.")
+        db.session.close()
@@ -0,0 +1,11 @@
+from inventory import create_app, db
+from inventory.ledger import take_stock_snapshot
+
+app = create_app()
+
+if __name__ == "__main__":
+    with app.app_context():
+        lag_seconds = app.config['STOCK_SNAPSHOT_LAG_SECONDS']
+        taken_at, written = take_stock_snapshot(lag_seconds)
+        print(f"Stock snapshot at {taken_at.isoformat()}: {written} balances written.")
+        db.session.close()
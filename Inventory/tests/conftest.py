@@ -34,6 +34,8 @@ def test_client_instance(test_app_instance):
         with test_app_instance.app_context():
             inventory_db_instance.drop_all()
             inventory_db_instance.create_all()
+        test_app_instance.extensions['processed_messages'].clear() # O LRU acompanha o ledger do BD
+        test_app_instance.extensions['catalog_cache'].clear()
         yield client
 
 @pytest.fixture(scope='function')
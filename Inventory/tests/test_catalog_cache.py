@@ -0,0 +1,136 @@
+import pytest
+from inventory import db as inventory_db
+from datetime import datetime, timedelta
+from inventory.cache import CatalogCache, invalidate_catalog, purge_catalog_changes, product_key, CATEGORIES_KEY, LOW_STOCK_KEY
+from inventory.models import Product, CatalogChange
+from inventory.routes.pubsub_handles import apply_inventory_update
+
+
+@pytest.fixture(scope='function')
+def catalog_cache(test_app_instance, test_client_instance):
+    return test_app_instance.extensions['catalog_cache']
+
+
+class TestCatalogCache:
+
+    def test_product_by_id_served_from_cache(self, test_client_instance, authorized_headers, created_product_data, catalog_cache):
+        url = f"/api/inventory/products/{created_product_data['id']}"
+        first = test_client_instance.get(url, headers=authorized_headers)
+        second = test_client_instance.get(url, headers=authorized_headers)
+
+        assert first.status_code == second.status_code == 200
+        assert first.json == second.json
+        stats = catalog_cache.stats()
+        assert stats['misses'] == 1
+        assert stats['hits'] == 1
+
+    def test_not_found_is_not_cached(self, test_client_instance, authorized_headers, catalog_cache):
+        response = test_client_instance.get('/api/inventory/products/99999', headers=authorized_headers)
+        assert response.status_code == 404
+        assert len(catalog_cache) == 0
+
+    def test_category_write_invalidates_list(self, test_client_instance, authorized_headers, created_category_data):
+        assert len(test_client_instance.get('/api/inventory/categories/', headers=authorized_headers).json) == 1
+
+        test_client_instance.post('/api/inventory/categories/', headers=authorized_headers,
+                                  json={"name": "Móveis", "details_model": "Modelo de móveis"})
+
+        response = test_client_instance.get('/api/inventory/categories/', headers=authorized_headers)
+        assert {category['name'] for category in response.json} == {"Eletrônicos", "Móveis"}
+
+    def test_category_update_invalidates_list(self, test_client_instance, authorized_headers, created_category_data):
+        test_client_instance.get('/api/inventory/categories/', headers=authorized_headers)
+        test_client_instance.put(f"/api/inventory/categories/{created_category_data['id']}", headers=authorized_headers,
+                                 json={"name": "Informática"})
+
+        response = test_client_instance.get('/api/inventory/categories/', headers=authorized_headers)
+        assert response.json[0]['name'] == "Informática"
+
+    def test_stock_decrement_invalidates_product(self, test_app_instance, test_client_instance, authorized_headers, catalog_cache):
+        with test_app_instance.app_context():
+            product = Product(name="Mesa", buy_price=100.0, sell_price=150.0, quantity=10)
+            inventory_db.session.add(product)
+            inventory_db.session.commit()
+            product_id = product.id
+
+        url = f"/api/inventory/products/{product_id}"
+        assert test_client_instance.get(url, headers=authorized_headers).json['quantity'] == 10
+
+        with test_app_instance.app_context():
+            apply_inventory_update({product_id: 3})
+            inventory_db.session.commit()
+
+        assert test_client_instance.get(url, headers=authorized_headers).json['quantity'] == 7
+
+    def test_rollback_keeps_cached_entries(self, test_app_instance, test_client_instance, catalog_cache):
+        with test_app_instance.app_context():
+            catalog_cache.get_or_load(product_key(1), lambda: {"id": 1})
+            invalidate_catalog(product_key(1))
+            inventory_db.session.rollback()
+            assert catalog_cache.get_or_load(product_key(1), lambda: {"id": 1, "reloaded": True}) == {"id": 1}
+
+    def test_other_worker_invalidates_only_changed_keys(self, test_app_instance, test_client_instance):
+        # Dois caches simulam dois workers do gunicorn compartilhando o banco
+        worker_a = CatalogCache(change_check_interval=0)
+        worker_b = CatalogCache(change_check_interval=0)
+        with test_app_instance.app_context():
+            assert worker_b.get_or_load(product_key(1), lambda: {"quantity": 10}) == {"quantity": 10}
+            assert worker_b.get_or_load(product_key(2), lambda: {"quantity": 5}) == {"quantity": 5}
+            assert worker_b.get_or_load(CATEGORIES_KEY, lambda: ["Móveis"]) == ["Móveis"]
+
+            invalidate_catalog(product_key(1))
+            inventory_db.session.commit()
+            worker_a.invalidate(product_key(1))
+
+            assert CatalogChange.query.count() == 1
+            assert worker_b.get_or_load(product_key(1), lambda: {"quantity": 7}) == {"quantity": 7}
+            assert worker_b.get_or_load(product_key(2), lambda: {"quantity": 0}) == {"quantity": 5}
+            assert worker_b.get_or_load(CATEGORIES_KEY, lambda: []) == ["Móveis"]
+            # A mudança já vista não invalida a chave de novo
+            assert worker_b.get_or_load(product_key(1), lambda: {"quantity": 0}) == {"quantity": 7}
+
+    def test_sale_above_minimum_keeps_low_stock_pages(self, test_app_instance, test_client_instance, catalog_cache):
+        with test_app_instance.app_context():
+            product = Product(name="Mesa", buy_price=100.0, sell_price=150.0, quantity=50, minimum_stock=5)
+            inventory_db.session.add(product)
+            inventory_db.session.commit()
+            product_id = product.id
+
+            low_stock_page = (*LOW_STOCK_KEY, None, 50, None)
+            catalog_cache.get_or_load(low_stock_page, lambda: ([], None))
+
+            apply_inventory_update({product_id: 3})
+            inventory_db.session.commit()
+            assert catalog_cache.get_or_load(low_stock_page, lambda: None) == ([], None)
+
+            apply_inventory_update({product_id: 45}) # Cruza o mínimo
+            inventory_db.session.commit()
+            assert catalog_cache.get_or_load(low_stock_page, lambda: (["reloaded"], None)) == (["reloaded"], None)
+
+    def test_purge_catalog_changes(self, test_app_instance, test_client_instance):
+        with test_app_instance.app_context():
+            inventory_db.session.add_all([
+                CatalogChange(key='["product", 1]', changed_at=datetime.now() - timedelta(hours=48)),
+                CatalogChange(key='["product", 2]'),
+            ])
+            inventory_db.session.commit()
+            assert purge_catalog_changes(24) == 1
+            assert CatalogChange.query.count() == 1
+
+    def test_ttl_and_lru_eviction(self, test_app_instance, test_client_instance):
+        with test_app_instance.app_context():
+            cache = CatalogCache(maxsize=2, ttl=0)
+            cache.get_or_load(product_key(1), lambda: {"id": 1})
+            assert cache.get_or_load(product_key(1), lambda: {"id": 1, "expired": True}) == {"id": 1, "expired": True}
+
+            cache = CatalogCache(maxsize=2, ttl=60)
+            for product_id in (1, 2, 3):
+                cache.get_or_load(product_key(product_id), lambda: {"id": product_id})
+            assert len(cache) == 2
+            assert cache.stats()['evictions'] == 1
+
+    def test_metrics_endpoint(self, test_client_instance, authorized_headers, created_product_data):
+        test_client_instance.get(f"/api/inventory/products/{created_product_data['id']}", headers=authorized_headers)
+        response = test_client_instance.get('/metrics/cache')
+        assert response.status_code == 200
+        assert response.json['catalog']['misses'] == 1
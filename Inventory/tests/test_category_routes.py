@@ -105,4 +105,55 @@ class TestCategoryRoutes:
 
     def test_delete_category_not_found(self, test_client_instance, authorized_headers):
         response = test_client_instance.delete('/api/inventory/categories/99999', headers=authorized_headers)
-        assert response.status_code == 404
\ No newline at end of file
+        assert response.status_code == 404
+    # GET /api/inventory/categories/<id>/subtree
+    def _create(self, client, headers, name, parent_id=None):
+        payload = {"name": name, "details_model": f"Modelo {name}", "parent_category_id": parent_id}
+        return client.post('/api/inventory/categories/', headers=headers, json=payload).json['id']
+
+    def test_get_category_subtree(self, test_client_instance, authorized_headers):
+        root = self._create(test_client_instance, authorized_headers, "Casa")
+        kitchen = self._create(test_client_instance, authorized_headers, "Cozinha", root)
+        pans = self._create(test_client_instance, authorized_headers, "Panelas", kitchen)
+        self._create(test_client_instance, authorized_headers, "Jardim")
+
+        response = test_client_instance.get(f'/api/inventory/categories/{root}/subtree', headers=authorized_headers)
+        assert response.status_code == 200
+        assert [(item['id'], item['depth']) for item in response.json] == [(root, 0), (kitchen, 1), (pans, 2)]
+
+    def test_get_category_subtree_not_found(self, test_client_instance, authorized_headers):
+        response = test_client_instance.get('/api/inventory/categories/99999/subtree', headers=authorized_headers)
+        assert response.status_code == 404
+
+    def test_reparent_moves_whole_subtree(self, test_client_instance, authorized_headers):
+        home = self._create(test_client_instance, authorized_headers, "Casa")
+        garden = self._create(test_client_instance, authorized_headers, "Jardim")
+        tools = self._create(test_client_instance, authorized_headers, "Ferramentas", home)
+        shovels = self._create(test_client_instance, authorized_headers, "Pás", tools)
+
+        response = test_client_instance.put(f'/api/inventory/categories/{tools}', headers=authorized_headers, json={"parent_category_id": garden})
+        assert response.status_code == 200
+
+        home_subtree = test_client_instance.get(f'/api/inventory/categories/{home}/subtree', headers=authorized_headers).json
+        garden_subtree = test_client_instance.get(f'/api/inventory/categories/{garden}/subtree', headers=authorized_headers).json
+        assert [item['id'] for item in home_subtree] == [home]
+        assert [(item['id'], item['depth']) for item in garden_subtree] == [(garden, 0), (tools, 1), (shovels, 2)]
+
+    def test_reparent_under_own_descendant_rejected(self, test_client_instance, authorized_headers):
+        root = self._create(test_client_instance, authorized_headers, "Casa")
+        child = self._create(test_client_instance, authorized_headers, "Cozinha", root)
+
+        response = test_client_instance.put(f'/api/inventory/categories/{root}', headers=authorized_headers, json={"parent_category_id": child})
+        assert response.status_code == 422
+
+    def test_delete_category_makes_children_roots(self, test_client_instance, authorized_headers):
+        root = self._create(test_client_instance, authorized_headers, "Casa")
+        middle = self._create(test_client_instance, authorized_headers, "Cozinha", root)
+        leaf = self._create(test_client_instance, authorized_headers, "Panelas", middle)
+
+        assert test_client_instance.delete(f'/api/inventory/categories/{middle}', headers=authorized_headers).status_code == 204
+
+        root_subtree = test_client_instance.get(f'/api/inventory/categories/{root}/subtree', headers=authorized_headers).json
+        leaf_category = test_client_instance.get(f'/api/inventory/categories/{leaf}', headers=authorized_headers).json
+        assert [item['id'] for item in root_subtree] == [root]
+        assert leaf_category['parent_category'] is None
@@ -0,0 +1,53 @@
+import pytest
+from inventory.clients import clients
+from inventory.images import GCSImageStore
+
+
+class FakeClient:
+    def __init__(self, config):
+        self.config = config
+
+    def bucket(self, name):
+        return (self, name)
+
+
+@pytest.fixture
+def fake_storage():
+    factory = clients._factories['storage']
+    clients.register('storage', FakeClient)
+    clients.reset()
+    yield
+    clients.register('storage', factory)
+    clients.reset()
+
+
+class TestProcessClients:
+
+    def test_gcs_store_uses_process_client(self, test_app_instance, fake_storage):
+        store = GCSImageStore('bucket-test')
+        assert clients.created() == []
+        with test_app_instance.app_context():
+            client, name = store.bucket
+            assert client is clients.get('storage')
+        assert name == 'bucket-test'
+        assert clients.created() == ['storage']
+
+
+class TestReadiness:
+
+    def test_readyz_warms_configured_clients(self, test_app_instance, test_client_instance, fake_storage, monkeypatch):
+        monkeypatch.setitem(test_app_instance.config, 'WARM_UP_CLIENTS', ['storage'])
+        response = test_client_instance.get('/readyz')
+        assert response.status_code == 200
+        assert response.json == {"status": "ready", "clients": ["storage"]}
+
+    def test_readyz_returns_503_when_client_fails(self, test_app_instance, test_client_instance, monkeypatch):
+        def broken(config):
+            raise RuntimeError("sem credenciais")
+
+        monkeypatch.setitem(clients._factories, 'broken', broken)
+        monkeypatch.setitem(test_app_instance.config, 'WARM_UP_CLIENTS', ['broken'])
+        response = test_client_instance.get('/readyz')
+        assert response.status_code == 503
+        assert response.json['error'] == "sem credenciais"
+        assert 'broken' not in clients.created()
@@ -0,0 +1,62 @@
+import csv
+import gzip
+import io
+import json
+import pytest
+from inventory import db as inventory_db
+from inventory.models import Product, Inventory, Stock
+
+
+@pytest.fixture(scope='function')
+def exported_catalog(test_app_instance, test_client_instance):
+    with test_app_instance.app_context():
+        products = [Product(name=f"Produto {i}", buy_price=10.0, sell_price=15.0, quantity=i) for i in range(25)]
+        location = Inventory(name="Loja", address="Rua A")
+        inventory_db.session.add_all(products + [location])
+        inventory_db.session.flush()
+        inventory_db.session.add_all([
+            Stock(product_id=product.id, inventory_location_id=location.id, quantity=1) for product in products[:3]
+        ])
+        inventory_db.session.commit()
+        return {"product_ids": [product.id for product in products], "location_id": location.id}
+
+
+class TestExport:
+
+    def test_products_ndjson_streamed(self, test_app_instance, test_client_instance, authorized_headers, exported_catalog):
+        test_app_instance.config['EXPORT_YIELD_PER'] = 10
+        try:
+            response = test_client_instance.get('/api/inventory/products/export', headers=authorized_headers)
+        finally:
+            test_app_instance.config['EXPORT_YIELD_PER'] = 1000
+
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'application/x-ndjson'
+        assert 'Content-Length' not in response.headers
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [row['id'] for row in rows] == exported_catalog['product_ids']
+        with test_app_instance.app_context():
+            assert rows[0] == inventory_db.session.get(Product, rows[0]['id']).to_dict()
+
+    def test_products_csv_gzip(self, test_client_instance, authorized_headers, exported_catalog):
+        headers = {**authorized_headers, "Accept-Encoding": "gzip"}
+        response = test_client_instance.get('/api/inventory/products/export?format=csv&fields=id,name,profit', headers=headers)
+
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert response.headers['Content-Disposition'] == 'attachment; filename=products.csv'
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.data).decode('utf-8'))))
+        assert len(rows) == 25
+        assert rows[0] == {"id": str(exported_catalog['product_ids'][0]), "name": "Produto 0", "profit": "5.0"}
+
+    def test_stock_export_filtered(self, test_client_instance, authorized_headers, exported_catalog):
+        product_id = exported_catalog['product_ids'][1]
+        response = test_client_instance.get(f'/api/inventory/stock/export?product_id={product_id}', headers=authorized_headers)
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert [(row['product_id'], row['inventory_location_id'], row['quantity']) for row in rows] == [
+            (product_id, exported_catalog['location_id'], 1)
+        ]
+
+    def test_export_invalid_format(self, test_client_instance, authorized_headers):
+        response = test_client_instance.get('/api/inventory/stock/export?format=xml', headers=authorized_headers)
+        assert response.status_code == 400
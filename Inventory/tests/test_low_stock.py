@@ -0,0 +1,110 @@
+import json
+import pytest
+from concurrent.futures import Future
+from inventory import db as inventory_db
+from inventory.models import Product, OutboxMessage
+from inventory.outbox import relay_batch
+from inventory.topics import LOW_STOCK_TOPIC_NAME
+from tests.test_pubsub_handles import pubsub_envelope
+
+
+class FakePublisher:
+    def __init__(self):
+        self.published = []
+
+    def topic_path(self, project_id, topic_name):
+        return f"projects/{project_id}/topics/{topic_name}"
+
+    def publish(self, topic_path, data):
+        self.published.append((topic_path, json.loads(data.decode('utf-8'))))
+        future = Future()
+        future.set_result(str(len(self.published)))
+        return future
+
+
+@pytest.fixture(scope='function')
+def catalog(test_app_instance, test_client_instance):
+    """Três produtos com mínimo 10: um já abaixo, um logo acima e um folgado."""
+    with test_app_instance.app_context():
+        products = [
+            Product(name="Abaixo", buy_price=1.0, sell_price=2.0, quantity=4, minimum_stock=10),
+            Product(name="Limite", buy_price=1.0, sell_price=2.0, quantity=12, minimum_stock=10),
+            Product(name="Folgado", buy_price=1.0, sell_price=2.0, quantity=500, minimum_stock=10),
+        ]
+        inventory_db.session.add_all(products)
+        inventory_db.session.commit()
+        return {product.name: product.id for product in products}
+
+
+def low_stock_events(app):
+    with app.app_context():
+        return [json.loads(m.payload) for m in OutboxMessage.query.filter_by(topic=LOW_STOCK_TOPIC_NAME).order_by(OutboxMessage.id)]
+
+
+class TestLowStock:
+
+    def test_low_stock_report(self, test_client_instance, authorized_headers, catalog):
+        response = test_client_instance.get('/api/inventory/products/low-stock', headers=authorized_headers)
+        assert response.status_code == 200
+        assert response.json == [{"id": catalog["Abaixo"], "name": "Abaixo", "quantity": 4, "minimum_stock": 10,
+                                  "category_id": None, "shortfall": 6}]
+
+    def test_report_refreshed_after_decrement(self, test_client_instance, authorized_headers, catalog):
+        assert len(test_client_instance.get('/api/inventory/products/low-stock', headers=authorized_headers).json) == 1
+
+        test_client_instance.post('/api/inventory/pubsub/inventory-update',
+                                  json=pubsub_envelope({"product_id": catalog["Limite"], "quantity_sold": 3}))
+
+        response = test_client_instance.get('/api/inventory/products/low-stock', headers=authorized_headers)
+        assert [row['name'] for row in response.json] == ["Abaixo", "Limite"]
+
+    def test_report_paginated(self, test_client_instance, authorized_headers, catalog):
+        test_client_instance.post('/api/inventory/pubsub/inventory-update',
+                                  json=pubsub_envelope({"product_id": catalog["Limite"], "quantity_sold": 5}))
+        first = test_client_instance.get('/api/inventory/products/low-stock?limit=1', headers=authorized_headers)
+        second = test_client_instance.get(f"/api/inventory/products/low-stock?limit=1&cursor={first.headers['X-Next-Cursor']}",
+                                          headers=authorized_headers)
+        assert [row['name'] for row in first.json + second.json] == ["Abaixo", "Limite"]
+        assert 'X-Next-Cursor' not in second.headers
+
+    def test_event_only_when_threshold_is_crossed(self, test_client_instance, test_app_instance, catalog):
+        message = {"version": 2, "sale_order_id": 1, "items": [
+            {"product_id": catalog["Abaixo"], "quantity_sold": 1},   # Já estava abaixo: sem evento
+            {"product_id": catalog["Limite"], "quantity_sold": 2},   # 12 -> 10: cruza o mínimo
+            {"product_id": catalog["Folgado"], "quantity_sold": 50}, # Continua acima
+        ]}
+        test_client_instance.post('/api/inventory/pubsub/inventory-update', json=pubsub_envelope(message, message_id="m-1"))
+        # Nova baixa do mesmo produto já abaixo do mínimo não repete o evento
+        test_client_instance.post('/api/inventory/pubsub/inventory-update',
+                                  json=pubsub_envelope({"product_id": catalog["Limite"], "quantity_sold": 1}))
+
+        assert low_stock_events(test_app_instance) == [
+            {"product_id": catalog["Limite"], "quantity": 10, "minimum_stock": 10, "shortfall": 0, "reference": "m-1"}
+        ]
+
+    def test_event_published_by_relay(self, test_client_instance, test_app_instance, catalog):
+        test_client_instance.post('/api/inventory/pubsub/inventory-update',
+                                  json=pubsub_envelope({"product_id": catalog["Limite"], "quantity_sold": 12}))
+        publisher = FakePublisher()
+        with test_app_instance.app_context():
+            assert relay_batch(publisher, "test-project") == 1
+        topic, payload = publisher.published[0]
+        assert topic == "projects/test-project/topics/low-stock"
+        assert payload["quantity"] == 0
+
+    def test_bulk_minimum_stock_update(self, test_client_instance, authorized_headers, catalog):
+        items = [{"product_id": catalog["Limite"], "minimum_stock": 15},
+                 {"product_id": catalog["Abaixo"], "minimum_stock": 2},
+                 {"product_id": 999999, "minimum_stock": 5}]
+        response = test_client_instance.put('/api/inventory/products/minimum-stock', headers=authorized_headers, json={"items": items})
+        assert response.status_code == 200
+        assert response.json == {"updated": 2, "missing_product_ids": [999999]}
+
+        # O relatório em cache é invalidado pela escrita
+        report = test_client_instance.get('/api/inventory/products/low-stock', headers=authorized_headers)
+        assert [(row['name'], row['shortfall']) for row in report.json] == [("Limite", 3)]
+
+    def test_bulk_minimum_stock_invalid(self, test_client_instance, authorized_headers, catalog):
+        response = test_client_instance.put('/api/inventory/products/minimum-stock', headers=authorized_headers,
+                                            json={"items": [{"product_id": catalog["Limite"], "minimum_stock": -1}]})
+        assert response.status_code == 400
@@ -0,0 +1,215 @@
+import io
+import json
+import os
+import pytest
+from datetime import timedelta
+from PIL import Image
+from inventory import db as inventory_db
+from inventory import images
+from inventory.images import LocalImageStore, process_image_jobs
+from inventory.models import Product, ProductImageJob
+
+SIZES = [200, 600]
+
+
+@pytest.fixture(scope='function')
+def image_store(test_app_instance, test_client_instance, tmp_path):
+    """Diretórios temporários no lugar do bucket do GCS e do volume de staging do pod."""
+    previous = test_app_instance.extensions['image_store'], test_app_instance.config['IMAGE_STAGING_DIR']
+    store = LocalImageStore(str(tmp_path / 'bucket'), test_app_instance.config['IMAGE_LOCAL_BASE_URL'])
+    test_app_instance.extensions['image_store'] = store
+    test_app_instance.config['IMAGE_STAGING_DIR'] = str(tmp_path / 'staging')
+    yield store
+    test_app_instance.extensions['image_store'], test_app_instance.config['IMAGE_STAGING_DIR'] = previous
+
+
+@pytest.fixture(scope='function')
+def upload_headers(authorized_headers):
+    return {"Authorization": authorized_headers["Authorization"]}
+
+
+def png(width=1200, height=800, color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def product_form(image=None, **fields):
+    payload = {"name": "Cadeira", "price": 100.0, "category": "Móveis", **fields}
+    form = {"product": (io.BytesIO(json.dumps(payload).encode('utf-8')), 'product.json', 'application/json')}
+    if image is not None:
+        form["image"] = (io.BytesIO(image), 'foto.png')
+    return form
+
+
+def run_pipeline(app, store):
+    with app.app_context():
+        return process_image_jobs(store, SIZES)
+
+
+def stored_files(store):
+    return sorted(os.path.relpath(os.path.join(root, name), store.root)
+                  for root, _, names in os.walk(store.root) for name in names)
+
+
+def staged_files(app):
+    staging_dir = app.config['IMAGE_STAGING_DIR']
+    return sorted(os.listdir(staging_dir)) if os.path.isdir(staging_dir) else []
+
+
+def get_product(app, product_id):
+    with app.app_context():
+        return inventory_db.session.get(Product, product_id).to_dict()
+
+
+class TestProductImages:
+
+    def test_create_returns_pending_and_worker_uploads(self, test_app_instance, test_client_instance, upload_headers, image_store):
+        response = test_client_instance.post('/api/inventory/products/', headers=upload_headers, data=product_form(png()))
+        assert response.status_code == 201
+        assert (response.json['image_status'], response.json['product_image']) == ('pending', None)
+        # A requisição não fala com o bucket: a original fica no disco do pod e a fila guarda só o nome
+        assert stored_files(image_store) == []
+        original = staged_files(test_app_instance)
+        assert len(original) == 1
+        with test_app_instance.app_context():
+            assert ProductImageJob.query.one().staged_file == original[0]
+
+        assert run_pipeline(test_app_instance, image_store) == 1
+
+        product = get_product(test_app_instance, response.json['id'])
+        assert product['image_status'] == 'ready'
+        assert product['product_image'].startswith('/api/inventory/products/images/')
+        assert sorted(product['image_thumbnails']) == ['200', '600']
+        thumbnail = test_client_instance.get(product['image_thumbnails']['600'])
+        assert thumbnail.status_code == 200
+        assert Image.open(io.BytesIO(thumbnail.data)).size == (600, 400)
+        assert len(stored_files(image_store)) == 3
+        assert product['product_image'].endswith(original[0])
+        assert staged_files(test_app_instance) == []
+
+    def test_store_io_only_in_worker_outside_transactions(self, test_app_instance, test_client_instance, upload_headers, image_store):
+        class CheckingStore(LocalImageStore):
+            calls = 0
+
+            def _check(self):
+                CheckingStore.calls += 1
+                assert not inventory_db.session().in_transaction()
+
+            def upload(self, name, data, content_type):
+                self._check()
+                super().upload(name, data, content_type)
+
+            def delete(self, name):
+                self._check()
+                super().delete(name)
+
+        store = CheckingStore(image_store.root, image_store.base_url)
+        test_app_instance.extensions['image_store'] = store
+        product_id = test_client_instance.post('/api/inventory/products/', headers=upload_headers, data=product_form(png())).json['id']
+        test_client_instance.put(f'/api/inventory/products/{product_id}', headers=upload_headers, data=product_form(png(color='blue')))
+        assert CheckingStore.calls == 0
+
+        # O primeiro upload é superado sem I/O; o segundo sobe a original e as miniaturas
+        assert run_pipeline(test_app_instance, store) == 2
+        assert get_product(test_app_instance, product_id)['image_status'] == 'ready'
+        assert CheckingStore.calls == 3
+        assert len(stored_files(image_store)) == 3
+        assert staged_files(test_app_instance) == []
+
+    def test_replacing_image_removes_superseded_blobs(self, test_app_instance, test_client_instance, upload_headers, image_store):
+        product_id = test_client_instance.post('/api/inventory/products/', headers=upload_headers, data=product_form(png())).json['id']
+        run_pipeline(test_app_instance, image_store)
+        old_files = stored_files(image_store)
+
+        response = test_client_instance.put(f'/api/inventory/products/{product_id}', headers=upload_headers,
+                                            data=product_form(png(color='blue')))
+        # A imagem anterior continua valendo até o worker trocar
+        assert response.json['image_status'] == 'pending'
+        assert response.json['product_image'] is not None
+        run_pipeline(test_app_instance, image_store)
+
+        new_files = stored_files(image_store)
+        assert len(new_files) == 3
+        assert not set(old_files) & set(new_files)
+        assert get_product(test_app_instance, product_id)['image_status'] == 'ready'
+
+    def test_only_latest_of_queued_uploads_is_kept(self, test_app_instance, test_client_instance, upload_headers, image_store):
+        product_id = test_client_instance.post('/api/inventory/products/', headers=upload_headers, data=product_form(png())).json['id']
+        test_client_instance.put(f'/api/inventory/products/{product_id}', headers=upload_headers, data=product_form(png(300, 300)))
+
+        run_pipeline(test_app_instance, image_store)
+
+        product = get_product(test_app_instance, product_id)
+        assert len(stored_files(image_store)) == 3
+        assert Image.open(io.BytesIO(test_client_instance.get(product['product_image']).data)).size == (300, 300)
+
+    def test_clear_and_delete_remove_blobs(self, test_app_instance, test_client_instance, upload_headers, image_store):
+        first = test_client_instance.post('/api/inventory/products/', headers=upload_headers, data=product_form(png())).json['id']
+        second = test_client_instance.post('/api/inventory/products/', headers=upload_headers, data=product_form(png())).json['id']
+        run_pipeline(test_app_instance, image_store)
+        assert len(stored_files(image_store)) == 6
+
+        response = test_client_instance.put(f'/api/inventory/products/{first}', headers=upload_headers,
+                                            data=product_form(product_image=None))
+        assert (response.json['product_image'], response.json['image_thumbnails']) == (None, None)
+        test_client_instance.delete(f'/api/inventory/products/{second}', headers=upload_headers)
+        run_pipeline(test_app_instance, image_store)
+
+        assert stored_files(image_store) == []
+
+    def test_invalid_image_rejected(self, test_client_instance, upload_headers, image_store):
+        form = product_form()
+        form["image"] = (io.BytesIO(b"not an image"), 'foto.png')
+        response = test_client_instance.post('/api/inventory/products/', headers=upload_headers, data=form)
+        assert response.status_code == 422
+
+    def test_failing_upload_retried_then_marked_failed(self, test_app_instance, test_client_instance, upload_headers,
+                                                       image_store, monkeypatch):
+        class BrokenStore(LocalImageStore):
+            def upload(self, name, data, content_type):
+                raise IOError("bucket unavailable")
+
+        monkeypatch.setattr(images, '_backoff', lambda attempts: timedelta(0))
+        product_id = test_client_instance.post('/api/inventory/products/', headers=upload_headers, data=product_form(png())).json['id']
+
+        assert run_pipeline(test_app_instance, BrokenStore(image_store.root, image_store.base_url)) == 0
+
+        assert get_product(test_app_instance, product_id)['image_status'] == 'failed'
+        assert staged_files(test_app_instance) == []
+        with test_app_instance.app_context():
+            assert ProductImageJob.query.count() == 0
+
+    def test_job_claimed_by_dead_workers_is_given_up(self, test_app_instance, test_client_instance, upload_headers, image_store):
+        product_id = test_client_instance.post('/api/inventory/products/', headers=upload_headers, data=product_form(png())).json['id']
+        with test_app_instance.app_context():
+            job = ProductImageJob.query.one()
+            job.attempts = images.MAX_IMAGE_ATTEMPTS
+            inventory_db.session.commit()
+
+        run_pipeline(test_app_instance, image_store)
+
+        assert get_product(test_app_instance, product_id)['image_status'] == 'failed'
+        assert stored_files(image_store) == [] and staged_files(test_app_instance) == []
+
+    def test_upload_staged_on_another_pod_waits_then_fails(self, test_app_instance, test_client_instance, upload_headers, image_store):
+        product_id = test_client_instance.post('/api/inventory/products/', headers=upload_headers, data=product_form(png())).json['id']
+        with test_app_instance.app_context():
+            job = ProductImageJob.query.one()
+            job.staged_on = 'inventory-deploy-replaced'
+            inventory_db.session.commit()
+        os.remove(os.path.join(test_app_instance.config['IMAGE_STAGING_DIR'], staged_files(test_app_instance)[0]))
+
+        # Só o worker daquele pod tem o arquivo
+        assert run_pipeline(test_app_instance, image_store) == 0
+        assert get_product(test_app_instance, product_id)['image_status'] == 'pending'
+
+        with test_app_instance.app_context():
+            job = ProductImageJob.query.one()
+            job.created_at -= timedelta(seconds=images.STAGING_ORPHAN_SECONDS + 1)
+            inventory_db.session.commit()
+        run_pipeline(test_app_instance, image_store)
+
+        assert get_product(test_app_instance, product_id)['image_status'] == 'failed'
+        with test_app_instance.app_context():
+            assert ProductImageJob.query.count() == 0
@@ -0,0 +1,129 @@
+import json
+import pytest
+from inventory import db as inventory_db
+from inventory.models import Product, Category, StockMovement, CatalogChange
+
+IMPORT_URL = '/api/inventory/products/import'
+
+
+@pytest.fixture(scope='function')
+def import_headers(authorized_headers):
+    return {"Authorization": authorized_headers["Authorization"]}
+
+
+@pytest.fixture(scope='function')
+def category_id(test_app_instance, test_client_instance):
+    with test_app_instance.app_context():
+        category = Category(name="Móveis", details_model="{}")
+        inventory_db.session.add(category)
+        inventory_db.session.commit()
+        return category.id
+
+
+def events(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+class TestProductImport:
+
+    def test_import_csv_in_chunks(self, test_app_instance, test_client_instance, import_headers, category_id):
+        body = "name,buy_price,sell_price,category_id,quantity\n" + "".join(
+            f"Cadeira {i},100,150,{category_id},{i}\n" for i in range(5)
+        )
+        response = test_client_instance.post(f'{IMPORT_URL}?chunk_size=2', headers=import_headers,
+                                             data=body.encode('utf-8'), content_type='text/csv')
+        assert response.status_code == 200
+        assert response.mimetype == 'application/x-ndjson'
+        assert [(e['event'], e['inserted']) for e in events(response)] == [
+            ('progress', 2), ('progress', 4), ('progress', 5), ('done', 5)
+        ]
+
+        with test_app_instance.app_context():
+            products = Product.query.order_by(Product.id).all()
+            assert [(p.name, p.category, p.minimum_stock) for p in products[:1]] == [("Cadeira 0", "Móveis", 10)]
+            assert {p.category_id for p in products} == {category_id}
+            # Saldo inicial no ledger, como nas escritas pelo ORM
+            assert sorted(m.delta for m in StockMovement.query.filter_by(reason='opening')) == [1, 2, 3, 4]
+
+    def test_import_ndjson_reports_row_errors(self, test_app_instance, test_client_instance, import_headers, category_id):
+        lines = [
+            json.dumps({"name": "Mesa", "buy_price": 300, "category": "móveis"}),
+            json.dumps({"buy_price": 10}),
+            "{not json",
+            "",
+            json.dumps({"name": "Sofá", "buy_price": 900, "category_id": 999}),
+            json.dumps({"name": "Lâmpada", "buy_price": "abc"}),
+        ]
+        response = test_client_instance.post(IMPORT_URL, headers=import_headers,
+                                             data="\n".join(lines).encode('utf-8'), content_type='application/x-ndjson')
+        result = events(response)
+        errors = [(e['row'], e['error']) for e in result if e['event'] == 'error']
+        assert errors == [
+            (2, "'name' is required"), (3, errors[1][1]), (5, "Category 999 not found"), (6, "'buy_price' must be a number")
+        ]
+        assert errors[1][1].startswith("Invalid JSON")
+        # Erros só depois do corpo inteiro lido: antes deles, apenas o progresso
+        assert result[0]['event'] == 'progress'
+        assert result[-1] == {"event": "done", "processed": 5, "inserted": 1, "failed": 4}
+
+        with test_app_instance.app_context():
+            # Categoria resolvida pelo nome
+            assert Product.query.filter_by(name="Mesa").one().category_id == category_id
+
+    def test_import_rejects_fractional_quantities(self, test_app_instance, test_client_instance, import_headers):
+        lines = [
+            json.dumps({"name": "Mesa", "buy_price": 300, "quantity": 1.5}),
+            json.dumps({"name": "Sofá", "buy_price": 900, "quantity": 2.0, "minimum_stock": "3"}),
+        ]
+        response = test_client_instance.post(IMPORT_URL, headers=import_headers,
+                                             data="\n".join(lines).encode('utf-8'), content_type='application/x-ndjson')
+        assert [(e['row'], e['error']) for e in events(response) if e['event'] == 'error'] == [(1, "'quantity' must be an integer")]
+
+        csv_body = "name,buy_price,quantity\nCadeira,100,1.5\n"
+        response = test_client_instance.post(IMPORT_URL, headers=import_headers, data=csv_body.encode('utf-8'), content_type='text/csv')
+        assert [e['error'] for e in events(response) if e['event'] == 'error'] == ["'quantity' must be an integer"]
+
+        with test_app_instance.app_context():
+            assert [(p.name, p.quantity, p.minimum_stock) for p in Product.query.all()] == [("Sofá", 2, 3)]
+
+    def test_imported_products_visible_through_cache(self, test_client_instance, import_headers, authorized_headers):
+        body = json.dumps({"name": "Tapete", "buy_price": 50, "quantity": 1, "minimum_stock": 5})
+        assert test_client_instance.get('/api/inventory/products/low-stock', headers=authorized_headers).json == []
+
+        test_client_instance.post(IMPORT_URL, headers=import_headers, data=body, content_type='application/x-ndjson')
+
+        report = test_client_instance.get('/api/inventory/products/low-stock', headers=authorized_headers)
+        assert [row['name'] for row in report.json] == ["Tapete"]
+
+    def test_import_without_sell_price_reads_back(self, test_client_instance, import_headers, authorized_headers):
+        body = json.dumps({"name": "Luminária", "buy_price": 30, "quantity": 4})
+        result = events(test_client_instance.post(IMPORT_URL, headers=import_headers, data=body, content_type='application/x-ndjson'))
+        assert result[-1]['inserted'] == 1
+
+        search = test_client_instance.get('/api/inventory/products/search?name=Lumin', headers=authorized_headers)
+        assert search.status_code == 200
+        product = test_client_instance.get(f"/api/inventory/products/{search.json[0]['id']}", headers=authorized_headers)
+        assert product.status_code == 200
+        assert (product.json['sell_price'], product.json['buy_price']) == (0.0, 30.0)
+
+    def test_import_invalidates_only_low_stock(self, test_app_instance, test_client_instance, import_headers):
+        body = "\n".join(json.dumps({"name": f"Item {i}", "buy_price": 1}) for i in range(5))
+        response = test_client_instance.post(f'{IMPORT_URL}?chunk_size=2', headers=import_headers, data=body,
+                                             content_type='application/x-ndjson')
+        assert events(response)[-1]['inserted'] == 5
+
+        with test_app_instance.app_context():
+            # Uma mudança por lote, não uma por produto inserido
+            assert [change.key for change in CatalogChange.query.all()] == ['["low_stock"]'] * 3
+
+    def test_import_unsupported_content_type(self, test_client_instance, authorized_headers):
+        response = test_client_instance.post(IMPORT_URL, headers=authorized_headers, json=[{"name": "X"}])
+        assert response.status_code == 415
+
+    def test_import_error_lines_are_capped(self, test_client_instance, import_headers, monkeypatch):
+        from inventory.routes import product_routes
+        monkeypatch.setattr(product_routes, 'MAX_IMPORT_ERROR_LINES', 2)
+        body = "\n".join(json.dumps({"buy_price": 1}) for _ in range(5))
+        result = events(test_client_instance.post(IMPORT_URL, headers=import_headers, data=body, content_type='application/x-ndjson'))
+        assert [e['event'] for e in result] == ['error', 'error', 'errors_truncated', 'done']
+        assert result[-1]['failed'] == 5
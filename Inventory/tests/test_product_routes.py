@@ -1,4 +1,6 @@
 import json
+from inventory import db as inventory_db
+from inventory.models import Product as ProductModel, Category as CategoryModel
 
 # Payloads de exemplo
 new_product_payload = {
@@ -61,6 +63,79 @@ class TestProductRoutes:
         assert len(data_list) == 1
         assert data_list[0]['name'] == created_product_data['name']
 
+    def test_get_all_products_paginated_with_cursor(self, test_client_instance, authorized_headers, test_app_instance):
+        with test_app_instance.app_context():
+            inventory_db.session.add_all([
+                ProductModel(name=f"Produto {i}", buy_price=10.0, sell_price=15.0) for i in range(5)
+            ])
+            inventory_db.session.commit()
+
+        first = test_client_instance.get('/api/inventory/products/?limit=2', headers=authorized_headers)
+        assert first.status_code == 200
+        assert len(first.json) == 2
+
+        seen_ids = [product['id'] for product in first.json]
+        cursor = first.headers.get('X-Next-Cursor')
+        while cursor:
+            page = test_client_instance.get(f'/api/inventory/products/?limit=2&cursor={cursor}', headers=authorized_headers)
+            seen_ids.extend(product['id'] for product in page.json)
+            cursor = page.headers.get('X-Next-Cursor')
+        assert seen_ids == sorted(set(seen_ids))
+        assert len(seen_ids) == 5
+
+    def test_get_all_products_sparse_fields(self, test_client_instance, authorized_headers, created_product_data):
+        response = test_client_instance.get('/api/inventory/products/?fields=name,profit', headers=authorized_headers)
+        assert response.status_code == 200
+        assert response.json == [{
+            "name": created_product_data['name'],
+            "profit": created_product_data['sell_price'] - created_product_data['buy_price']
+        }]
+
+    def test_get_all_products_invalid_field(self, test_client_instance, authorized_headers):
+        response = test_client_instance.get('/api/inventory/products/?fields=name,password', headers=authorized_headers)
+        assert response.status_code == 400
+        assert response.json['details']['fields'] == ['password']
+
+    def test_get_all_products_filters(self, test_client_instance, authorized_headers, test_app_instance, created_category_data):
+        with test_app_instance.app_context():
+            inventory_db.session.add_all([
+                ProductModel(name="Baixo estoque", buy_price=1.0, sell_price=2.0, quantity=3, minimum_stock=10,
+                             category_id=created_category_data['id']),
+                ProductModel(name="Estoque ok", buy_price=1.0, sell_price=2.0, quantity=50, minimum_stock=10,
+                             category_id=created_category_data['id']),
+                ProductModel(name="Sem categoria", buy_price=1.0, sell_price=2.0, quantity=1, minimum_stock=10),
+            ])
+            inventory_db.session.commit()
+
+        response = test_client_instance.get(f"/api/inventory/products/?fields=name&category_id={created_category_data['id']}", headers=authorized_headers)
+        assert {p['name'] for p in response.json} == {"Baixo estoque", "Estoque ok"}
+
+        response = test_client_instance.get('/api/inventory/products/?fields=name&low_stock=true', headers=authorized_headers)
+        assert {p['name'] for p in response.json} == {"Baixo estoque", "Sem categoria"}
+
+        response = test_client_instance.get(f"/api/inventory/products/?fields=name&low_stock=true&category_id={created_category_data['id']}", headers=authorized_headers)
+        assert [p['name'] for p in response.json] == ["Baixo estoque"]
+
+    def test_get_all_products_by_category_subtree(self, test_client_instance, authorized_headers, test_app_instance, created_category_data):
+        with test_app_instance.app_context():
+            child = CategoryModel(name="Notebooks", details_model="Modelo", parent_category_id=created_category_data['id'])
+            other = CategoryModel(name="Móveis", details_model="Modelo")
+            inventory_db.session.add_all([child, other])
+            inventory_db.session.flush()
+            inventory_db.session.add_all([
+                ProductModel(name="Na raiz", buy_price=1.0, sell_price=2.0, category_id=created_category_data['id']),
+                ProductModel(name="No filho", buy_price=1.0, sell_price=2.0, category_id=child.id),
+                ProductModel(name="Fora", buy_price=1.0, sell_price=2.0, category_id=other.id),
+            ])
+            inventory_db.session.commit()
+            child_id = child.id
+
+        response = test_client_instance.get(f"/api/inventory/products/?fields=name&category_subtree={created_category_data['id']}", headers=authorized_headers)
+        assert {p['name'] for p in response.json} == {"Na raiz", "No filho"}
+
+        response = test_client_instance.get(f"/api/inventory/products/?fields=name&category_subtree={child_id}", headers=authorized_headers)
+        assert [p['name'] for p in response.json] == ["No filho"]
+
     # GET /api/inventory/products/<id>
     def test_get_product_by_id_success(self, test_client_instance, authorized_headers, created_product_data):
         product_id = created_product_data['id']
@@ -123,4 +198,42 @@ class TestProductRoutes:
     def test_search_products_no_term(self, test_client_instance, authorized_headers):
         response = test_client_instance.get('/api/inventory/products/search', headers=authorized_headers)
         assert response.status_code == 400 # Rota exige o parâmetro 'name'
-        assert "Search term 'name' is required" in response.json['msg']
\ No newline at end of file
+        assert "Search term 'name' is required" in response.json['msg']
+
+    def test_search_products_ranked_and_limited(self, test_client_instance, authorized_headers, test_app_instance):
+        with test_app_instance.app_context():
+            inventory_db.session.add_all([
+                ProductModel(name="Cabo HDMI", buy_price=10.0, sell_price=20.0, desc="Compatível com monitor 4K"),
+                ProductModel(name="Monitor Gamer", buy_price=900.0, sell_price=1300.0, desc="Tela 27 polegadas"),
+                ProductModel(name="Suporte de Monitor", buy_price=80.0, sell_price=150.0),
+                ProductModel(name="Teclado", buy_price=100.0, sell_price=200.0),
+            ])
+            inventory_db.session.commit()
+
+        response = test_client_instance.get('/api/inventory/products/search?name=monitor', headers=authorized_headers)
+        assert response.status_code == 200
+        names = [product['name'] for product in response.json]
+        assert set(names) == {"Monitor Gamer", "Suporte de Monitor", "Cabo HDMI"}
+        assert names[-1] == "Cabo HDMI" # Só a descrição casa com o termo
+
+        response = test_client_instance.get('/api/inventory/products/search?name=monitor&limit=1', headers=authorized_headers)
+        assert len(response.json) == 1
+
+    def test_search_products_tolerates_typos(self, test_client_instance, authorized_headers, created_product_data):
+        response = test_client_instance.get('/api/inventory/products/search?name=smartfone', headers=authorized_headers)
+        assert response.status_code == 200
+        assert [p['id'] for p in response.json] == [created_product_data['id']]
+
+    def test_search_products_sees_updated_names(self, test_client_instance, authorized_headers, created_product_data, test_app_instance):
+        test_client_instance.get('/api/inventory/products/search?name=smartphone', headers=authorized_headers)
+        with test_app_instance.app_context():
+            product = inventory_db.session.get(ProductModel, created_product_data['id'])
+            product.name = "Notebook Pro"
+            inventory_db.session.commit()
+
+        response = test_client_instance.get('/api/inventory/products/search?name=notebook', headers=authorized_headers)
+        assert [p['id'] for p in response.json] == [created_product_data['id']]
+
+    def test_search_products_invalid_limit(self, test_client_instance, authorized_headers):
+        response = test_client_instance.get('/api/inventory/products/search?name=abc&limit=0', headers=authorized_headers)
+        assert response.status_code == 400
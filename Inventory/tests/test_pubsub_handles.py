@@ -0,0 +1,222 @@
+import base64
+import json
+import pytest
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import event
+from inventory import create_app as inventory_create_app, db as inventory_db
+from datetime import datetime, timedelta
+from inventory.idempotency import purge_expired_messages
+from inventory.models import Product, ProcessedMessage
+
+
+def pubsub_envelope(message_data, message_id=None):
+    message_id = message_id or str(uuid.uuid4())
+    data = base64.b64encode(json.dumps(message_data).encode('utf-8')).decode('utf-8')
+    return {"message": {"data": data, "messageId": message_id}, "subscription": "projects/test/subscriptions/inventory-updates"}
+
+
+@pytest.fixture(scope='function')
+def stocked_product_ids(test_app_instance, test_client_instance):
+    """Cria dois produtos com quantidade em estoque e retorna seus IDs."""
+    with test_app_instance.app_context():
+        products = [
+            Product(name="Mouse", buy_price=50.0, sell_price=80.0, quantity=10),
+            Product(name="Monitor", buy_price=700.0, sell_price=1000.0, quantity=5),
+        ]
+        inventory_db.session.add_all(products)
+        inventory_db.session.commit()
+        return [product.id for product in products]
+
+
+def get_quantity(app, product_id):
+    with app.app_context():
+        return inventory_db.session.get(Product, product_id).quantity
+
+
+class TestPubSubHandles:
+
+    # POST /api/inventory/pubsub/inventory-update
+    def test_legacy_single_item_message(self, test_client_instance, test_app_instance, stocked_product_ids):
+        product_id = stocked_product_ids[0]
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update',
+                                             json=pubsub_envelope({"product_id": product_id, "quantity_sold": 3}))
+        assert response.status_code == 200
+        assert response.json['product_id'] == product_id
+        assert response.json['new_quantity'] == 7
+        assert get_quantity(test_app_instance, product_id) == 7
+
+    def test_batched_message_updates_all_items(self, test_client_instance, test_app_instance, stocked_product_ids):
+        mouse_id, monitor_id = stocked_product_ids
+        message = {
+            "version": 2,
+            "sale_order_id": 1,
+            "items": [
+                {"product_id": mouse_id, "quantity_sold": 2},
+                {"product_id": monitor_id, "quantity_sold": 1},
+                {"product_id": mouse_id, "quantity_sold": 1}
+            ]
+        }
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=pubsub_envelope(message))
+        assert response.status_code == 200
+        assert {item['product_id']: item['new_quantity'] for item in response.json['updated']} == {mouse_id: 7, monitor_id: 4}
+        assert get_quantity(test_app_instance, mouse_id) == 7
+        assert get_quantity(test_app_instance, monitor_id) == 4
+
+    def test_quantity_never_goes_negative(self, test_client_instance, test_app_instance, stocked_product_ids):
+        monitor_id = stocked_product_ids[1]
+        message = {"version": 2, "sale_order_id": 1, "items": [{"product_id": monitor_id, "quantity_sold": 50}]}
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=pubsub_envelope(message))
+        assert response.status_code == 200
+        assert get_quantity(test_app_instance, monitor_id) == 0
+
+    def test_batched_message_skips_missing_products(self, test_client_instance, test_app_instance, stocked_product_ids):
+        mouse_id = stocked_product_ids[0]
+        message = {"version": 2, "sale_order_id": 1, "items": [
+            {"product_id": mouse_id, "quantity_sold": 1},
+            {"product_id": 99999, "quantity_sold": 1}
+        ]}
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=pubsub_envelope(message))
+        assert response.status_code == 200
+        assert response.json['missing_product_ids'] == [99999]
+        assert get_quantity(test_app_instance, mouse_id) == 9
+
+    def test_product_not_found(self, test_client_instance):
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update',
+                                             json=pubsub_envelope({"product_id": 99999, "quantity_sold": 1}))
+        assert response.status_code == 404
+
+    def test_unsupported_version(self, test_client_instance):
+        message = {"version": 99, "items": [{"product_id": 1, "quantity_sold": 1}]}
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=pubsub_envelope(message))
+        assert response.status_code == 400
+        assert "Unsupported message version" in response.json['msg']
+
+    def test_missing_fields(self, test_client_instance):
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update',
+                                             json=pubsub_envelope({"product_id": 1}))
+        assert response.status_code == 400
+        assert "Missing product_id or quantity_sold" in response.json['msg']
+
+    @pytest.mark.parametrize("quantity_sold", [-2, 0, 1.5, "3", True])
+    def test_invalid_quantity_sold(self, test_client_instance, test_app_instance, stocked_product_ids, quantity_sold):
+        mouse_id = stocked_product_ids[0]
+        message = {"version": 2, "sale_order_id": 1, "items": [{"product_id": mouse_id, "quantity_sold": quantity_sold}]}
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=pubsub_envelope(message))
+        assert response.status_code == 400
+        assert "quantity_sold must be a positive integer" in response.json['msg']
+        assert get_quantity(test_app_instance, mouse_id) == 10
+
+    def test_single_statement_per_message(self, test_client_instance, test_app_instance, stocked_product_ids):
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with test_app_instance.app_context():
+            engine = inventory_db.engine
+        event.listen(engine, "before_cursor_execute", record_statement)
+        try:
+            message = {"version": 2, "sale_order_id": 1, "items": [
+                {"product_id": product_id, "quantity_sold": 1} for product_id in stocked_product_ids
+            ]}
+            response = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=pubsub_envelope(message))
+        finally:
+            event.remove(engine, "before_cursor_execute", record_statement)
+
+        assert response.status_code == 200
+        stock_statements = [stmt for stmt in statements if "products" in stmt]
+        assert len(stock_statements) == 1
+        assert stock_statements[0].startswith("UPDATE products")
+        assert "RETURNING" in stock_statements[0]
+        assert not any(stmt.startswith("SELECT") for stmt in statements)
+
+    def test_parallel_deliveries_do_not_lose_decrements(self, tmp_path):
+        # Banco em arquivo: cada thread usa sua própria conexão
+        app = inventory_create_app(config_overrides={
+            "TESTING": True,
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'concurrency.db'}",
+            "JWT_SECRET_KEY": "test-jwt-secret-key-inventory",
+        })
+        with app.app_context():
+            product = Product(name="Teclado", buy_price=100.0, sell_price=150.0, quantity=200)
+            inventory_db.session.add(product)
+            inventory_db.session.commit()
+            product_id = product.id
+
+        deliveries = 40
+
+        def deliver(index):
+            with app.test_client() as client:
+                message = {"version": 2, "sale_order_id": index, "items": [{"product_id": product_id, "quantity_sold": 3}]}
+                return client.post('/api/inventory/pubsub/inventory-update', json=pubsub_envelope(message, str(index))).status_code
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            status_codes = list(executor.map(deliver, range(deliveries)))
+
+        assert status_codes == [200] * deliveries
+        assert get_quantity(app, product_id) == 200 - 3 * deliveries
+        with app.app_context():
+            inventory_db.engine.dispose()
+
+    def test_redelivered_message_is_applied_once(self, test_client_instance, test_app_instance, stocked_product_ids):
+        mouse_id = stocked_product_ids[0]
+        envelope = pubsub_envelope({"product_id": mouse_id, "quantity_sold": 2}, message_id="redelivered-1")
+
+        first = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=envelope)
+        second = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=envelope)
+        assert first.status_code == 200
+        assert second.status_code == 200
+        assert second.json['status'] == "duplicate"
+        assert get_quantity(test_app_instance, mouse_id) == 8
+
+        with test_app_instance.app_context():
+            assert inventory_db.session.get(ProcessedMessage, "redelivered-1") is not None
+
+    def test_duplicate_detected_by_ledger_when_not_cached(self, test_client_instance, test_app_instance, stocked_product_ids):
+        mouse_id = stocked_product_ids[0]
+        envelope = pubsub_envelope({"product_id": mouse_id, "quantity_sold": 2}, message_id="redelivered-2")
+
+        test_client_instance.post('/api/inventory/pubsub/inventory-update', json=envelope)
+        # Simula a entrega em outro worker, com o LRU vazio
+        test_app_instance.extensions['processed_messages'].clear()
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=envelope)
+
+        assert response.status_code == 200
+        assert response.json['status'] == "duplicate"
+        assert get_quantity(test_app_instance, mouse_id) == 8
+
+    def test_failed_message_is_not_recorded(self, test_client_instance, test_app_instance):
+        envelope = pubsub_envelope({"product_id": 99999, "quantity_sold": 1}, message_id="not-found-1")
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=envelope)
+        assert response.status_code == 404
+        assert "not-found-1" not in test_app_instance.extensions['processed_messages']
+        with test_app_instance.app_context():
+            assert inventory_db.session.get(ProcessedMessage, "not-found-1") is None
+
+    def test_other_integrity_errors_are_retried(self, test_client_instance, test_app_instance, stocked_product_ids, monkeypatch):
+        from sqlalchemy.exc import IntegrityError
+        from inventory.routes import pubsub_handles
+
+        def failing_update(quantities, reference=None):
+            raise IntegrityError("INSERT INTO stock_movement ...", {}, Exception("constraint failed"))
+
+        monkeypatch.setattr(pubsub_handles, 'apply_inventory_update', failing_update)
+        envelope = pubsub_envelope({"product_id": stocked_product_ids[0], "quantity_sold": 1}, message_id="constraint-1")
+        response = test_client_instance.post('/api/inventory/pubsub/inventory-update', json=envelope)
+
+        assert response.status_code == 500 # Pub/Sub reentrega
+        assert "constraint-1" not in test_app_instance.extensions['processed_messages']
+        with test_app_instance.app_context():
+            assert inventory_db.session.get(ProcessedMessage, "constraint-1") is None
+
+    def test_purge_expired_messages(self, test_client_instance, test_app_instance):
+        with test_app_instance.app_context():
+            inventory_db.session.add_all([
+                ProcessedMessage(message_id="old", processed_at=datetime.now() - timedelta(hours=200)),
+                ProcessedMessage(message_id="recent", processed_at=datetime.now() - timedelta(hours=1)),
+            ])
+            inventory_db.session.commit()
+
+            assert purge_expired_messages(ttl_hours=168) == 1
+            assert [message.message_id for message in ProcessedMessage.query.all()] == ["recent"]
@@ -0,0 +1,146 @@
+import json
+import pytest
+import uuid
+from concurrent.futures import Future
+from inventory import db as inventory_db
+from inventory.models import Product, ProcessedMessage, StockMovement
+from inventory.pull_worker import InventoryPullWorker
+import inventory.pull_worker as pull_worker_module
+
+
+class FakeMessage:
+    def __init__(self, payload, message_id=None):
+        self.data = payload if isinstance(payload, bytes) else json.dumps(payload).encode('utf-8')
+        self.message_id = message_id or str(uuid.uuid4())
+        self.acked = False
+        self.nacked = False
+
+    def ack(self):
+        self.acked = True
+
+    def nack(self):
+        self.nacked = True
+
+
+class FakeSubscriber:
+    """SubscriberClient local: guarda o callback e entrega mensagens sob demanda."""
+
+    def __init__(self):
+        self.callback = None
+        self.flow_control = None
+        self.future = Future()
+
+    def subscribe(self, subscription_path, callback, flow_control=None):
+        self.subscription_path = subscription_path
+        self.callback = callback
+        self.flow_control = flow_control
+        return self.future
+
+    def deliver(self, *messages):
+        for message in messages:
+            self.callback(message)
+
+
+@pytest.fixture(scope='function')
+def stocked_product_id(test_app_instance, test_client_instance):
+    with test_app_instance.app_context():
+        product = Product(name="Cadeira", buy_price=200.0, sell_price=350.0, quantity=100)
+        inventory_db.session.add(product)
+        inventory_db.session.commit()
+        return product.id
+
+
+@pytest.fixture(scope='function')
+def worker(test_app_instance, test_client_instance):
+    subscriber = FakeSubscriber()
+    worker = InventoryPullWorker(test_app_instance, subscriber, "projects/test/subscriptions/inventory-updates-pull",
+                                 batch_size=3, batch_latency_ms=20, flow_control={"max_messages": 10})
+    worker.start()
+    return worker
+
+
+def get_quantity(app, product_id):
+    with app.app_context():
+        return inventory_db.session.get(Product, product_id).quantity
+
+
+class TestInventoryPullWorker:
+
+    def test_start_subscribes_with_flow_control(self, worker):
+        assert worker.subscriber.callback is not None
+        assert worker.subscriber.flow_control == {"max_messages": 10}
+
+    def test_next_batch_limited_by_size(self, worker):
+        worker.subscriber.deliver(*[FakeMessage({"product_id": 1, "quantity_sold": 1}) for _ in range(5)])
+        assert len(worker.next_batch(wait=0.1)) == 3
+        assert len(worker.next_batch(wait=0.1)) == 2
+        assert worker.next_batch(wait=0.01) == []
+
+    def test_batch_applied_in_one_transaction_and_acked(self, worker, test_app_instance, stocked_product_id):
+        messages = [
+            FakeMessage({"product_id": stocked_product_id, "quantity_sold": 2}),
+            FakeMessage({"version": 2, "sale_order_id": 7, "items": [{"product_id": stocked_product_id, "quantity_sold": 5}]}),
+        ]
+        worker.subscriber.deliver(*messages)
+
+        assert worker.process_batch(worker.next_batch(wait=0.1)) == 2
+        assert all(message.acked for message in messages)
+        assert get_quantity(test_app_instance, stocked_product_id) == 93
+        with test_app_instance.app_context():
+            assert ProcessedMessage.query.count() == 2
+
+    def test_batch_records_one_movement_per_message(self, worker, test_app_instance, stocked_product_id):
+        messages = [
+            FakeMessage({"product_id": stocked_product_id, "quantity_sold": 60}, message_id="pull-1"),
+            FakeMessage({"product_id": stocked_product_id, "quantity_sold": 70}, message_id="pull-2"),
+        ]
+        worker.subscriber.deliver(*messages)
+        worker.process_batch(worker.next_batch(wait=0.1))
+
+        assert get_quantity(test_app_instance, stocked_product_id) == 0
+        with test_app_instance.app_context():
+            movements = StockMovement.query.filter_by(reason='sale').order_by(StockMovement.id).all()
+            # O saldo (100) só cobre parte da segunda mensagem
+            assert [(movement.reference, movement.delta) for movement in movements] == [("pull-1", -60), ("pull-2", -40)]
+
+    def test_duplicates_are_acked_without_decrement(self, worker, test_app_instance, stocked_product_id):
+        first = FakeMessage({"product_id": stocked_product_id, "quantity_sold": 4}, message_id="pull-1")
+        worker.process_batch([first])
+
+        redelivered = FakeMessage({"product_id": stocked_product_id, "quantity_sold": 4}, message_id="pull-1")
+        same_batch_copy = FakeMessage({"product_id": stocked_product_id, "quantity_sold": 4}, message_id="pull-2")
+        same_batch_dup = FakeMessage({"product_id": stocked_product_id, "quantity_sold": 4}, message_id="pull-2")
+        assert worker.process_batch([redelivered, same_batch_copy, same_batch_dup]) == 1
+
+        assert redelivered.acked and same_batch_copy.acked and same_batch_dup.acked
+        assert get_quantity(test_app_instance, stocked_product_id) == 92
+
+    def test_invalid_message_is_acked_and_skipped(self, worker, test_app_instance, stocked_product_id):
+        invalid = FakeMessage(b"not json")
+        valid = FakeMessage({"product_id": stocked_product_id, "quantity_sold": 1})
+        assert worker.process_batch([invalid, valid]) == 1
+        assert invalid.acked and valid.acked
+        assert get_quantity(test_app_instance, stocked_product_id) == 99
+
+    def test_failed_commit_nacks_whole_batch(self, worker, test_app_instance, stocked_product_id, monkeypatch):
+        def failing_update(quantities):
+            raise RuntimeError("database unavailable")
+
+        monkeypatch.setattr(pull_worker_module, "apply_inventory_update", failing_update)
+        messages = [FakeMessage({"product_id": stocked_product_id, "quantity_sold": 1}) for _ in range(2)]
+
+        assert worker.process_batch(messages) == 0
+        assert all(message.nacked and not message.acked for message in messages)
+        assert get_quantity(test_app_instance, stocked_product_id) == 100
+        with test_app_instance.app_context():
+            assert ProcessedMessage.query.count() == 0
+
+    def test_run_stops_when_stream_closes(self, worker, test_app_instance, stocked_product_id):
+        message = FakeMessage({"product_id": stocked_product_id, "quantity_sold": 10})
+        worker.subscriber.deliver(message)
+        worker.subscriber.future.set_result(None) # Stream encerrado
+
+        worker.run()
+
+        assert message.acked
+        assert get_quantity(test_app_instance, stocked_product_id) == 90
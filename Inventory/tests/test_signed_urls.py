@@ -0,0 +1,142 @@
+import threading
+import time
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage
+from google.oauth2 import service_account
+from inventory import db as inventory_db
+from inventory import signed_urls
+from inventory.images import GCSImageStore
+from inventory.models import Product
+from inventory.signed_urls import SignedUrlCache
+
+
+class CountingSigner:
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, names, expiration):
+        self.calls.append(sorted(names))
+        return {name: f"https://signed.test/{name}?expires={expiration}" for name in names}
+
+
+@pytest.fixture(scope='function')
+def products_with_images(test_app_instance, test_client_instance):
+    store = test_app_instance.extensions['image_store']
+    test_app_instance.extensions['signed_url_cache'].clear()
+    with test_app_instance.app_context():
+        products = [
+            Product(name=f"Produto {i}", buy_price=1.0, sell_price=2.0, quantity=1, image_status='ready',
+                    product_image=store.public_url(f"img-{i}.png"),
+                    image_thumbnails={"200": store.public_url(f"thumbnails/200/img-{i}.webp")})
+            for i in range(3)
+        ] + [Product(name="Sem imagem", buy_price=1.0, sell_price=2.0, quantity=1)]
+        inventory_db.session.add_all(products)
+        inventory_db.session.commit()
+        return [product.id for product in products]
+
+
+class TestSignedUrls:
+
+    def test_cache_reuses_until_refresh_margin(self, monkeypatch):
+        now = [1000.0]
+        monkeypatch.setattr(signed_urls.time, 'time', lambda: now[0])
+        cache = SignedUrlCache(expiration=3600, refresh_margin=300)
+        sign = CountingSigner()
+
+        first = cache.get_many(['a', 'b'], sign)
+        now[0] += 3000
+        assert cache.get_many(['a', 'b', 'c'], sign) == {**first, 'c': "https://signed.test/c?expires=3600"}
+        now[0] += 301 # 'a' e 'b' entram na margem de expiração
+        cache.get_many(['a', 'c'], sign)
+
+        assert sign.calls == [['a', 'b'], ['c'], ['a']]
+        assert cache.stats()['hits'] == 3
+
+    def test_cache_evicts_least_recently_used(self):
+        cache = SignedUrlCache(maxsize=2)
+        sign = CountingSigner()
+        cache.get_many(['a', 'b'], sign)
+        cache.get_many(['a'], sign)
+        cache.get_many(['c'], sign)
+        cache.get_many(['a', 'b'], sign)
+        assert sign.calls[-1] == ['b']
+
+    def test_listing_signs_page_in_one_batch(self, test_app_instance, test_client_instance, authorized_headers,
+                                            products_with_images, monkeypatch):
+        store = test_app_instance.extensions['image_store']
+        sign = CountingSigner()
+        monkeypatch.setattr(store, 'sign_urls', sign)
+
+        response = test_client_instance.get('/api/inventory/products/', headers=authorized_headers)
+        test_client_instance.get('/api/inventory/products/', headers=authorized_headers)
+
+        assert len(sign.calls) == 1 and len(sign.calls[0]) == 6
+        assert response.json[0]['image_url'] == "https://signed.test/img-0.png?expires=3600"
+        assert response.json[0]['thumbnail_urls'] == {"200": "https://signed.test/thumbnails/200/img-0.webp?expires=3600"}
+        assert (response.json[-1]['image_url'], response.json[-1]['thumbnail_urls']) == (None, {})
+
+    def test_product_by_id_carries_signed_url(self, test_client_instance, authorized_headers, products_with_images):
+        response = test_client_instance.get(f'/api/inventory/products/{products_with_images[1]}', headers=authorized_headers)
+        # Armazenamento local: a URL "assinada" é a própria URL servida pela API
+        assert response.json['image_url'] == '/api/inventory/products/images/img-1.png'
+
+    def test_gcs_signing_is_local(self):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        credentials = service_account.Credentials.from_service_account_info({
+            "type": "service_account",
+            "client_email": "inventory@test-project.iam.gserviceaccount.com",
+            "private_key": key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                             serialization.NoEncryption()).decode(),
+            "token_uri": "https://oauth2.googleapis.com/token",
+        })
+        client = storage.Client(project="test-project", credentials=credentials)
+
+        def no_network(*args, **kwargs):
+            raise AssertionError("signing must not call GCS")
+        client._http_internal = type("NoHttp", (), {"request": no_network})()
+
+        urls = GCSImageStore("bucket", client=client).sign_urls(["a.png", "thumbnails/200/a.webp"], 600)
+        assert urls["a.png"].startswith("https://storage.googleapis.com/bucket/a.png?X-Goog-Algorithm=GOOG4-RSA-SHA256")
+        assert "X-Goog-Expires=600" in urls["thumbnails/200/a.webp"]
+
+    def test_iam_signing_runs_concurrently_and_skips_failures(self, monkeypatch):
+        credentials = AnonymousCredentials()
+        credentials.service_account_email = "inventory@test-project.iam.gserviceaccount.com"
+        client = storage.Client(project="test-project", credentials=credentials)
+        barrier = threading.Barrier(3, timeout=2)
+
+        def fake_sign(blob, **kwargs):
+            # Simula o signBlob do IAM: cada assinatura é uma chamada remota
+            if blob.name == "broken.png":
+                raise RuntimeError("signBlob failed")
+            if blob.name == "slow.png":
+                time.sleep(1)
+            else:
+                barrier.wait() # Só passa se as três rodarem ao mesmo tempo
+            return f"https://signed.test/{blob.name}"
+        monkeypatch.setattr(storage.Blob, "generate_signed_url", fake_sign)
+
+        store = GCSImageStore("bucket", client=client, sign_workers=8, sign_timeout=0.5)
+        urls = store.sign_urls(["a.png", "b.png", "c.png", "broken.png", "slow.png"], 600)
+
+        assert urls == {name: f"https://signed.test/{name}" for name in ("a.png", "b.png", "c.png")}
+
+    def test_signing_failure_falls_back_to_stored_url(self, test_app_instance, test_client_instance, authorized_headers,
+                                                      products_with_images, monkeypatch):
+        store = test_app_instance.extensions['image_store']
+
+        def broken(names, expiration):
+            raise RuntimeError("IAM unavailable")
+        monkeypatch.setattr(store, 'sign_urls', broken)
+
+        listing = test_client_instance.get('/api/inventory/products/', headers=authorized_headers)
+        by_id = test_client_instance.get(f'/api/inventory/products/{products_with_images[0]}', headers=authorized_headers)
+
+        assert (listing.status_code, by_id.status_code) == (200, 200)
+        assert listing.json[0]['image_url'] == listing.json[0]['product_image']
+        assert by_id.json['thumbnail_urls'] == by_id.json['image_thumbnails']
+        # O que falhou não fica em cache: a próxima requisição tenta assinar de novo
+        assert len(test_app_instance.extensions['signed_url_cache']) == 0
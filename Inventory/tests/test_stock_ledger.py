@@ -0,0 +1,142 @@
+import pytest
+from datetime import datetime
+from inventory import db as inventory_db
+from inventory.ledger import take_stock_snapshot, seed_opening_balances, get_stock_levels
+from inventory.models import Product, Inventory, Stock, StockMovement, StockSnapshot
+from tests.test_pubsub_handles import pubsub_envelope
+
+
+@pytest.fixture(scope='function')
+def stock_setup(test_app_instance, test_client_instance):
+    """Um produto com saldo geral 20 e 10 unidades em cada um de dois locais."""
+    with test_app_instance.app_context():
+        product = Product(name="Cadeira", buy_price=200.0, sell_price=350.0, quantity=20)
+        locations = [Inventory(name="Loja", address="Rua A"), Inventory(name="Depósito", address="Rua B")]
+        inventory_db.session.add_all([product] + locations)
+        inventory_db.session.flush()
+        inventory_db.session.add_all([
+            Stock(product_id=product.id, inventory_location_id=location.id, quantity=10) for location in locations
+        ])
+        inventory_db.session.commit()
+        return {"product_id": product.id, "locations": [location.id for location in locations]}
+
+
+def movements(app, product_id):
+    with app.app_context():
+        return [
+            (m.inventory_location_id, m.delta, m.reason)
+            for m in StockMovement.query.filter_by(product_id=product_id).order_by(StockMovement.id)
+        ]
+
+
+def levels(app, as_of, **filters):
+    with app.app_context():
+        return {(product_id, location_id): quantity for product_id, location_id, quantity in get_stock_levels(as_of, **filters)}
+
+
+class TestStockLedger:
+
+    def test_orm_writes_become_movements(self, test_app_instance, test_client_instance, authorized_headers, stock_setup):
+        product_id, (shop, _) = stock_setup['product_id'], stock_setup['locations']
+        with test_app_instance.app_context():
+            stock_id = Stock.query.filter_by(product_id=product_id, inventory_location_id=shop).one().id
+
+        test_client_instance.put(f'/api/inventory/stock/{stock_id}', headers=authorized_headers, json={"quantity": 4})
+        test_client_instance.delete(f'/api/inventory/stock/{stock_id}', headers=authorized_headers)
+
+        assert movements(test_app_instance, product_id)[-2:] == [(shop, -6, 'adjustment'), (shop, -4, 'removal')]
+
+    def test_bulk_transfer_recorded_per_operation(self, test_app_instance, test_client_instance, authorized_headers, stock_setup):
+        product_id, (shop, warehouse) = stock_setup['product_id'], stock_setup['locations']
+        operations = [{"type": "transfer", "product_id": product_id, "from_location_id": warehouse,
+                       "to_location_id": shop, "quantity": 3, "reference": "NF-123"}]
+        response = test_client_instance.post('/api/inventory/stock/bulk', headers=authorized_headers, json={"operations": operations})
+        assert response.status_code == 200
+
+        assert movements(test_app_instance, product_id)[-2:] == [(warehouse, -3, 'transfer_out'), (shop, 3, 'transfer_in')]
+
+    def test_sale_records_effective_decrement(self, test_app_instance, test_client_instance, stock_setup):
+        product_id = stock_setup['product_id']
+        test_client_instance.post('/api/inventory/pubsub/inventory-update',
+                                  json=pubsub_envelope({"product_id": product_id, "quantity_sold": 15}, message_id="sale-1"))
+        # Venda maior que o saldo: o estoque para em zero e o ledger registra só o que havia
+        test_client_instance.post('/api/inventory/pubsub/inventory-update',
+                                  json=pubsub_envelope({"product_id": product_id, "quantity_sold": 8}, message_id="sale-2"))
+
+        with test_app_instance.app_context():
+            sales = StockMovement.query.filter_by(product_id=product_id, reason='sale').order_by(StockMovement.id).all()
+            assert [(m.delta, m.reference) for m in sales] == [(-15, "sale-1"), (-5, "sale-2")]
+            assert inventory_db.session.get(Product, product_id).quantity == 0
+        assert (product_id, None) not in levels(test_app_instance, datetime.now())
+
+    def test_levels_as_of(self, test_app_instance, test_client_instance, authorized_headers, stock_setup):
+        product_id, (shop, warehouse) = stock_setup['product_id'], stock_setup['locations']
+        before_transfer = datetime.now()
+        operations = [{"type": "transfer", "product_id": product_id, "from_location_id": shop, "to_location_id": warehouse, "quantity": 7}]
+        test_client_instance.post('/api/inventory/stock/bulk', headers=authorized_headers, json={"operations": operations})
+
+        past = test_client_instance.get(f'/api/inventory/stock/levels?as_of={before_transfer.isoformat()}&product_id={product_id}',
+                                        headers=authorized_headers)
+        now = test_client_instance.get(f'/api/inventory/stock/levels?product_id={product_id}&inventory_location_id={shop}',
+                                       headers=authorized_headers)
+
+        assert past.status_code == 200
+        assert {(row['inventory_location_id'], row['quantity']) for row in past.json} == {(None, 20), (shop, 10), (warehouse, 10)}
+        assert now.json == [{"product_id": product_id, "inventory_location_id": shop, "quantity": 3}]
+
+    def test_levels_invalid_as_of(self, test_client_instance, authorized_headers):
+        response = test_client_instance.get('/api/inventory/stock/levels?as_of=yesterday', headers=authorized_headers)
+        assert response.status_code == 400
+
+    def test_snapshot_plus_tail_matches_materialized_stock(self, test_app_instance, test_client_instance, authorized_headers, stock_setup):
+        product_id, (shop, warehouse) = stock_setup['product_id'], stock_setup['locations']
+        with test_app_instance.app_context():
+            taken_at, written = take_stock_snapshot()
+            assert written == 3
+        operations = [{"type": "adjust", "product_id": product_id, "inventory_location_id": warehouse, "delta": -4}]
+        test_client_instance.post('/api/inventory/stock/bulk', headers=authorized_headers, json={"operations": operations})
+
+        assert levels(test_app_instance, taken_at) == {(product_id, None): 20, (product_id, shop): 10, (product_id, warehouse): 10}
+        with test_app_instance.app_context():
+            materialized = {(s.product_id, s.inventory_location_id): s.quantity for s in Stock.query}
+            materialized[(product_id, None)] = inventory_db.session.get(Product, product_id).quantity
+            # O snapshot seguinte parte do anterior e da cauda do ledger
+            take_stock_snapshot()
+            assert StockSnapshot.query.count() == 6
+        assert levels(test_app_instance, datetime.now()) == materialized
+
+    def test_movements_endpoint_paginated(self, test_app_instance, test_client_instance, authorized_headers, stock_setup):
+        product_id = stock_setup['product_id']
+        first = test_client_instance.get(f'/api/inventory/stock/movements?product_id={product_id}&limit=2', headers=authorized_headers)
+        assert [row['reason'] for row in first.json] == ['opening', 'adjustment']
+
+        second = test_client_instance.get(f"/api/inventory/stock/movements?product_id={product_id}&limit=2&cursor={first.headers['X-Next-Cursor']}",
+                                          headers=authorized_headers)
+        assert len(second.json) == 1
+        assert 'X-Next-Cursor' not in second.headers
+
+    def test_seed_opening_balances_for_existing_data(self, test_app_instance, test_client_instance, stock_setup):
+        with test_app_instance.app_context():
+            inventory_db.session.execute(inventory_db.delete(StockMovement))
+            inventory_db.session.commit()
+            seed_opening_balances(inventory_db)
+            seed_opening_balances(inventory_db) # Só roda com o ledger vazio
+            assert StockMovement.query.filter_by(reason='opening').count() == 3
+
+    def test_init_db_steps_take_advisory_lock_on_postgres(self):
+        from types import SimpleNamespace
+        from inventory.database import lock_init_db, INIT_DB_LOCK_KEY
+
+        class RecordingConnection:
+            def __init__(self, dialect_name):
+                self.dialect = SimpleNamespace(name=dialect_name)
+                self.statements = []
+
+            def execute(self, statement, parameters=None):
+                self.statements.append((str(statement), parameters))
+
+        postgres, sqlite = RecordingConnection('postgresql'), RecordingConnection('sqlite')
+        lock_init_db(inventory_db, postgres)
+        lock_init_db(inventory_db, sqlite)
+        assert postgres.statements == [("SELECT pg_advisory_xact_lock(:key)", {"key": INIT_DB_LOCK_KEY})]
+        assert sqlite.statements == []
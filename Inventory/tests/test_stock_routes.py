@@ -1,4 +1,6 @@
 import json
+from inventory import db as inventory_db
+from inventory.models import Product as ProductModel, Inventory as InventoryModel, Stock as StockModel
 
 # Payloads de exemplo para testes de Stock
 # Os IDs de produto e local de inventário virão das fixtures
@@ -157,4 +159,158 @@ class TestStockRoutes:
         """Testa a falha na exclusão de um item de estoque com ID inexistente."""
         response = test_client_instance.delete('/api/inventory/stock/99999', headers=authorized_headers)
         assert response.status_code == 404
-        assert "Stock item not found" in response.json['msg']
\ No newline at end of file
+        assert "Stock item not found" in response.json['msg']
+    # GET /api/inventory/stock/summary
+    def _seed_summary(self, test_app_instance):
+        """Dois produtos em dois locais: (p1, l1)=10, (p1, l2)=5, (p2, l1)=7."""
+        with test_app_instance.app_context():
+            products = [ProductModel(name=f"Produto {i}", buy_price=1.0, sell_price=2.0) for i in (1, 2)]
+            locations = [InventoryModel(name=f"Local {i}", address="Rua A") for i in (1, 2)]
+            inventory_db.session.add_all(products + locations)
+            inventory_db.session.flush()
+            (p1, p2), (l1, l2) = [p.id for p in products], [l.id for l in locations]
+            inventory_db.session.add_all([
+                StockModel(product_id=p1, inventory_location_id=l1, quantity=10),
+                StockModel(product_id=p1, inventory_location_id=l2, quantity=5),
+                StockModel(product_id=p2, inventory_location_id=l1, quantity=7),
+            ])
+            inventory_db.session.commit()
+            return p1, p2, l1, l2
+
+    def test_stock_summary_by_product(self, test_client_instance, authorized_headers, test_app_instance):
+        p1, p2, _, _ = self._seed_summary(test_app_instance)
+        response = test_client_instance.get('/api/inventory/stock/summary', headers=authorized_headers)
+        assert response.status_code == 200
+        assert response.json == [
+            {"product_id": p1, "total_quantity": 15, "locations": 2},
+            {"product_id": p2, "total_quantity": 7, "locations": 1},
+        ]
+
+    def test_stock_summary_by_location(self, test_client_instance, authorized_headers, test_app_instance):
+        _, _, l1, l2 = self._seed_summary(test_app_instance)
+        response = test_client_instance.get('/api/inventory/stock/summary?group_by=location', headers=authorized_headers)
+        assert response.json == [
+            {"inventory_location_id": l1, "total_quantity": 17, "products": 2},
+            {"inventory_location_id": l2, "total_quantity": 5, "products": 1},
+        ]
+
+    def test_stock_summary_breakdown_paginated(self, test_client_instance, authorized_headers, test_app_instance):
+        p1, p2, l1, l2 = self._seed_summary(test_app_instance)
+        url = '/api/inventory/stock/summary?group_by=product_location&limit=2'
+        first = test_client_instance.get(url, headers=authorized_headers)
+        assert [(row['product_id'], row['inventory_location_id']) for row in first.json] == [(p1, l1), (p1, l2)]
+
+        second = test_client_instance.get(f"{url}&cursor={first.headers['X-Next-Cursor']}", headers=authorized_headers)
+        assert second.json == [{"product_id": p2, "inventory_location_id": l1, "total_quantity": 7}]
+        assert 'X-Next-Cursor' not in second.headers
+
+    def test_stock_summary_filtered_by_product(self, test_client_instance, authorized_headers, test_app_instance):
+        p1, _, _, _ = self._seed_summary(test_app_instance)
+        response = test_client_instance.get(f'/api/inventory/stock/summary?group_by=location&product_id={p1}', headers=authorized_headers)
+        assert sorted(row['total_quantity'] for row in response.json) == [5, 10]
+
+    def test_stock_summary_invalid_group_by(self, test_client_instance, authorized_headers):
+        response = test_client_instance.get('/api/inventory/stock/summary?group_by=color', headers=authorized_headers)
+        assert response.status_code == 400
+
+    # POST /api/inventory/stock/bulk
+    def test_create_stock_item_duplicate_pair(self, test_client_instance, authorized_headers, created_stock_data):
+        payload = {
+            "product_id": created_stock_data['product_id'],
+            "inventory_location_id": created_stock_data['inventory_location_id'],
+            "quantity": 1
+        }
+        response = test_client_instance.post('/api/inventory/stock/', headers=authorized_headers, json=payload)
+        assert response.status_code == 409
+        assert response.json['id'] == created_stock_data['id']
+
+    def test_update_stock_item_to_existing_pair(self, test_client_instance, authorized_headers, test_app_instance):
+        p1, _, l1, l2 = self._seed_summary(test_app_instance)
+        with test_app_instance.app_context():
+            stock_id = inventory_db.session.scalar(
+                inventory_db.select(StockModel.id).where(StockModel.product_id == p1, StockModel.inventory_location_id == l2)
+            )
+        response = test_client_instance.put(f'/api/inventory/stock/{stock_id}', headers=authorized_headers,
+                                            json={"inventory_location_id": l1})
+        assert response.status_code == 409
+        assert "already exists" in response.json['msg']
+
+    def test_init_db_merges_duplicate_pairs(self, test_client_instance, test_app_instance):
+        from inventory.database import init_db
+        p1, _, l1, _ = self._seed_summary(test_app_instance)
+        with test_app_instance.app_context():
+            # Banco anterior ao índice único, com o par (p1, l1) repetido
+            with inventory_db.engine.begin() as conn:
+                conn.execute(inventory_db.text("DROP INDEX uq_stock_product_location"))
+                conn.execute(inventory_db.insert(StockModel.__table__).values(product_id=p1, inventory_location_id=l1, quantity=3))
+            init_db(inventory_db)
+
+            rows = inventory_db.session.execute(
+                inventory_db.select(StockModel.quantity).where(StockModel.product_id == p1, StockModel.inventory_location_id == l1)
+            ).all()
+            assert [row.quantity for row in rows] == [13]
+            indexes = {index['name'] for index in inventory_db.inspect(inventory_db.engine).get_indexes('stock')}
+            assert 'uq_stock_product_location' in indexes
+
+    def test_bulk_adjust_and_transfer(self, test_client_instance, authorized_headers, test_app_instance):
+        p1, p2, l1, l2 = self._seed_summary(test_app_instance)
+        operations = [
+            {"type": "transfer", "product_id": p1, "from_location_id": l1, "to_location_id": l2, "quantity": 4},
+            {"type": "adjust", "product_id": p2, "inventory_location_id": l1, "delta": -2},
+            {"type": "adjust", "product_id": p2, "inventory_location_id": l2, "delta": 3}, # Cria o registro
+        ]
+        response = test_client_instance.post('/api/inventory/stock/bulk', headers=authorized_headers, json={"operations": operations})
+        assert response.status_code == 200
+        results = response.json['results']
+        assert (results[0]['from_quantity'], results[0]['to_quantity']) == (6, 9)
+        assert results[1]['quantity'] == 5
+        assert results[2]['quantity'] == 3
+
+        summary = test_client_instance.get('/api/inventory/stock/summary?group_by=product_location', headers=authorized_headers).json
+        assert {(row['product_id'], row['inventory_location_id']): row['total_quantity'] for row in summary} == {
+            (p1, l1): 6, (p1, l2): 9, (p2, l1): 5, (p2, l2): 3
+        }
+
+    def test_bulk_is_atomic_with_per_row_errors(self, test_client_instance, authorized_headers, test_app_instance):
+        p1, _, l1, l2 = self._seed_summary(test_app_instance)
+        operations = [
+            {"type": "adjust", "product_id": p1, "inventory_location_id": l1, "delta": 1},
+            {"type": "transfer", "product_id": p1, "from_location_id": l2, "to_location_id": l1, "quantity": 50},
+            {"type": "adjust", "product_id": 99999, "inventory_location_id": l1, "delta": 1},
+            {"type": "move"},
+        ]
+        response = test_client_instance.post('/api/inventory/stock/bulk', headers=authorized_headers, json={"operations": operations})
+        assert response.status_code == 422
+        assert [row['status'] for row in response.json['results']] == ["not_applied", "error", "error", "error"]
+        assert "product_id" in response.json['results'][2]['errors']
+
+        summary = test_client_instance.get(f'/api/inventory/stock/summary?group_by=location&product_id={p1}', headers=authorized_headers).json
+        assert sorted(row['total_quantity'] for row in summary) == [5, 10]
+
+    def test_bulk_validates_ids_with_one_query_per_table(self, test_client_instance, authorized_headers, test_app_instance):
+        from sqlalchemy import event
+        p1, p2, l1, l2 = self._seed_summary(test_app_instance)
+        operations = [
+            {"type": "adjust", "product_id": product_id, "inventory_location_id": location_id, "delta": 1}
+            for product_id in (p1, p2) for location_id in (l1, l2)
+        ] * 25
+
+        statements = []
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        with test_app_instance.app_context():
+            engine = inventory_db.engine
+        event.listen(engine, 'before_cursor_execute', capture)
+        try:
+            response = test_client_instance.post('/api/inventory/stock/bulk', headers=authorized_headers, json={"operations": operations})
+        finally:
+            event.remove(engine, 'before_cursor_execute', capture)
+
+        assert response.status_code == 200
+        assert len([s for s in statements if s.lstrip().upper().startswith('INSERT INTO STOCK (')]) == 1
+        assert len([s for s in statements if 'FROM products' in s]) == 1
+        assert len([s for s in statements if 'FROM inventory' in s]) == 1
+
+    def test_bulk_requires_operations(self, test_client_instance, authorized_headers):
+        response = test_client_instance.post('/api/inventory/stock/bulk', headers=authorized_headers, json={"operations": []})
+        assert response.status_code == 400
@@ -0,0 +1,106 @@
+"""
+Benchmark de concorrência do POST /api/sales/: workers sync x gthread com a mesma CPU.
+
+    DATABASE_URL=postgresql://... python benchmark_concurrency.py [requisições] [clientes] [latência ms]
+
+Para cada modo sobe o gunicorn com gunicorn.conf.py (GUNICORN_WORKER_CLASS=sync ou gthread,
+workers e threads pelos padrões do arquivo para 1 CPU) e dispara as vendas com vários clientes
+em paralelo. Precisa de um PostgreSQL de verdade: as tabelas são criadas se não existirem.
+
+A latência opcional é somada a cada comando SQL no servidor, para simular a ida e volta até o
+Cloud SQL pelo cloud-sql-proxy (num banco local ela é quase zero).
+"""
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+PORT = 5099
+SALE = {
+    "client_id": 1,
+    "employee_id": 1,
+    "payment_method": "PIX",
+    "items": [{"product_id": product_id, "quantity": 2, "price": 9.9} for product_id in range(1, 6)],
+}
+
+
+def create_benchmark_app():
+    """App servida pelo gunicorn no benchmark: a normal, com a latência simulada no engine."""
+    from sqlalchemy import event
+    from sales import create_app, db
+    app = create_app()
+    latency = float(os.environ.get('BENCHMARK_DB_LATENCY_MS', 0)) / 1000
+    if latency:
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: time.sleep(latency))
+    return app
+
+
+def access_token():
+    from flask_jwt_extended import create_access_token
+    from sales import create_app, db
+    from sales.database import init_db
+    app = create_app()
+    with app.app_context():
+        init_db(db)
+        return create_access_token(identity='benchmark')
+
+
+def wait_until_up(timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{PORT}/healthz", timeout=1)
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn não respondeu")
+
+
+def post_sale(token):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{PORT}/api/sales/", data=json.dumps(SALE).encode(), method='POST',
+        headers={'Content-Type': 'application/json', 'Authorization': f"Bearer {token}"},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return response.status
+
+
+def run(mode, token, requests, clients, latency_ms):
+    env = dict(os.environ, GUNICORN_WORKER_CLASS=mode, PORT=str(PORT), BENCHMARK_DB_LATENCY_MS=str(latency_ms))
+    for name in ('GUNICORN_WORKERS', 'GUNICORN_THREADS', 'DB_POOL_SIZE'):
+        env.pop(name, None)
+    server = subprocess.Popen(
+        ['gunicorn', '-c', 'gunicorn.conf.py', 'benchmark_concurrency:create_benchmark_app()'],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        preexec_fn=lambda: os.sched_setaffinity(0, {min(os.sched_getaffinity(0))}), # Mesma CPU nos dois modos
+    )
+    try:
+        wait_until_up()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            list(executor.map(lambda _: post_sale(token), range(clients))) # Aquecimento
+            started = time.perf_counter()
+            statuses = list(executor.map(lambda _: post_sale(token), range(requests)))
+            elapsed = time.perf_counter() - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+    failures = sum(status != 201 for status in statuses)
+    print(f"{mode:>7}: {requests / elapsed:7.1f} vendas/s ({requests} em {elapsed:.2f}s, {failures} falhas)")
+
+
+def main(requests=500, clients=16, latency_ms=2.0):
+    if not os.environ.get('DATABASE_URL', '').startswith('postgresql'):
+        sys.exit("Defina DATABASE_URL com um PostgreSQL")
+    token = access_token()
+    print(f"{clients} clientes simultâneos, latência simulada de {latency_ms} ms por comando SQL")
+    for mode in ('sync', 'gthread'):
+        run(mode, token, requests, clients, latency_ms)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]), *(float(arg) for arg in sys.argv[3:4]))
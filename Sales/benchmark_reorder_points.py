@@ -0,0 +1,53 @@
+"""
+Benchmark do cálculo de ponto de pedido: 100 mil produtos x 365 dias em um núcleo.
+
+    python benchmark_reorder_points.py [produtos] [dias]
+
+Parte das linhas (produto, deslocamento do dia, unidades) como o GROUP BY de load_daily_demand as
+devolve, com 10% dos pares produto/dia com venda: as triplas são gravadas em um SQLite em memória
+(fora da medição) e lidas de volta pelo SQLAlchemy, para que a conversão medida receba objetos Row
+de verdade. Mede a leitura, a conversão das linhas em matriz (demand_from_rows, o mesmo caminho
+de load_daily_demand) e o cálculo vetorizado para a matriz inteira.
+"""
+import sys
+import time
+import numpy as np
+import sqlalchemy as sa
+from sales.reorder import demand_from_rows, compute_reorder_points
+
+SALES_DENSITY = 0.10
+
+
+def main(n_products=100_000, n_days=365):
+    rng = np.random.default_rng(42)
+    n_pairs = int(n_products * n_days * SALES_DENSITY)
+    pairs = rng.choice(n_products * n_days, size=n_pairs, replace=False)
+    product_ids, day_offsets = np.divmod(pairs, n_days)
+    quantities = rng.poisson(3.0, size=n_pairs) + 1
+
+    engine = sa.create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.exec_driver_sql("CREATE TABLE demand (product_id INTEGER, day INTEGER, quantity INTEGER)")
+        conn.connection.executemany(
+            "INSERT INTO demand VALUES (?, ?, ?)",
+            zip((product_ids + 1).tolist(), day_offsets.tolist(), quantities.tolist())
+        )
+
+    with engine.connect() as conn:
+        started = time.perf_counter()
+        rows = conn.exec_driver_sql("SELECT product_id, day, quantity FROM demand").all()
+        fetched = time.perf_counter()
+        unique_ids, demand = demand_from_rows(rows, n_days)
+        built = time.perf_counter()
+        minimums = compute_reorder_points(demand)
+        finished = time.perf_counter()
+
+    print(f"{unique_ids.size} produtos x {n_days} dias ({n_pairs} pares com venda, matriz de {demand.nbytes / 2**20:.0f} MiB)")
+    print(f"  leitura das linhas (SQLite): {fetched - started:.3f}s")
+    print(f"  linhas -> matriz:            {built - fetched:.3f}s")
+    print(f"  ponto de pedido:             {finished - built:.3f}s")
+    print(f"  conversão + cálculo:         {finished - fetched:.3f}s (mínimo sugerido médio {minimums.mean():.1f})")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,97 @@
+"""
+Configuração do gunicorn, igual em todos os serviços (gunicorn -c gunicorn.conf.py app:app).
+
+Arquivo compartilhado: a versão canônica fica em shared/ e as cópias dos serviços são geradas por
+python shared/sync.py (não edite as cópias).
+
+A app é importada uma única vez no master (preload_app) e os workers nascem por fork, dividindo
+por copy-on-write a memória do Flask, do SQLAlchemy, dos models e das bibliotecas. O que não pode
+ser compartilhado entre processos é refeito em post_fork: o pool de conexões do SQLAlchemy e os
+clients do Google Cloud (recriados sob demanda, ver <pacote>/clients.py).
+
+O número de workers e de threads sai do limite de CPU do container (cgroup), não dos núcleos do nó.
+GUNICORN_WORKER_CLASS=gthread troca os workers sync por poucos processos com várias threads cada,
+para serviços que passam a maior parte da requisição esperando I/O (banco pelo cloud-sql-proxy).
+
+Endpoints de streaming (/export e a importação de produtos) exigem gthread: um worker sync só avisa
+o master entre requisições, então qualquer resposta que leve mais que GUNICORN_TIMEOUT é morta no
+meio do envio. No gthread o aviso sai do loop principal do processo enquanto as threads atendem,
+e o timeout passa a valer só para um worker travado, não para uma requisição longa.
+Variáveis de ambiente: GUNICORN_WORKER_CLASS, GUNICORN_WORKERS, GUNICORN_THREADS, GUNICORN_TIMEOUT, PORT.
+"""
+import math
+import os
+
+
+def cpu_limit():
+    """CPUs disponíveis para o container: quota do cgroup (v2 ou v1) ou, sem limite, os núcleos da máquina."""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        if quota != 'max':
+            return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        if quota > 0:
+            return quota / period
+    except (OSError, ValueError):
+        pass
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+
+THREADS_PER_CPU = 4
+
+
+def default_workers(cpus, worker_class):
+    if worker_class == 'gthread':
+        # A concorrência vem das threads; um processo a mais só para não depender de um único
+        return math.ceil(cpus) + 1
+    # 2 * CPU + 1, arredondando a CPU para cima; com 400m isso dá 3 processos em vez de 4
+    return 2 * math.ceil(cpus) + 1
+
+
+def default_threads(cpus, worker_class):
+    return THREADS_PER_CPU * math.ceil(cpus) if worker_class == 'gthread' else 1
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+preload_app = True
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+_cpus = cpu_limit()
+workers = int(os.environ.get('GUNICORN_WORKERS') or default_workers(_cpus, worker_class))
+threads = int(os.environ.get('GUNICORN_THREADS') or default_threads(_cpus, worker_class))
+# A app é carregada depois deste arquivo: o pool do SQLAlchemy usa o número de threads por worker
+os.environ['GUNICORN_THREADS'] = str(threads)
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+# Reinicia os workers aos poucos, para conter crescimento de memória sem derrubar todos juntos
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+
+def _flask_app(server):
+    return server.app.wsgi()
+
+
+def when_ready(server):
+    # As conexões abertas pelo master durante o create_app (init_db) não devem ir para os workers
+    app = _flask_app(server)
+    with app.app_context():
+        for engine in app.extensions['sqlalchemy'].engines.values():
+            engine.dispose()
+
+
+def post_fork(server, worker):
+    app = _flask_app(server)
+    with app.app_context():
+        # close=False: não fecha as conexões do pai, só as esquece e abre um pool novo neste worker
+        for engine in app.extensions['sqlalchemy'].engines.values():
+            engine.dispose(close=False)
+    app.extensions['db_pool_metrics'].reset()
+    clients = app.extensions.get('clients')
+    if clients is not None:
+        clients.reset()
@@ -0,0 +1,10 @@
+from sales import create_app
+from sales.clients import clients
+from sales.outbox import run_relay
+
+app = create_app()
+
+if __name__ == "__main__":
+    with app.app_context():
+        publisher = clients.get('publisher')
+    run_relay(app, publisher)
@@ -0,0 +1,41 @@
+import requests
+from flask_jwt_extended import create_access_token
+from sales import create_app, db
+from sales.reorder import load_daily_demand, compute_reorder_points
+
+app = create_app()
+
+
+def push_minimum_stock(http, url, token, product_ids, minimums, batch_size):
+    """Envia os mínimos sugeridos ao Inventory em lotes. Retorna (atualizados, não encontrados)."""
+    updated, missing = 0, []
+    for start in range(0, len(product_ids), batch_size):
+        items = [
+            {"product_id": int(product_id), "minimum_stock": int(minimum)}
+            for product_id, minimum in zip(product_ids[start:start + batch_size], minimums[start:start + batch_size])
+        ]
+        response = http.put(url, json={"items": items}, headers={"Authorization": f"Bearer {token}"}, timeout=60)
+        response.raise_for_status()
+        body = response.json()
+        updated += body["updated"]
+        missing.extend(body["missing_product_ids"])
+    return updated, missing
+
+
+if __name__ == "__main__":
+    with app.app_context():
+        product_ids, demand = load_daily_demand(app.config['REORDER_HISTORY_DAYS'])
+        db.session.close()
+        minimums = compute_reorder_points(
+            demand,
+            lead_time_days=app.config['REORDER_LEAD_TIME_DAYS'],
+            service_level_z=app.config['REORDER_SERVICE_LEVEL_Z'],
+            window_days=app.config['REORDER_DEMAND_WINDOW_DAYS'],
+        )
+        print(f"Computed reorder points for {len(product_ids)} products.")
+
+        token = create_access_token(identity="reorder-points-job")
+        url = f"{app.config['INVENTORY_SERVICE_URL']}/api/inventory/products/minimum-stock"
+        with requests.Session() as http:
+            updated, missing = push_minimum_stock(http, url, token, product_ids, minimums, app.config['REORDER_BATCH_SIZE'])
+        print(f"Updated minimum_stock of {updated} products ({len(missing)} not found in Inventory).")
@@ -3,6 +3,7 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from config import Config
+from db_pool import engine_options, PoolMetrics
 from sales.database import reset_db, init_db
 
 db = SQLAlchemy()
@@ -17,9 +18,15 @@ def create_app(config_overrides=None):
     if config_overrides:
         app.config.update(config_overrides)
 
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+
     with app.app_context():
         # Initialize extensions
         db.init_app(app)
+        app.extensions['db_pool_metrics'] = PoolMetrics(db.engine)
+        # Model usado pelo módulo compartilhado da outbox (sales/outbox.py)
+        from sales.models import OutboxMessage
+        app.extensions['outbox_model'] = OutboxMessage
         jwt.init_app(app)
        
         # Config do CORS
@@ -41,6 +48,17 @@ def create_app(config_overrides=None):
                 reset_db(db)
             except Exception as e:
                 print(f"Error creating database tables (during test setup): {e}")
+        else:
+            print("Attempting to create database tables if they don't exist...")
+            try:
+                init_db(db=db)
+                print("Database tables created successfully or already exist.")
+            except Exception as e:
+                print(f"ERROR: Failed to create database tables: {e}")
+
+    # Clients do Google Cloud do processo, descartados pelo gunicorn após o fork (gunicorn.conf.py)
+    from sales.clients import clients
+    app.extensions['clients'] = clients
 
     # Importar e registrar Blueprints
     from sales.routes.orders_routes import sale_orders_bp
@@ -1,5 +1,14 @@
+from db_pool import ddl_connection
+
+def create_missing_indexes(db):
+    # create_all não cria índices novos em tabelas que já existem
+    with ddl_connection(db.engine) as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+
 def reset_db(db):
-    from sales.models import SaleOrder, SaleItem
+    from sales.models import SaleOrder, SaleItem, OutboxMessage
     
     print("Resetando o banco de dados...")
     db.drop_all()
@@ -7,6 +16,9 @@ def reset_db(db):
     print("Banco de dados resetado com sucesso.")
 
 def init_db(db):
+    from sales.models import SaleOrder, SaleItem, OutboxMessage
     print("Criando tabelas no banco de dados...")
-    db.create_all()
-    print("Tabelas criadas com sucesso.")
\ No newline at end of file
+    with ddl_connection(db.engine) as conn:
+        db.metadata.create_all(bind=conn)
+    create_missing_indexes(db)
+    print("Tabelas criadas com sucesso.")
@@ -1,3 +1,4 @@
+from datetime import datetime
 from sales import db
 
 class SaleOrder(db.Model):
@@ -10,6 +11,13 @@ class SaleOrder(db.Model):
     payment_method = db.Column(db.String(50), nullable=False)
     status = db.Column(db.String(20), nullable=False)
 
+    items = db.relationship('SaleItem', order_by='SaleItem.id', lazy='select')
+
+    # Índice composto usado pela paginação por cursor (date, id) em get_sales
+    __table_args__ = (
+        db.Index('ix_saleorder_date_id', 'date', 'id'),
+    )
+
     def __repr__(self):
         return f'<Sale Order>\n<ID {self.id}>\n<Client ID {self.client_id}>\n<Employee ID {self.employee_id}>\n<Date {self.date}>\n<Payment Method {self.payment_method}>\n<Status {self.status}>'
     
@@ -27,7 +35,7 @@ class SaleItem(db.Model):
     __tablename__ = 'saleitem'
 
     id = db.Column(db.Integer, primary_key=True, index=True)
-    sale_order_id = db.Column(db.Integer, db.ForeignKey('saleorder.id'), nullable=False)
+    sale_order_id = db.Column(db.Integer, db.ForeignKey('saleorder.id'), nullable=False, index=True)
     product_id = db.Column(db.Integer, nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     price = db.Column(db.Float, nullable=False)
@@ -44,4 +52,36 @@ class SaleItem(db.Model):
             'quantity': self.quantity,
             'price': self.price,
             'discount': self.discount
-        }
\ No newline at end of file
+        }
+
+class OutboxMessage(db.Model):
+    __tablename__ = 'outbox'
+
+    id = db.Column(db.Integer, primary_key=True, index=True)
+    topic = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    published_at = db.Column(db.DateTime, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    last_error = db.Column(db.Text, nullable=True)
+
+    # O relay só lê mensagens pendentes, em ordem de chegada
+    __table_args__ = (
+        db.Index('ix_outbox_pending', 'published_at', 'next_attempt_at', 'id'),
+    )
+
+    def __repr__(self):
+        return f'<Outbox Message>\n<ID {self.id}>\n<Topic {self.topic}>\n<Attempts {self.attempts}>\n<Published At {self.published_at}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'topic': self.topic,
+            'payload': self.payload,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'published_at': self.published_at.isoformat() if self.published_at else None,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error
+        }
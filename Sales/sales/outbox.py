@@ -0,0 +1,140 @@
+"""
+Outbox transacional: as mensagens para o Pub/Sub são gravadas na tabela outbox no mesmo commit
+da escrita que as originou e publicadas depois pelo relay (outbox_relay.py).
+
+Arquivo compartilhado: a versão canônica fica em shared/ e as cópias dos serviços são geradas por
+python shared/sync.py (não edite as cópias). Por isso não importa nada do pacote: usa a extensão
+do SQLAlchemy e o model registrado em app.extensions['outbox_model'] pela app atual. Os nomes dos
+tópicos de cada serviço ficam em <pacote>/topics.py.
+"""
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from flask import current_app
+
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 300
+PUBLISH_TIMEOUT_SECONDS = 30
+
+
+def _db():
+    return current_app.extensions['sqlalchemy']
+
+
+def _model():
+    return current_app.extensions['outbox_model']
+
+
+def enqueue_message(topic_name, payload):
+    """
+    Registra uma mensagem na outbox usando a sessão atual.
+    Ela é gravada no mesmo commit da escrita que a originou e publicada depois pelo relay.
+    """
+    message = _model()(topic=topic_name, payload=json.dumps(payload))
+    _db().session.add(message)
+    return message
+
+
+def _backoff(attempts):
+    return timedelta(seconds=min(BACKOFF_BASE_SECONDS * (2 ** (attempts - 1)), BACKOFF_MAX_SECONDS))
+
+
+def relay_batch(publisher, project_id, batch_size=100, publish_timeout=PUBLISH_TIMEOUT_SECONDS):
+    """
+    Publica um lote de mensagens pendentes da outbox.
+
+    Todas as mensagens do lote são enviadas ao publisher antes de esperar qualquer
+    resultado, para que o client agrupe as publicações. Mensagens com falha ficam
+    pendentes e só são tentadas de novo após um backoff exponencial. O lote inteiro
+    espera no máximo publish_timeout segundos: uma publicação travada vira falha e
+    não segura as linhas travadas pelo FOR UPDATE indefinidamente.
+    Retorna a quantidade de mensagens publicadas com sucesso.
+    """
+    db, OutboxMessage = _db(), _model()
+    now = datetime.now()
+    query = (
+        db.select(OutboxMessage)
+        .where(OutboxMessage.published_at.is_(None), OutboxMessage.next_attempt_at <= now)
+        .order_by(OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True) # Permite mais de um relay rodando em paralelo
+    )
+    messages = db.session.execute(query).scalars().all()
+    if not messages:
+        db.session.commit()
+        return 0
+
+    futures = [
+        (message, publisher.publish(publisher.topic_path(project_id, message.topic), message.payload.encode('utf-8')))
+        for message in messages
+    ]
+
+    deadline = time.monotonic() + publish_timeout
+    published = 0
+    for message, future in futures:
+        try:
+            future.result(timeout=max(deadline - time.monotonic(), 0))
+            message.published_at = datetime.now()
+            message.last_error = None
+            published += 1
+        except Exception as e:
+            message.attempts += 1
+            message.next_attempt_at = datetime.now() + _backoff(message.attempts)
+            message.last_error = str(e)
+            current_app.logger.warning(f"Falha ao publicar mensagem {message.id} da outbox (tentativa {message.attempts}): {e}")
+
+    db.session.commit()
+    return published
+
+
+def purge_published_messages(retention_hours):
+    """Remove da outbox as mensagens publicadas há mais de retention_hours. Retorna quantas foram removidas."""
+    db, OutboxMessage = _db(), _model()
+    cutoff = datetime.now() - timedelta(hours=retention_hours)
+    result = db.session.execute(
+        db.delete(OutboxMessage).where(OutboxMessage.published_at < cutoff)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def run_relay(app, publisher, project_id=None, batch_size=None, poll_interval=None):
+    """
+    Loop do relay: drena a outbox em lotes e dorme quando não há mensagens pendentes.
+    A cada OUTBOX_PURGE_INTERVAL segundos também remove as mensagens já publicadas.
+    """
+    project_id = project_id or os.environ.get('GCP_PROJECT_ID')
+    batch_size = batch_size or app.config.get('OUTBOX_BATCH_SIZE', 100)
+    poll_interval = poll_interval or app.config.get('OUTBOX_POLL_INTERVAL', 1.0)
+    publish_timeout = app.config.get('OUTBOX_PUBLISH_TIMEOUT', PUBLISH_TIMEOUT_SECONDS)
+    retention_hours = app.config.get('OUTBOX_RETENTION_HOURS', 168)
+    purge_interval = app.config.get('OUTBOX_PURGE_INTERVAL', 3600)
+    next_purge_at = time.monotonic()
+
+    with app.app_context():
+        db = _db()
+        while True:
+            if time.monotonic() >= next_purge_at:
+                try:
+                    removed = purge_published_messages(retention_hours)
+                    if removed:
+                        app.logger.info(f"Removed {removed} outbox messages published more than {retention_hours} hours ago.")
+                except Exception as e:
+                    db.session.rollback()
+                    app.logger.error(f"Error purging outbox: {e}")
+                finally:
+                    db.session.close()
+                next_purge_at = time.monotonic() + purge_interval
+
+            try:
+                published = relay_batch(publisher, project_id, batch_size, publish_timeout)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Error draining outbox: {e}")
+                published = 0
+            finally:
+                db.session.close()
+
+            if published < batch_size:
+                time.sleep(poll_interval)
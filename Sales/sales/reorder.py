@@ -0,0 +1,72 @@
+import itertools
+from datetime import datetime, timedelta
+import numpy as np
+from sales import db
+from sales.models import SaleOrder, SaleItem
+
+# Vendas canceladas não contam como demanda
+CANCELLED_STATUS = 'CANCELLED'
+
+
+def _day_offset(column, start):
+    """Dias inteiros entre start e a data de column, calculados pelo banco."""
+    if db.session.get_bind().dialect.name == 'sqlite':
+        return db.cast(db.func.julianday(db.func.date(column)) - db.func.julianday(start.date().isoformat()), db.Integer)
+    return db.cast(column, db.Date) - db.cast(db.literal(start.date()), db.Date) # date - date é integer no PostgreSQL
+
+
+def load_daily_demand(history_days, end=None):
+    """
+    Lê do banco as unidades vendidas por produto e por dia nos últimos history_days dias
+    (um GROUP BY produto, dia) e monta a matriz de demanda.
+    Retorna (product_ids, demand): demand é float32 [produtos x dias], última coluna = ontem.
+    """
+    end = (end or datetime.now()).replace(hour=0, minute=0, second=0, microsecond=0)
+    start = end - timedelta(days=history_days)
+    day = _day_offset(SaleOrder.date, start)
+    rows = db.session.execute(
+        db.select(SaleItem.product_id, day, db.func.sum(SaleItem.quantity))
+        .join(SaleOrder, SaleOrder.id == SaleItem.sale_order_id)
+        .where(SaleOrder.date >= start, SaleOrder.date < end, db.func.upper(SaleOrder.status) != CANCELLED_STATUS)
+        .group_by(SaleItem.product_id, day)
+    ).all()
+    return demand_from_rows(rows, history_days)
+
+
+def demand_from_rows(rows, history_days):
+    """
+    Monta a matriz a partir das linhas (produto, deslocamento do dia, unidades) do GROUP BY.
+    Todas as colunas são inteiras: um único np.fromiter percorre as linhas em C, sem conversão
+    por valor em Python, e as colunas saem de um reshape.
+    """
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.zeros((0, history_days), dtype=np.float32)
+    table = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64, count=len(rows) * 3).reshape(-1, 3)
+    return build_demand_matrix(table[:, 0], table[:, 1], table[:, 2].astype(np.float32), history_days)
+
+
+def build_demand_matrix(product_ids, day_offsets, quantities, history_days):
+    """
+    Converte triplas (produto, dia, unidades) na matriz densa [produtos x dias], sem loop em Python.
+    Os pares (produto, dia) são únicos (vêm de um GROUP BY), então basta uma atribuição indexada.
+    """
+    unique_ids, rows = np.unique(product_ids, return_inverse=True)
+    demand = np.zeros((unique_ids.size, history_days), dtype=np.float32)
+    demand[rows, day_offsets] = quantities
+    return unique_ids, demand
+
+
+def compute_reorder_points(demand, lead_time_days=7, service_level_z=1.65, window_days=28):
+    """
+    Ponto de pedido de todos os produtos de uma vez:
+        média móvel da demanda diária nos últimos window_days * lead time
+        + estoque de segurança (z * desvio padrão diário no histórico * raiz do lead time)
+    demand é a matriz [produtos x dias]; retorna um vetor int64 com o mínimo sugerido de cada produto.
+    """
+    if demand.shape[0] == 0:
+        return np.zeros(0, dtype=np.int64)
+    window_days = min(window_days, demand.shape[1])
+    moving_average = demand[:, -window_days:].mean(axis=1, dtype=np.float64)
+    daily_std = demand.std(axis=1, dtype=np.float64)
+    safety_stock = service_level_z * daily_std * np.sqrt(lead_time_days)
+    return np.ceil(moving_average * lead_time_days + safety_stock).astype(np.int64)
@@ -1,4 +1,4 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, current_app
 
 health_bp = Blueprint('health', __name__)
 
@@ -6,6 +6,10 @@ health_bp = Blueprint('health', __name__)
 def health_check():
     return jsonify({"status": "ok"}), 200
 
+@health_bp.route('/metrics/db', methods=['GET'])
+def db_pool_metrics():
+    return jsonify(current_app.extensions['db_pool_metrics'].stats()), 200
+
 @health_bp.route('/', methods=['GET'])
 def root_check():
     return jsonify({"message": "Sales Service Root"}), 200
\ No newline at end of file
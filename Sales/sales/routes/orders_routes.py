@@ -1,43 +1,163 @@
+import base64
 import json
 from flask import Blueprint, request, jsonify, Response, url_for, current_app
 import uuid
 from datetime import datetime
+from itertools import groupby
+from sqlalchemy import insert
+from sqlalchemy.orm import selectinload
+from werkzeug.http import parse_date
 from sales.models import SaleOrder, SaleItem
 from sales import db
+from sales.outbox import enqueue_message
+from sales.topics import INVENTORY_TOPIC_NAME, INVOICE_TOPIC_NAME, INVENTORY_UPDATE_SCHEMA_VERSION
+from sales.export import export_format, stream_query, export_response
 from flask_jwt_extended import jwt_required
-from google.cloud import pubsub_v1
-import os
 
 sale_orders_bp = Blueprint('saleorders', __name__)
 
-publisher = pubsub_v1.PublisherClient()
-PROJECT_ID = os.environ.get('GCP_PROJECT_ID')
-TOPIC_NAME = 'inventory-updates'
-TOPIC_PATH = publisher.topic_path(PROJECT_ID, TOPIC_NAME)
 
-INVOICE_TOPIC_NAME = 'sale-invoice-events'
-INVOICE_TOPIC_PATH = publisher.topic_path(PROJECT_ID, INVOICE_TOPIC_NAME)
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _encode_cursor(order):
+    """Gera o cursor opaco (date, id) da última venda de uma página."""
+    raw = json.dumps([order.date.isoformat(), order.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def _decode_cursor(cursor):
+    date_iso, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    return datetime.fromisoformat(date_iso), int(order_id)
+
+
+def _parse_sale_date(value):
+    """
+    Aceita ISO 8601 ou o formato HTTP usado pelo jsonify do Flask. Datas com fuso são
+    convertidas para o horário local antes de descartar o fuso (a coluna não guarda fuso).
+    Retorna None se a data for inválida.
+    """
+    if not isinstance(value, str):
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        parsed = parse_date(value)
+    if parsed is not None and parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return parsed
+
+
+def _order_total(order):
+    return sum(item.price * item.quantity for item in order.items)
+
+
+def _serialize_order(order, total):
+    order_dict = order.to_dict()
+    order_dict['items'] = [item.to_dict() for item in order.items]
+    order_dict['client_name'] = "Cliente Desconhecido"  # Placeholder
+    order_dict['employee_name'] = "Funcionário Desconhecido"  # Placeholder
+    order_dict['total'] = total or 0
+    return order_dict
 
 
 @sale_orders_bp.route('/', methods=["GET"])
 @jwt_required()
 def get_sales():
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
+    if limit is None or limit < 1:
+        return jsonify({"msg": "Limit must be a positive integer"}), 400
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    cursor = request.args.get('cursor')
+    after = None
+    if cursor:
+        try:
+            after = _decode_cursor(cursor)
+        except Exception:
+            return jsonify({"msg": "Invalid cursor"}), 400
+
     try:
-        orders = SaleOrder.query.all()
-        orders_data = []
-        for order in orders:
-            order_dict = order.to_dict()
-            # Carregar itens para cada venda
-            items = SaleItem.query.filter_by(sale_order_id=order.id).all()
-            order_dict['items'] = [item.to_dict() for item in items]
-            order_dict['client_name'] = "Cliente Desconhecido"  # Placeholder
-            order_dict['employee_name'] = "Funcionário Desconhecido"  # Placeholder
-            order_dict['total'] = sum(item.price * item.quantity for item in items)
-            orders_data.append(order_dict)
-        return jsonify(orders_data), 200
+        # O total de cada venda vem dos itens já carregados pelo selectinload (IN restrito à página)
+        query = (
+            db.select(SaleOrder)
+            .options(selectinload(SaleOrder.items))
+            .order_by(SaleOrder.date.desc(), SaleOrder.id.desc())
+            .limit(limit + 1)
+        )
+        if after:
+            query = query.where(db.tuple_(SaleOrder.date, SaleOrder.id) < after)
+
+        orders = db.session.scalars(query).all()
+        page = orders[:limit]
+        orders_data = [_serialize_order(order, _order_total(order)) for order in page]
+
+        headers = {}
+        if len(orders) > limit:
+            headers['X-Next-Cursor'] = _encode_cursor(page[-1])
+        return jsonify(orders_data), 200, headers
     except Exception as e:
         return jsonify({"error": "An internal server error occurred", "details_dev": str(e)}), 500
 
+ORDER_EXPORT_COLUMNS = ['id', 'client_id', 'employee_id', 'date', 'payment_method', 'status']
+ITEM_EXPORT_COLUMNS = ['item_id', 'product_id', 'quantity', 'price', 'discount']
+
+
+def _order_export_records(rows, fmt):
+    """
+    NDJSON: uma venda por linha, com items e total (as linhas chegam ordenadas por venda).
+    CSV: uma linha por item, repetindo as colunas da venda.
+    """
+    for order_id, order_rows in groupby(rows, key=lambda row: row.id):
+        order_rows = [row._asdict() for row in order_rows]
+        order = {column: order_rows[0][column] for column in ORDER_EXPORT_COLUMNS}
+        order['date'] = order['date'].isoformat() if order['date'] else None
+        items = [{column: row[column] for column in ITEM_EXPORT_COLUMNS} for row in order_rows if row['item_id'] is not None]
+        if fmt == 'csv':
+            for item in items or [{}]:
+                yield {**order, **item}
+        else:
+            order['items'] = [
+                {'id': item['item_id'], 'sale_order_id': order_id, **{column: item[column] for column in ITEM_EXPORT_COLUMNS[1:]}}
+                for item in items
+            ]
+            order['total'] = sum(item['price'] * item['quantity'] for item in items)
+            yield order
+
+
+@sale_orders_bp.route('/export', methods=["GET"])
+@jwt_required()
+def export_sales():
+    """
+    Exporta as vendas em ordem de id, em NDJSON ou CSV (?format=) e em streaming.
+    Filtros opcionais: status e intervalo de datas (from/to, ISO 8601).
+    """
+    fmt = export_format()
+    if fmt is None:
+        return jsonify({"msg": "Invalid format"}), 400
+    date_from = _parse_sale_date(request.args['from']) if request.args.get('from') else None
+    date_to = _parse_sale_date(request.args['to']) if request.args.get('to') else None
+    if (request.args.get('from') and date_from is None) or (request.args.get('to') and date_to is None):
+        return jsonify({"msg": "from/to must be ISO 8601 dates"}), 400
+
+    query = (
+        db.select(*[getattr(SaleOrder, column) for column in ORDER_EXPORT_COLUMNS],
+                  SaleItem.id.label('item_id'), SaleItem.product_id, SaleItem.quantity, SaleItem.price, SaleItem.discount)
+        .outerjoin(SaleItem, SaleItem.sale_order_id == SaleOrder.id)
+        .order_by(SaleOrder.id, SaleItem.id)
+    )
+    if request.args.get('status'):
+        query = query.where(SaleOrder.status == request.args['status'])
+    if date_from:
+        query = query.where(SaleOrder.date >= date_from)
+    if date_to:
+        query = query.where(SaleOrder.date < date_to)
+
+    records = _order_export_records(stream_query(query), fmt)
+    return export_response(records, fmt, ORDER_EXPORT_COLUMNS + ITEM_EXPORT_COLUMNS, 'sales')
+
+
 @sale_orders_bp.route('/', methods=["POST"])
 @jwt_required()
 def create_sale():
@@ -80,60 +200,67 @@ def create_sale():
             "discount": item_data.get('discount', 0.0)
         })
 
+    sale_date = data.get('date')
+    if sale_date is None:
+        sale_date = datetime.now()
+    else:
+        sale_date = _parse_sale_date(sale_date)
+        if sale_date is None:
+            return jsonify({"msg": "Invalid sale date"}), 422
+
     new_sale = SaleOrder(
         client_id=client_id,
         employee_id=employee_id,
-        date=data.get('date', datetime.now()),
+        date=sale_date,
         payment_method=data.get('payment_method'),
         status=data.get('status', 'PENDING')
     )
     try:
         db.session.add(new_sale)
-        db.session.commit() # Commit the sale order to get its ID
-        db.session.refresh(new_sale)
+        db.session.flush() # INSERT da venda, obtém o ID sem encerrar a transação
+        sale_id = new_sale.id
+
+        # Um único INSERT multi-linha ... RETURNING para todos os itens
+        sale_items = db.session.scalars(
+            insert(SaleItem).returning(SaleItem),
+            [{**item_data_dict, "sale_order_id": sale_id} for item_data_dict in sale_items_to_create]
+        ).all()
+        sale_items.sort(key=lambda item: item.id) # Mesma ordem de get_sale_by_id
 
         total_sale_value = 0.0
         invoice_items = []
+        quantities_sold = {}
+        for sale_item in sale_items:
+            quantities_sold[sale_item.product_id] = quantities_sold.get(sale_item.product_id, 0) + sale_item.quantity
 
-        for item_data_dict in sale_items_to_create:
-            sale_item = SaleItem(
-                sale_order_id=new_sale.id, 
-                product_id=item_data_dict['product_id'],
-                quantity=item_data_dict['quantity'],
-                price=item_data_dict['price'],
-                discount=item_data_dict['discount']
-            )
-            db.session.add(sale_item)
-            # --- Publicar mensagem no Pub/Sub para atualização de inventário ---
-            message_data = {
-                "product_id": item_data_dict['product_id'],
-                "quantity_sold": item_data_dict['quantity']
-            }
-            future = publisher.publish(TOPIC_PATH, json.dumps(message_data).encode('utf-8'))
-            # A operação é assíncrona, não esperamos pelo resultado aqui.
-            current_app.logger.info(f"Published message for product {item_data_dict['product_id']}. Message ID: {future.result()}")
-            
             # Calculo para Nota Fiscal
-            item_total = (item_data_dict['quantity'] * item_data_dict['price']) - item_data_dict['discount']
+            item_total = (sale_item.quantity * sale_item.price) - sale_item.discount
             total_sale_value += item_total
             invoice_items.append({
-                "product_id": item_data_dict['product_id'],
-                "quantity": item_data_dict['quantity'],
-                "unit_price": item_data_dict['price'],
-                "discount": item_data_dict['discount'],
+                "product_id": sale_item.product_id,
+                "quantity": sale_item.quantity,
+                "unit_price": sale_item.price,
+                "discount": sale_item.discount,
                 "total_item_price": item_total
             })
 
-        db.session.commit() # Commit all sale items to the database
-        
-        # Prepare the response with the created sale and its items
+        # --- Uma única mensagem de atualização de inventário por venda, publicada depois pelo relay da outbox ---
+        enqueue_message(INVENTORY_TOPIC_NAME, {
+            "version": INVENTORY_UPDATE_SCHEMA_VERSION,
+            "sale_order_id": sale_id,
+            "items": [
+                {"product_id": product_id, "quantity_sold": quantity}
+                for product_id, quantity in quantities_sold.items()
+            ]
+        })
+
+        # Resposta montada a partir das linhas retornadas, sem reconsultar os itens
         created_sale_dict = new_sale.to_dict()
-        items_created = SaleItem.query.filter_by(sale_order_id=new_sale.id).all()
-        created_sale_dict['items'] = [item.to_dict() for item in items_created]
+        created_sale_dict['items'] = [item.to_dict() for item in sale_items]
 
         invoice_data = {
             "nf_id": str(uuid.uuid4()), # Unique invoice identifier
-            "sale_order_id": new_sale.id,
+            "sale_order_id": sale_id,
             "issue_date": datetime.now().isoformat(),
             "client_id": new_sale.client_id,
             "employee_id": new_sale.employee_id,
@@ -143,14 +270,16 @@ def create_sale():
             "items": invoice_items,
             "observacoes": "Nota Fiscal gerada automaticamente."
         }
-        invoice_message_data = {
+        enqueue_message(INVOICE_TOPIC_NAME, {
             "sale_order": created_sale_dict,
             "invoice_data": invoice_data
-        }
-        invoice_future = publisher.publish(INVOICE_TOPIC_PATH, json.dumps(invoice_message_data).encode('utf-8'))
-        current_app.logger.info(f"Published invoice generation message for Sale Order {new_sale.id}. Message ID: {invoice_future.result()}")
+        })
+
+        # Venda, itens e mensagens da outbox no mesmo commit
+        db.session.commit()
+        current_app.logger.info(f"Sale Order {sale_id} saved with {len(sale_items)} items.")
 
-        location_uri = url_for('saleorders.get_sale_by_id', sale_id=new_sale.id, _external=True)
+        location_uri = url_for('saleorders.get_sale_by_id', sale_id=sale_id, _external=True)
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "Failed to save sale to database", "details_dev": str(e)}), 500
@@ -168,12 +297,7 @@ def get_sale_by_id(sale_id: int):
         return jsonify({"error": "An internal server error occurred while fetching sale", "details_dev": str(e)}), 500
     
     if sale:
-        sale_dict = sale.to_dict()
-        items = SaleItem.query.filter_by(sale_order_id=sale.id).all()
-        sale_dict['items'] = [item.to_dict() for item in items]
-        sale_dict['client_name'] = "Cliente Desconhecido"  # Placeholder
-        sale_dict['employee_name'] = "Funcionário Desconhecido"  # Placeholder
-        sale_dict['total'] = sum(item.price * item.quantity for item in items)
+        sale_dict = _serialize_order(sale, _order_total(sale))
         return jsonify(sale_dict), 200
     else:
         return jsonify({"msg": "Sale not found"}), 404
@@ -197,7 +321,11 @@ def update_sale_by_id(sale_id: int):
     # Atualizando os campos da venda principal
     sale.client_id = data.get("client_id", sale.client_id)
     sale.employee_id = data.get("employee_id", sale.employee_id)
-    sale.date = data.get("date", sale.date)
+    if data.get("date") is not None:
+        sale_date = _parse_sale_date(data["date"])
+        if sale_date is None:
+            return jsonify({"msg": "Invalid sale date"}), 422
+        sale.date = sale_date
     sale.payment_method = data.get("payment_method", sale.payment_method)
     sale.status = data.get("status", sale.status)
 
@@ -0,0 +1,7 @@
+# Tópicos do Pub/Sub em que o Sales publica (pela outbox, ver sales/outbox.py)
+INVENTORY_TOPIC_NAME = 'inventory-updates'
+INVOICE_TOPIC_NAME = 'sale-invoice-events'
+
+# Versão 2: uma mensagem por venda com todos os itens em "items".
+# A versão 1 (um item por mensagem) continua aceita pelo Inventory.
+INVENTORY_UPDATE_SCHEMA_VERSION = 2
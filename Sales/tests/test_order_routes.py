@@ -1,5 +1,11 @@
+import csv
+import gzip
+import io
 import json
 from datetime import datetime, timedelta
+from sqlalchemy import event
+from sales import db as sales_db
+from sales.models import SaleOrder, SaleItem
 
 # Payloads de exemplo para testes de Sales
 # IDs fictícios para client, employee, product.
@@ -42,6 +48,46 @@ class TestSaleOrderRoutes:
         assert 'id' in data
         assert response.headers['Location'].endswith(f"/api/sales/{data['id']}")
 
+    def test_create_sale_order_inserts_items_in_one_statement(self, test_client_sales, authorized_headers_sales, test_app_instance_sales):
+        payload = {k: v for k, v in new_sale_order_payload_valid.items() if k != 'date'}
+        payload['items'] = [{"product_id": i, "quantity": 1, "price": 5.0, "discount": 0.0} for i in range(1, 31)]
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with test_app_instance_sales.app_context():
+            engine = sales_db.engine
+        event.listen(engine, "before_cursor_execute", record_statement)
+        try:
+            response = test_client_sales.post('/api/sales/', headers=authorized_headers_sales, json=payload)
+        finally:
+            event.remove(engine, "before_cursor_execute", record_statement)
+
+        assert response.status_code == 201
+        assert len(response.json['items']) == 30
+        assert all(item['id'] is not None for item in response.json['items'])
+        assert [item['product_id'] for item in response.json['items']] == list(range(1, 31))
+        item_inserts = [stmt for stmt in statements if stmt.startswith("INSERT INTO saleitem")]
+        assert len(item_inserts) == 1
+        assert not any(stmt.startswith("SELECT") for stmt in statements)
+
+    def test_create_sale_order_converts_date_offset(self, test_client_sales, authorized_headers_sales):
+        payload = {k: v for k, v in new_sale_order_payload_valid.items() if k != 'date'}
+        dates = []
+        for date in ("2026-01-01T10:00:00-03:00", "2026-01-01T10:00:00Z", "2026-01-01T13:00:00+00:00"):
+            response = test_client_sales.post('/api/sales/', headers=authorized_headers_sales, json={**payload, 'date': date})
+            assert response.status_code == 201
+            dates.append(datetime.fromisoformat(response.json['date']))
+        assert dates[0] - dates[1] == timedelta(hours=3)
+        assert dates[0] == dates[2]
+
+    def test_create_sale_order_invalid_date(self, test_client_sales, authorized_headers_sales):
+        payload = {**new_sale_order_payload_valid, 'date': 'not-a-date'}
+        response = test_client_sales.post('/api/sales/', headers=authorized_headers_sales, json=payload)
+        assert response.status_code == 422
+        assert "Invalid sale date" in response.json['msg']
+
     def test_create_sale_order_missing_client_or_employee_id(self, test_client_sales, authorized_headers_sales):
         payload = new_sale_order_payload_valid.copy()
         del payload['client_id'] # Remove client_id
@@ -87,6 +133,77 @@ class TestSaleOrderRoutes:
         assert retrieved_order['client_id'] == created_sale_order_data['client_id']
         assert len(retrieved_order['items']) == len(created_sale_order_data['items_payload'])
 
+    def test_get_all_sales_includes_total(self, test_client_sales, authorized_headers_sales, created_sale_order_data):
+        response = test_client_sales.get('/api/sales/', headers=authorized_headers_sales)
+        assert response.status_code == 200
+        expected_total = sum(item['price'] * item['quantity'] for item in created_sale_order_data['items_payload'])
+        assert response.json[0]['total'] == expected_total
+
+    def test_get_all_sales_does_not_aggregate_whole_table(self, test_client_sales, authorized_headers_sales, test_app_instance_sales, created_sale_order_data):
+        statements = []
+
+        def record_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with test_app_instance_sales.app_context():
+            engine = sales_db.engine
+        event.listen(engine, "before_cursor_execute", record_statement)
+        try:
+            response = test_client_sales.get('/api/sales/', headers=authorized_headers_sales)
+        finally:
+            event.remove(engine, "before_cursor_execute", record_statement)
+
+        assert response.status_code == 200
+        assert not any("GROUP BY" in stmt for stmt in statements)
+        item_selects = [stmt for stmt in statements if "FROM saleitem" in stmt]
+        assert len(item_selects) == 1 and " IN (" in item_selects[0]
+
+    def test_init_db_creates_missing_indexes(self, test_client_sales, test_app_instance_sales):
+        from sales.database import init_db
+        with test_app_instance_sales.app_context():
+            with sales_db.engine.begin() as conn:
+                conn.execute(sales_db.text("DROP INDEX ix_saleorder_date_id"))
+            init_db(sales_db)
+            indexes = {index['name'] for index in sales_db.inspect(sales_db.engine).get_indexes('saleorder')}
+        assert 'ix_saleorder_date_id' in indexes
+
+    def test_get_all_sales_paginated_with_cursor(self, test_client_sales, authorized_headers_sales, test_app_instance_sales):
+        base_date = datetime(2024, 1, 1)
+        with test_app_instance_sales.app_context():
+            for day in range(5):
+                order = SaleOrder(client_id=1, employee_id=101, date=base_date + timedelta(days=day),
+                                  payment_method="Pix", status="Pending")
+                sales_db.session.add(order)
+                sales_db.session.flush()
+                sales_db.session.add(SaleItem(sale_order_id=order.id, product_id=10, quantity=1, price=10.0, discount=0.0))
+            sales_db.session.commit()
+
+        first = test_client_sales.get('/api/sales/?limit=2', headers=authorized_headers_sales)
+        assert first.status_code == 200
+        assert len(first.json) == 2
+        assert first.json[0]['date'] > first.json[1]['date'] # Mais recentes primeiro
+        assert 'X-Next-Cursor' in first.headers
+
+        seen_ids = [order['id'] for order in first.json]
+        cursor = first.headers['X-Next-Cursor']
+        while cursor:
+            page = test_client_sales.get(f'/api/sales/?limit=2&cursor={cursor}', headers=authorized_headers_sales)
+            assert page.status_code == 200
+            seen_ids.extend(order['id'] for order in page.json)
+            cursor = page.headers.get('X-Next-Cursor')
+
+        assert len(seen_ids) == 5
+        assert len(set(seen_ids)) == 5
+
+    def test_get_all_sales_invalid_cursor(self, test_client_sales, authorized_headers_sales):
+        response = test_client_sales.get('/api/sales/?cursor=not-a-cursor', headers=authorized_headers_sales)
+        assert response.status_code == 400
+        assert "Invalid cursor" in response.json['msg']
+
+    def test_get_all_sales_invalid_limit(self, test_client_sales, authorized_headers_sales):
+        response = test_client_sales.get('/api/sales/?limit=0', headers=authorized_headers_sales)
+        assert response.status_code == 400
+
     # GET /api/sales/<sale_id>
     def test_get_sale_by_id_success(self, test_client_sales, authorized_headers_sales, created_sale_order_data):
         sale_id = created_sale_order_data['id']
@@ -143,4 +260,32 @@ class TestSaleOrderRoutes:
     def test_delete_sale_by_id_not_found(self, test_client_sales, authorized_headers_sales):
         response = test_client_sales.delete('/api/sales/99999', headers=authorized_headers_sales)
         assert response.status_code == 404
-        assert "Sale not found" in response.json['msg']
\ No newline at end of file
+        assert "Sale not found" in response.json['msg']
+
+    def test_export_sales_ndjson(self, test_client_sales, authorized_headers_sales, created_sale_order_data):
+        response = test_client_sales.get('/api/sales/export', headers=authorized_headers_sales)
+        assert response.status_code == 200
+        assert response.is_streamed
+        assert response.mimetype == 'application/x-ndjson'
+
+        (order,) = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        listed = test_client_sales.get('/api/sales/', headers=authorized_headers_sales).json[0]
+        assert order['items'] == listed['items']
+        assert (order['id'], order['status'], order['total']) == (listed['id'], listed['status'], listed['total'])
+
+    def test_export_sales_csv_gzip(self, test_client_sales, authorized_headers_sales, created_sale_order_data):
+        headers = {**authorized_headers_sales, "Accept-Encoding": "gzip"}
+        response = test_client_sales.get('/api/sales/export?format=csv&status=Pending', headers=headers)
+        assert response.headers['Content-Encoding'] == 'gzip'
+
+        rows = list(csv.DictReader(io.StringIO(gzip.decompress(response.data).decode('utf-8'))))
+        # Uma linha por item
+        assert [(row['product_id'], row['quantity']) for row in rows] == [('10', '2'), ('20', '1')]
+
+    def test_export_sales_filters(self, test_client_sales, authorized_headers_sales, created_sale_order_data):
+        tomorrow = (datetime.now() + timedelta(days=1)).isoformat()
+        response = test_client_sales.get(f'/api/sales/export?from={tomorrow}', headers=authorized_headers_sales)
+        assert response.data == b''
+
+        response = test_client_sales.get('/api/sales/export?from=ontem', headers=authorized_headers_sales)
+        assert response.status_code == 400
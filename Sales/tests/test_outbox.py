@@ -0,0 +1,118 @@
+import json
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+from sales import db as sales_db
+from sales.models import OutboxMessage
+from sales.outbox import enqueue_message, relay_batch, purge_published_messages
+from sales.topics import INVENTORY_TOPIC_NAME, INVOICE_TOPIC_NAME, INVENTORY_UPDATE_SCHEMA_VERSION
+
+sale_payload = {
+    "client_id": 1,
+    "employee_id": 101,
+    "payment_method": "Credit Card",
+    "items": [
+        {"product_id": 10, "quantity": 2, "price": 50.00, "discount": 0.0},
+        {"product_id": 20, "quantity": 1, "price": 120.00, "discount": 10.0}
+    ]
+}
+
+
+class FakePublisher:
+    """Publisher local: registra as mensagens publicadas e pode falhar sob demanda."""
+
+    def __init__(self, fail=False, hang=False):
+        self.fail = fail
+        self.hang = hang
+        self.published = []
+
+    def topic_path(self, project_id, topic_name):
+        return f"projects/{project_id}/topics/{topic_name}"
+
+    def publish(self, topic_path, data):
+        future = Future()
+        if self.hang:
+            return future # Nunca resolvida
+        if self.fail:
+            future.set_exception(RuntimeError("Pub/Sub unavailable"))
+        else:
+            self.published.append((topic_path, json.loads(data.decode('utf-8'))))
+            future.set_result(str(len(self.published)))
+        return future
+
+
+class TestOutbox:
+
+    def test_create_sale_writes_outbox_messages(self, test_client_sales, authorized_headers_sales, test_app_instance_sales):
+        response = test_client_sales.post('/api/sales/', headers=authorized_headers_sales, json=sale_payload)
+        assert response.status_code == 201
+
+        with test_app_instance_sales.app_context():
+            messages = OutboxMessage.query.order_by(OutboxMessage.id).all()
+            topics = [message.topic for message in messages]
+            assert topics.count(INVENTORY_TOPIC_NAME) == 1
+            assert topics.count(INVOICE_TOPIC_NAME) == 1
+            assert all(message.published_at is None for message in messages)
+
+            inventory_update = json.loads(messages[0].payload)
+            assert inventory_update['version'] == INVENTORY_UPDATE_SCHEMA_VERSION
+            assert inventory_update['sale_order_id'] == response.json['id']
+            assert inventory_update['items'] == [
+                {"product_id": item['product_id'], "quantity_sold": item['quantity']} for item in sale_payload['items']
+            ]
+
+            invoice = json.loads(messages[-1].payload)
+            assert invoice['sale_order']['id'] == response.json['id']
+
+    def test_relay_batch_publishes_pending_messages(self, test_client_sales, test_app_instance_sales):
+        publisher = FakePublisher()
+        with test_app_instance_sales.app_context():
+            enqueue_message(INVENTORY_TOPIC_NAME, {"product_id": 10, "quantity_sold": 2})
+            enqueue_message(INVOICE_TOPIC_NAME, {"invoice_data": {"nf_id": "abc"}})
+            sales_db.session.commit()
+
+            assert relay_batch(publisher, "test-project", batch_size=10) == 2
+            assert publisher.published[0] == ("projects/test-project/topics/inventory-updates", {"product_id": 10, "quantity_sold": 2})
+            assert OutboxMessage.query.filter(OutboxMessage.published_at.is_(None)).count() == 0
+
+            # Nada pendente: o próximo lote não publica de novo
+            assert relay_batch(publisher, "test-project", batch_size=10) == 0
+            assert len(publisher.published) == 2
+
+    def test_relay_batch_backs_off_on_failure(self, test_client_sales, test_app_instance_sales):
+        with test_app_instance_sales.app_context():
+            enqueue_message(INVENTORY_TOPIC_NAME, {"product_id": 10, "quantity_sold": 2})
+            sales_db.session.commit()
+
+            assert relay_batch(FakePublisher(fail=True), "test-project") == 0
+            message = OutboxMessage.query.one()
+            assert message.published_at is None
+            assert message.attempts == 1
+            assert message.next_attempt_at > datetime.now()
+            assert "Pub/Sub unavailable" in message.last_error
+
+            # Ainda em backoff: não é reenviada
+            publisher = FakePublisher()
+            assert relay_batch(publisher, "test-project") == 0
+            assert publisher.published == []
+
+    def test_relay_batch_times_out_hung_publish(self, test_client_sales, test_app_instance_sales):
+        with test_app_instance_sales.app_context():
+            enqueue_message(INVENTORY_TOPIC_NAME, {"product_id": 10, "quantity_sold": 2})
+            enqueue_message(INVOICE_TOPIC_NAME, {"invoice_data": {"nf_id": "abc"}})
+            sales_db.session.commit()
+
+            assert relay_batch(FakePublisher(hang=True), "test-project", publish_timeout=0.05) == 0
+            messages = OutboxMessage.query.all()
+            assert all(message.published_at is None and message.attempts == 1 for message in messages)
+
+    def test_purge_published_messages(self, test_client_sales, test_app_instance_sales):
+        with test_app_instance_sales.app_context():
+            old = enqueue_message(INVENTORY_TOPIC_NAME, {"product_id": 10, "quantity_sold": 2})
+            old.published_at = datetime.now() - timedelta(hours=200)
+            recent = enqueue_message(INVENTORY_TOPIC_NAME, {"product_id": 10, "quantity_sold": 1})
+            recent.published_at = datetime.now() - timedelta(hours=1)
+            enqueue_message(INVOICE_TOPIC_NAME, {"invoice_data": {"nf_id": "abc"}}) # Pendente
+            sales_db.session.commit()
+
+            assert purge_published_messages(168) == 1
+            assert OutboxMessage.query.count() == 2
@@ -0,0 +1,60 @@
+import numpy as np
+from datetime import datetime
+from sales import db as sales_db
+from sales.models import SaleOrder, SaleItem
+from sales.reorder import load_daily_demand, build_demand_matrix, compute_reorder_points
+
+
+def add_sale(day, items, status="COMPLETED"):
+    order = SaleOrder(client_id=1, employee_id=1, date=day, payment_method="Cash", status=status)
+    sales_db.session.add(order)
+    sales_db.session.flush()
+    sales_db.session.add_all([
+        SaleItem(sale_order_id=order.id, product_id=product_id, quantity=quantity, price=1.0)
+        for product_id, quantity in items
+    ])
+
+
+class TestReorderPoints:
+
+    def test_build_demand_matrix(self):
+        product_ids, demand = build_demand_matrix(
+            np.array([30, 10, 30]), np.array([0, 2, 2]), np.array([5, 1, 7], dtype=np.float32), 3
+        )
+        assert product_ids.tolist() == [10, 30]
+        assert demand.tolist() == [[0, 0, 1], [5, 0, 7]]
+
+    def test_compute_reorder_points(self):
+        demand = np.array([
+            [2, 2, 2, 2],  # Demanda constante: sem estoque de segurança
+            [0, 4, 0, 4],  # Média 2, desvio padrão 2
+            [0, 0, 0, 0],
+        ], dtype=np.float32)
+        minimums = compute_reorder_points(demand, lead_time_days=4, service_level_z=1.5, window_days=4)
+        # média * lead time + z * desvio * raiz(lead time), arredondado para cima
+        assert minimums.tolist() == [8, 14, 0]
+
+    def test_moving_average_uses_recent_window(self):
+        demand = np.array([[10, 10, 0, 0]], dtype=np.float32)
+        assert compute_reorder_points(demand, lead_time_days=1, service_level_z=0, window_days=2).tolist() == [0]
+
+    def test_load_daily_demand(self, test_app_instance_sales, test_client_sales):
+        with test_app_instance_sales.app_context():
+            add_sale(datetime(2024, 3, 8, 15, 30), [(7, 2), (9, 1)])
+            add_sale(datetime(2024, 3, 8, 18, 0), [(7, 3)])
+            add_sale(datetime(2024, 3, 9, 10, 0), [(9, 4)])
+            add_sale(datetime(2024, 3, 9, 11, 0), [(9, 50)], status="CANCELLED")
+            add_sale(datetime(2024, 3, 10, 9, 0), [(7, 8)])  # Hoje: fora da janela
+            sales_db.session.commit()
+
+            product_ids, demand = load_daily_demand(3, end=datetime(2024, 3, 10, 12, 0))
+
+        assert product_ids.tolist() == [7, 9]
+        assert demand.tolist() == [[0, 5, 0], [0, 1, 4]]
+
+    def test_load_daily_demand_without_sales(self, test_app_instance_sales, test_client_sales):
+        with test_app_instance_sales.app_context():
+            product_ids, demand = load_daily_demand(30)
+        assert product_ids.size == 0
+        assert demand.shape == (0, 30)
+        assert compute_reorder_points(demand).size == 0
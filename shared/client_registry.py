@@ -0,0 +1,55 @@
+"""
+Registro dos clients do Google Cloud de cada processo (ver <pacote>/clients.py).
+
+Arquivo compartilhado: a versão canônica fica em shared/ e as cópias dos serviços são geradas por
+python shared/sync.py (não edite as cópias).
+"""
+import os
+import threading
+from flask import current_app
+
+
+class ClientRegistry:
+    """
+    Clients do Google Cloud criados só no primeiro uso, um por processo.
+
+    Importar as rotas ou subir um worker não constrói nenhum client (nem importa as
+    bibliotecas do GCP); quem nunca faz upload ou publica nunca paga por isso. Depois de um
+    fork (workers do gunicorn com preload) os clients herdados são descartados, porque
+    canais gRPC/HTTP não podem ser compartilhados entre processos. Cada serviço registra as
+    fábricas dos seus clients em <pacote>/clients.py.
+    """
+
+    def __init__(self):
+        self._factories = {}
+        self._clients = {}
+        self._lock = threading.Lock()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset)
+
+    def register(self, name, factory):
+        """factory(config) constrói o client a partir do config da app."""
+        self._factories[name] = factory
+
+    def get(self, name):
+        client = self._clients.get(name)
+        if client is None:
+            config = current_app.config
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = self._factories[name](config)
+        return client
+
+    def created(self):
+        return sorted(self._clients)
+
+    def reset(self):
+        """Esquece os clients deste processo (chamado no filho após um fork)."""
+        self._lock = threading.Lock()
+        self._clients = {}
+
+    def warm_up(self, names=None):
+        """Constrói agora os clients pedidos (todos, se names for None), para o readiness probe."""
+        for name in (self._factories if names is None else names):
+            self.get(name)
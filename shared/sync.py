@@ -0,0 +1,76 @@
+"""
+Mantém os arquivos compartilhados iguais em todos os serviços.
+
+Cada serviço é construído com o próprio diretório como contexto do Docker (COPY . .), então
+precisa da sua cópia de secret_loader.py, db_pool.py e gunicorn.conf.py. Os serviços que usam clients
+do Google Cloud também recebem client_registry.py e, dentro do pacote, os que têm endpoints /export
+recebem export.py e os que publicam pela outbox transacional, outbox.py.
+A versão canônica fica em shared/; este script copia para os serviços ou, com --check, só verifica
+se alguma cópia diverge (sai com status 1). O check também roda nos testes de shared/tests.
+
+    python shared/sync.py          # atualiza as cópias
+    python shared/sync.py --check  # falha se alguma cópia estiver diferente
+"""
+import os
+import shutil
+import sys
+
+SHARED_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(SHARED_DIR)
+
+SERVICES = ['Auth', 'Customer', 'HR', 'Inventory', 'Sales']
+
+# Arquivo canônico -> destinos (relativos à raiz do repositório)
+SHARED_FILES = {
+    name: [os.path.join(service, name) for service in SERVICES]
+    for name in ('secret_loader.py', 'db_pool.py', 'gunicorn.conf.py')
+}
+SHARED_FILES['export.py'] = [
+    os.path.join('Inventory', 'inventory', 'export.py'),
+    os.path.join('Sales', 'sales', 'export.py'),
+]
+SHARED_FILES['client_registry.py'] = [os.path.join(service, 'client_registry.py') for service in ('Inventory', 'Sales')]
+SHARED_FILES['outbox.py'] = [
+    os.path.join('Inventory', 'inventory', 'outbox.py'),
+    os.path.join('Sales', 'sales', 'outbox.py'),
+]
+
+
+def _read(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def stale_copies():
+    """Cópias ausentes ou diferentes da versão canônica, como (canônico, cópia)."""
+    stale = []
+    for name, copies in SHARED_FILES.items():
+        canonical = os.path.join(SHARED_DIR, name)
+        content = _read(canonical)
+        for copy in copies:
+            path = os.path.join(ROOT_DIR, copy)
+            if not os.path.exists(path) or _read(path) != content:
+                stale.append((canonical, path))
+    return stale
+
+
+def sync():
+    stale = stale_copies()
+    for canonical, path in stale:
+        shutil.copyfile(canonical, path)
+        print(f"Updated {os.path.relpath(path, ROOT_DIR)}")
+    return stale
+
+
+def main(argv):
+    if '--check' in argv:
+        stale = stale_copies()
+        for _, path in stale:
+            print(f"Out of sync: {os.path.relpath(path, ROOT_DIR)} (run python shared/sync.py)")
+        return 1 if stale else 0
+    sync()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,6 @@
+# shared/tests/conftest.py
+import sys
+import os
+
+# Os testes importam as versões canônicas (shared/), não as cópias dos serviços
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
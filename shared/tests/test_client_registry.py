@@ -0,0 +1,89 @@
+import os
+import threading
+import pytest
+from flask import Flask
+from client_registry import ClientRegistry
+
+
+@pytest.fixture
+def test_app_instance():
+    return Flask(__name__)
+
+
+class FakeClient:
+    def __init__(self, config):
+        self.config = config
+
+    def bucket(self, name):
+        return (self, name)
+
+
+@pytest.fixture
+def registry():
+    registry = ClientRegistry()
+    registry.created_count = 0
+
+    def factory(config):
+        registry.created_count += 1
+        return FakeClient(config)
+
+    registry.register('fake', factory)
+    return registry
+
+
+class TestClientRegistry:
+
+    def test_client_is_created_on_first_use_only(self, test_app_instance, registry):
+        assert registry.created() == []
+        with test_app_instance.app_context():
+            first = registry.get('fake')
+            assert registry.get('fake') is first
+        assert registry.created_count == 1
+        assert registry.created() == ['fake']
+        assert first.config is test_app_instance.config
+
+    def test_concurrent_first_use_creates_one_client(self, test_app_instance, registry):
+        results = []
+
+        def worker():
+            with test_app_instance.app_context():
+                results.append(registry.get('fake'))
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert registry.created_count == 1
+        assert all(client is results[0] for client in results)
+
+    def test_reset_forgets_clients(self, test_app_instance, registry):
+        with test_app_instance.app_context():
+            first = registry.get('fake')
+            registry.reset()
+            assert registry.created() == []
+            assert registry.get('fake') is not first
+
+    @pytest.mark.skipif(not hasattr(os, 'fork'), reason="requer os.fork")
+    def test_forked_child_starts_without_clients(self, test_app_instance, registry):
+        with test_app_instance.app_context():
+            registry.get('fake')
+        read_fd, write_fd = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            os.write(write_fd, ','.join(registry.created()).encode() or b'-')
+            os._exit(0)
+        os.close(write_fd)
+        child_clients = os.read(read_fd, 1024)
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+        assert child_clients == b'-'
+        assert registry.created() == ['fake']
+
+    def test_warm_up_creates_requested_clients(self, test_app_instance, registry):
+        with test_app_instance.app_context():
+            registry.warm_up([])
+            assert registry.created() == []
+            registry.warm_up()
+        assert registry.created() == ['fake']
@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+from secret_loader import LocalSecretBackend, load_secrets, load_config_secrets
+
+SECRETS = {"tcc-app-secret": "app", "tcc-jwt-secret": "jwt", "DB_URL": "postgresql://db"}
+
+
+class SlowBackend(LocalSecretBackend):
+    """Backend local com latência de rede simulada, para medir as buscas em paralelo."""
+
+    def __init__(self, secrets, delay):
+        super().__init__(secrets)
+        self.delay = delay
+        self.threads = set()
+
+    def fetch(self, secret_name):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return super().fetch(secret_name)
+
+
+class TestSecretLoader:
+
+    def test_fetches_concurrently_and_caches_for_other_workers(self, tmp_path):
+        cache_path = str(tmp_path / "secrets.json")
+        backend = SlowBackend(SECRETS, delay=0.2)
+
+        started = time.perf_counter()
+        assert load_secrets(list(SECRETS), backend, cache_path) == SECRETS
+        assert time.perf_counter() - started < 0.5
+        assert len(backend.threads) == 3
+        assert oct(os.stat(cache_path).st_mode & 0o777) == '0o600'
+
+        # Outro worker: lê do arquivo, sem chamar o backend
+        other_worker = LocalSecretBackend(SECRETS)
+        assert load_secrets(list(SECRETS), other_worker, cache_path) == SECRETS
+        assert other_worker.fetched == []
+
+    def test_expired_cache_is_refetched(self, tmp_path):
+        cache_path = str(tmp_path / "secrets.json")
+        load_secrets(["DB_URL"], LocalSecretBackend(SECRETS), cache_path, ttl=60)
+        expired = time.time() - 61
+        os.utime(cache_path, (expired, expired))
+
+        backend = LocalSecretBackend({**SECRETS, "DB_URL": "postgresql://rotated"})
+        assert load_secrets(["DB_URL"], backend, cache_path, ttl=60) == {"DB_URL": "postgresql://rotated"}
+        assert backend.fetched == ["DB_URL"]
+
+    def test_only_missing_secrets_are_fetched(self, tmp_path):
+        cache_path = str(tmp_path / "secrets.json")
+        load_secrets(["tcc-app-secret"], LocalSecretBackend(SECRETS), cache_path)
+        backend = LocalSecretBackend(SECRETS)
+        assert load_secrets(["tcc-app-secret", "tcc-jwt-secret"], backend, cache_path) == {"tcc-app-secret": "app", "tcc-jwt-secret": "jwt"}
+        assert backend.fetched == ["tcc-jwt-secret"]
+
+    def test_corrupt_cache_is_ignored(self, tmp_path):
+        cache_path = tmp_path / "secrets.json"
+        cache_path.write_text("{not json")
+        assert load_secrets(["DB_URL"], LocalSecretBackend(SECRETS), str(cache_path)) == {"DB_URL": "postgresql://db"}
+
+    def test_config_secrets_from_local_file(self, tmp_path, monkeypatch):
+        secrets_file = tmp_path / "local-secrets.json"
+        secrets_file.write_text('{"tcc-jwt-secret": "from-file"}')
+        monkeypatch.setenv("KUBERNETES_DEPLOYMENT", "true")
+        monkeypatch.setenv("SECRETS_FILE", str(secrets_file))
+        monkeypatch.setenv("SECRET_CACHE_PATH", str(tmp_path / "cache.json"))
+        assert load_config_secrets(["tcc-jwt-secret"], "test-secrets") == {"tcc-jwt-secret": "from-file"}
+
+        monkeypatch.delenv("KUBERNETES_DEPLOYMENT")
+        assert load_config_secrets(["tcc-jwt-secret"], "test-secrets") == {}
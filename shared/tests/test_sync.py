@@ -0,0 +1,23 @@
+import sync
+
+
+class TestSharedCopies:
+
+    def test_service_copies_match_canonical(self):
+        assert [copy for _, copy in sync.stale_copies()] == []
+
+    def test_check_reports_divergent_copy(self, tmp_path, monkeypatch):
+        (tmp_path / "shared").mkdir()
+        (tmp_path / "Auth").mkdir()
+        (tmp_path / "shared" / "db_pool.py").write_text("canonical\n")
+        (tmp_path / "Auth" / "db_pool.py").write_text("edited in place\n")
+        monkeypatch.setattr(sync, "SHARED_DIR", str(tmp_path / "shared"))
+        monkeypatch.setattr(sync, "ROOT_DIR", str(tmp_path))
+        monkeypatch.setattr(sync, "SHARED_FILES", {"db_pool.py": ["Auth/db_pool.py", "HR/db_pool.py"]})
+
+        assert sync.main(["--check"]) == 1
+        (tmp_path / "HR").mkdir()
+        sync.main([])
+        assert (tmp_path / "Auth" / "db_pool.py").read_text() == "canonical\n"
+        assert (tmp_path / "HR" / "db_pool.py").read_text() == "canonical\n"
+        assert sync.main(["--check"]) == 0